@@ -0,0 +1,118 @@
+# Adaptive sampling check on simulated hardware.
+# Replays six steady hours, a two-hour pH crash and six more steady hours,
+# and checks acquisition and uplink slow down while the pond is steady, a
+# crash is picked up within one slow interval and reported straight away,
+# and the hourly budgets hold throughout.
+import os
+import random
+
+from check_rig import configure, start_monitor
+import flask2
+import simulated_hw
+
+work_dir = configure({
+    "PHONE_NUMBERS": ["+256700000001"],
+    "THINGSPEAK": {"MIN_SEND_INTERVAL": 0, "API_KEY": "CHECK"}
+})
+sampling = flask2.config.SAMPLING
+
+# ---------------------------------------------------------------------------
+# Scheduler: an expedited task runs once, early
+# ---------------------------------------------------------------------------
+
+clock = simulated_hw.SimulatedClock(0)
+scheduler = flask2.Scheduler(clock)
+runs = []
+scheduler.every(300, lambda: runs.append(clock.time()), name="slow", delay=300)
+assert scheduler.expedite("slow", 10) and not scheduler.expedite("slow", 60)
+while scheduler.next_due() < 700:
+    clock.now = scheduler.next_due()
+    scheduler.run_pending()
+assert runs == [10, 310, 610], runs
+
+# ---------------------------------------------------------------------------
+# Steady -> pH crash -> steady
+# ---------------------------------------------------------------------------
+
+STEADY, CRASH = 6 * 3600, 2 * 3600
+rng = random.Random(11)
+count = (2 * STEADY + CRASH) // 15
+crash = range(STEADY // 15, (STEADY + CRASH) // 15)
+columns = {field: [] for field in simulated_hw.SensorTrace.FIELDS}
+for i in range(count):
+    temp = 26.0 + rng.gauss(0, 0.1)
+    columns['temperature'].append(temp)
+    columns['water_temp'].append(temp)
+    columns['ph'].append((5.0 if i in crash else 7.2) + rng.gauss(0, 0.03))
+    columns['ec'].append(52.0 + rng.gauss(0, 1.0))
+    columns['nitrogen'].append(45.0 + rng.gauss(0, 1.0))
+    columns['phosphorus'].append(38.0 + rng.gauss(0, 1.0))
+    columns['potassium'].append(90.0)
+    columns['turbidity'].append(0.0)
+
+
+def run(enabled):
+    # Report by exception would skip most uploads; this check is about their rate
+    flask2.configure({"SAMPLING": {"ENABLED": enabled}, "REPORTING": {"ENABLED": False},
+                      "CHECKPOINT": {"FILE": os.path.join(work_dir, f"state-{enabled}.ckpt")}})
+    hardware = simulated_hw.SimulatedHardware(simulated_hw.SensorTrace(columns))
+    monitor = start_monitor(hardware)
+    monitor.uplink.start()
+    cycles, uplinks = [], []
+    task = monitor.scheduler.tasks['monitor']
+    task.func = lambda func=task.func: (cycles.append(hardware.clock.time() - hardware.start), func())[1]
+    send = monitor.send_to_thingspeak
+    monitor.send_to_thingspeak = lambda *a: (uplinks.append(hardware.clock.time() - hardware.start), send(*a))[1]
+    statuses = []
+    clock = hardware.clock
+    end = hardware.start + 2 * STEADY + CRASH
+    while True:
+        due = monitor.scheduler.next_due()
+        if due > end:
+            break
+        clock.now = max(clock.now, due)
+        last = monitor.last_snapshot
+        monitor.scheduler.run_pending()
+        if monitor.last_snapshot is not last:
+            statuses.append((clock.time() - hardware.start, monitor.last_snapshot.status['overall']))
+    monitor.uplink.stop()
+    monitor.cleanup()
+    return monitor, cycles, uplinks, statuses
+
+
+def between(times, start, end):
+    return sum(1 for t in times if start <= t < end)
+
+
+fixed, fixed_cycles, fixed_uplinks, _ = run(False)
+monitor, cycles, uplinks, statuses = run(True)
+
+# Steady hours (after a ramp-up) run at the slow rates
+quiet = (3600, STEADY)
+steady_cycles = between(cycles, *quiet)
+assert steady_cycles <= (quiet[1] - quiet[0]) / sampling.MAX_INTERVAL + 1, steady_cycles
+assert between(uplinks, *quiet) <= (quiet[1] - quiet[0]) / sampling.UPLINK_MAX_INTERVAL + 1
+assert steady_cycles * 3 < between(fixed_cycles, *quiet), "steady state did not cut acquisitions"
+
+# The crash is seen within one slow interval plus, at the fast rate, the
+# samples the Hampel filter needs to accept the step and the averaging
+# window needs to cross the threshold; it is uploaded at once
+detected = next(t for t, overall in statuses if t >= STEADY and overall != 'GOOD')
+latency = detected - STEADY
+confirm = flask2.config.FILTERS.WINDOW // 2 + flask2.config.HISTORY_SIZE
+assert latency <= sampling.MAX_INTERVAL + confirm * sampling.MIN_INTERVAL, latency
+first_upload = next(t for t in uplinks if t >= detected)
+assert first_upload - detected <= 1, f"uplink {first_upload - detected:.0f}s after the alert"
+
+# During the crash both streams run fast, within their hourly budgets
+crash_cycles = between(cycles, STEADY + 600, STEADY + CRASH)
+assert crash_cycles > between(fixed_cycles, STEADY + 600, STEADY + CRASH), "crash was not sampled faster"
+for times, budget in ((cycles, sampling.SAMPLE_BUDGET), (uplinks, sampling.UPLINK_BUDGET)):
+    for hour in range(0, 2 * STEADY + CRASH, 3600):
+        # A full bucket can add one hour's budget on top of the steady rate
+        assert between(times, hour, hour + 3600) <= 2 * budget, (hour, budget)
+    assert len(times) <= budget * (2 * STEADY + CRASH) / 3600 + budget
+
+print(f"OK: {len(cycles)} cycles / {len(uplinks)} uplinks adaptive vs {len(fixed_cycles)} / {len(fixed_uplinks)} "
+      f"fixed; steady {steady_cycles} cycles in {(quiet[1] - quiet[0]) // 3600} h, crash seen after {latency:.0f}s, "
+      f"uploaded {first_upload - detected:.0f}s later, {crash_cycles} cycles during the crash")
@@ -0,0 +1,66 @@
+# Shared setup for the off-device check scripts.
+# Puts project/ on the import path, points the monitor's files at a scratch
+# directory, keeps the per-cycle report off the console through
+# LOGGING.MODE, and hands the monitor a fake ThingSpeak session, so no check
+# touches the network, the real backup files or flask2's globals.
+import os
+import sys
+import tempfile
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "project"))
+import flask2  # noqa: E402
+import simulated_hw  # noqa: E402
+
+
+class FakeSession:
+    """requests.Session stand-in that answers ThingSpeak locally.
+
+    GET /update answers `update_text` (an entry id, "0" when refused) and
+    bulk POSTs answer 202. Every request is kept in `gets` (params) or
+    `posts` (url, body); subclass to vet or fail requests.
+    """
+
+    def __init__(self, update_text="1"):
+        self.update_text = update_text
+        self.gets = []
+        self.posts = []
+
+    def get(self, url, params=None, timeout=None):
+        self.gets.append(params)
+        return types.SimpleNamespace(status_code=200, text=self.update_text)
+
+    def post(self, url, json=None, timeout=None):
+        self.posts.append((url, json))
+        return types.SimpleNamespace(status_code=202, text="{}", headers={})
+
+    def reset(self):
+        self.gets.clear()
+        self.posts.clear()
+
+    def close(self):
+        pass
+
+
+def configure(overrides=None, work_dir=None):
+    """Applies `overrides` on top of scratch-directory defaults.
+
+    The backup DB, CSV backup and checkpoint live in `work_dir` (a new
+    temporary directory by default), the cycle report is logged instead of
+    printed and only errors are shown. Returns the directory.
+    """
+    work_dir = work_dir or tempfile.mkdtemp()
+    defaults = {
+        "LOGGING": {"MODE": "structured", "FILE": "", "LEVEL": "ERROR"},
+        "CHECKPOINT": {"FILE": os.path.join(work_dir, "state.ckpt")},
+        "THINGSPEAK": {"BACKUP_DB": os.path.join(work_dir, "telemetry.db"),
+                       "BACKUP_FILE": os.path.join(work_dir, "backup.csv")}
+    }
+    flask2.configure(flask2.deep_merge(defaults, overrides or {}))
+    return work_dir
+
+
+def start_monitor(hardware, session=None):
+    """A SmartFishPondMonitor on `hardware` with its threads left to the caller."""
+    return flask2.SmartFishPondMonitor(start_threads=False, hardware=hardware,
+                                       session=session if session is not None else FakeSession())
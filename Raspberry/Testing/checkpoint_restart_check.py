@@ -0,0 +1,189 @@
+# Warm restart check on simulated hardware.
+# Runs the monitor into a pH crash until the SMS alert is out, the pump is
+# running and both are checkpointed, then "crashes" it (no cleanup) and
+# starts a second monitor on the same files. Checks the windows, critical
+# timer and pump run come back, no second alert goes out, the first cycle
+# after the restart matches the uninterrupted run, and a damaged or stale
+# checkpoint falls back to a cold start.
+import os
+import random
+import time
+
+from check_rig import configure, start_monitor
+import flask2
+import simulated_hw
+
+configure({
+    "PHONE_NUMBERS": ["+256700000001"],
+    "SAMPLING": {"ENABLED": False},
+    "REPORTING": {"ENABLED": False},
+    "THINGSPEAK": {"MIN_SEND_INTERVAL": 0, "API_KEY": "CHECK"}
+})
+path = flask2.config.CHECKPOINT.FILE
+
+# ---------------------------------------------------------------------------
+# Codec round trip
+# ---------------------------------------------------------------------------
+
+state = {
+    'saved_at': 1700000000.5, 'cycle': 42,
+    'critical': {'start_time': None, 'sustained': False, 'alert_sent': False},
+    'pump': {'is_running': True, 'start_time': 1699999990.0, 'mode': "CRITICAL"},
+    'status': 'WARNING',
+    'history': {'temp': [26.0, 26.5], 'ph': []},
+    'filters': {'ph': [7.1, 7.2, 7.3]}
+}
+decoded = flask2.decode_checkpoint(flask2.encode_checkpoint(state))
+assert {k: v for k, v in decoded.items() if k not in ('history', 'filters')} == \
+    {k: v for k, v in state.items() if k not in ('history', 'filters')}, decoded
+assert {k: list(v) for k, v in decoded['history'].items()} == state['history']
+assert {k: list(v) for k, v in decoded['filters'].items()} == state['filters']
+
+# ---------------------------------------------------------------------------
+# Run into a pH crash until the alert and the pump run are checkpointed
+# ---------------------------------------------------------------------------
+
+STEADY, CRASH = 3600, 3 * 3600
+rng = random.Random(12)
+count = (STEADY + CRASH) // 15
+columns = {field: [] for field in simulated_hw.SensorTrace.FIELDS}
+for i in range(count):
+    crashed = i >= STEADY // 15
+    # Acid water on a hot afternoon: two CRITICAL rules, enough for a CRITICAL status
+    temp = (36.0 if crashed else 26.0) + rng.gauss(0, 0.1)
+    columns['temperature'].append(temp)
+    columns['water_temp'].append(temp)
+    columns['ph'].append((5.0 if crashed else 7.2) + rng.gauss(0, 0.03))
+    columns['ec'].append(52.0 + rng.gauss(0, 1.0))
+    columns['nitrogen'].append(45.0 + rng.gauss(0, 1.0))
+    columns['phosphorus'].append(38.0 + rng.gauss(0, 1.0))
+    columns['potassium'].append(90.0)
+    columns['turbidity'].append(0.0)
+trace = simulated_hw.SensorTrace(columns)
+
+
+def start(rig):
+    monitor = start_monitor(rig)
+    # The 1-Wire sampler runs on its own thread on the Pi; poll it on the scheduler here
+    monitor.scheduler.every(flask2.config.ONEWIRE.INTERVAL, monitor.ds18b20.poll, name="onewire")
+    return monitor
+
+
+def step(monitor):
+    clock = monitor.clock
+    clock.now = max(clock.now, monitor.scheduler.next_due())
+    monitor.scheduler.run_pending()
+
+
+def counting_alerts(monitor):
+    alerts = []
+    queue = monitor.queue_sms_alert
+    monitor.queue_sms_alert = lambda status: (alerts.append(monitor.clock.time()), queue(status))[1]
+    return alerts
+
+
+hardware = simulated_hw.SimulatedHardware(trace)
+first = start(hardware)
+while True:
+    step(first)
+    critical, pump = first.state['critical'], first.state['pump']
+    if (critical['alert_sent'] and pump['is_running'] and first.last_checkpoint
+            and first.last_checkpoint >= max(critical['start_time'], pump['start_time'])):
+        break
+    assert hardware.clock.time() - hardware.start < STEADY + CRASH / 2, "alert and pump run never checkpointed"
+
+# The checkpoint went out as soon as the alert did, not a full INTERVAL later
+saved = first.checkpoint_state()
+data = open(path, "rb").read()
+assert flask2.decode_checkpoint(data)['critical']['alert_sent']
+windows = {name: list(values) for name, values in saved['history'].items()}
+filters = {channel: list(values) for channel, values in saved['filters'].items()}
+pump_off_due = first.pump_off_task.due
+
+# Uninterrupted run: the next monitoring cycle is where the restart resumes
+restart_at = first.scheduler.tasks['monitor'].due
+reference = first.last_snapshot
+while first.last_snapshot is reference:
+    step(first)
+assert hardware.clock.time() == restart_at
+reference, reference_averages = first.last_snapshot, first.get_averages()
+
+
+def restart(now, contents=data):
+    # Crash: the first monitor never ran cleanup; a new one opens the same files
+    with open(path, "wb") as f:
+        f.write(contents)
+    rig = simulated_hw.SimulatedHardware(trace, clock=simulated_hw.SimulatedClock(hardware.start))
+    rig.clock.now = now
+    return start(rig)
+
+
+# ---------------------------------------------------------------------------
+# Warm restart
+# ---------------------------------------------------------------------------
+
+second = restart(restart_at)
+assert second.cycle_count == saved['cycle']
+assert {name: list(window) for name, window in second.history.items()} == windows
+assert {channel: f.values() for channel, f in second.filters.filters.items()} == filters
+assert second.state['critical'] == saved['critical']
+assert second.state['pump']['is_running'] and second.gpio.levels[flask2.config.GPIO.PUMP_PIN] == second.gpio.LOW
+assert second.pump_off_task.due == pump_off_due, "pump run did not resume with its remaining time"
+
+began = time.perf_counter()
+assert second.restore_checkpoint()
+restore_ms = (time.perf_counter() - began) * 1000
+
+alerts = counting_alerts(second)
+step(second)
+snapshot, averages = second.last_snapshot, second.get_averages()
+assert snapshot.cycle == reference.cycle
+assert snapshot.status['overall'] == reference.status['overall'] and snapshot.status['score'] == reference.status['score']
+assert [code for code, _ in snapshot.status['codes']] == [code for code, _ in reference.status['codes']]
+for key in ('ph', 'ec', 'nitrogen', 'phosphorus'):
+    assert abs(averages[key] - reference_averages[key]) < 1e-9, (key, averages, reference_averages)
+# Temperature fusion weights are relearned, so only the average is close
+assert abs(averages['temperature'] - reference_averages['temperature']) < 0.1
+
+end = restart_at + flask2.config.CRITICAL_DURATION + 120
+while second.scheduler.next_due() <= end:
+    step(second)
+assert not alerts, f"alert re-sent after the restart at {alerts}"
+second.cleanup()
+
+# Without the checkpoint the critical timer starts over and the alert goes again
+os.remove(path)
+cold = restart(restart_at, b"")
+assert cold.cycle_count == 0 and not cold.state['critical']['sustained']
+alerts = counting_alerts(cold)
+while cold.scheduler.next_due() <= end:
+    step(cold)
+assert alerts, "cold start should have re-armed the alert"
+cold.cleanup()
+
+# ---------------------------------------------------------------------------
+# Damaged, stale and half-written checkpoints
+# ---------------------------------------------------------------------------
+
+corrupt = bytearray(data)
+corrupt[len(corrupt) // 2] ^= 0xFF
+for contents, now, reason in ((bytes(corrupt), restart_at, "corrupt"),
+                              (data[:len(data) // 2], restart_at, "truncated"),
+                              (b"", restart_at, "empty"),
+                              (data, saved['saved_at'] + flask2.config.CHECKPOINT.MAX_AGE + 1, "stale")):
+    monitor = restart(now, contents)
+    assert monitor.cycle_count == 0 and len(monitor.history['ph']) == 0, reason
+    assert not monitor.state['critical']['sustained'], reason
+    monitor.cleanup()
+
+# A crash during write_checkpoint leaves a .tmp beside the last good file
+with open(path + ".tmp", "wb") as f:
+    f.write(data[:10])
+monitor = restart(restart_at)
+assert monitor.cycle_count == saved['cycle'], "leftover .tmp file broke the restore"
+monitor.cleanup()
+first.cleanup()
+
+print(f"OK: {len(data)} byte checkpoint, restored in {restore_ms:.2f} ms with {len(windows['ph'])} history "
+      f"samples and {sum(map(len, filters.values()))} filter samples; pump resumed for "
+      f"{pump_off_due - restart_at:.0f}s, no repeat alert; damaged/stale checkpoints cold-start")
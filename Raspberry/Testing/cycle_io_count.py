@@ -0,0 +1,81 @@
+# Regression check: one monitoring cycle must touch each sensor exactly once.
+# DS18B20s are read by their own sampler, so the cycle itself must not touch
+# the 1-Wire bus at all.
+# Runs off-device on the simulated hardware backend (project/simulated_hw.py).
+from check_rig import configure, start_monitor
+import flask2
+import simulated_hw
+
+configure()
+
+# ---------------------------------------------------------------------------
+# Run cycles
+# ---------------------------------------------------------------------------
+
+hardware = simulated_hw.SimulatedHardware(simulated_hw.SensorTrace.synthetic(days=1, seed=3))
+monitor = start_monitor(hardware)
+CYCLES = 5
+
+
+def counts():
+    return (hardware.modbus.transactions, hardware.gpio.reads, hardware.onewire.reads)
+
+
+for cycle in range(1, CYCLES + 1):
+    monitor.ds18b20.poll()
+    before = counts()
+    snapshot = monitor.run_cycle()
+    modbus, gpio_input, w1_read = (after - prior for after, prior in zip(counts(), before))
+    assert snapshot is not None, "cycle produced no snapshot"
+    assert snapshot.cycle == cycle
+    assert modbus == 1, f"cycle {cycle}: {modbus} Modbus transactions"
+    assert gpio_input == 1, f"cycle {cycle}: {gpio_input} turbidity polls"
+    assert w1_read == 0, f"cycle {cycle}: {w1_read} DS18B20 reads inside the cycle"
+    assert snapshot.sample.ds18b20_temp is not None, f"cycle {cycle}: no cached DS18B20 temperature"
+    print(f"cycle {cycle}: modbus={modbus} gpio.input={gpio_input} "
+          f"w1.read={w1_read} status={snapshot.status['overall']}")
+    hardware.clock.advance(flask2.config.TEMP_READ_INTERVAL)
+
+for name, window in monitor.history.items():
+    assert len(window) == CYCLES, f"history['{name}'] has {len(window)} samples, expected {CYCLES}"
+
+# ---------------------------------------------------------------------------
+# 1-Wire: bulk conversion per poll, hot-plugged probes, stale cache
+# ---------------------------------------------------------------------------
+
+sampler, onewire = monitor.ds18b20, hardware.onewire
+conversions = onewire.conversions
+onewire.devices.append("28-00000a1b2c3e")
+hardware.clock.advance(flask2.config.ONEWIRE.REDISCOVER_INTERVAL)
+sampler.poll()
+assert onewire.conversions == conversions + 1, "expected one bulk conversion per poll"
+assert sampler.devices == sorted(onewire.devices), "hot-plugged probe was not discovered"
+assert len(sampler.snapshot()) == 2
+
+# An unplugged probe fails its read, which forces a rediscovery next round
+onewire.devices.remove("28-00000a1b2c3d")
+sampler.poll()
+sampler.poll()
+assert sampler.devices == ["28-00000a1b2c3e"], f"unplugged probe still listed: {sampler.devices}"
+
+hardware.clock.advance(flask2.config.ONEWIRE.MAX_AGE + 1)
+assert monitor.read_ds18b20_temp() is None, "stale DS18B20 reading served"
+sampler.poll()
+assert monitor.read_ds18b20_temp() is not None
+
+# ---------------------------------------------------------------------------
+# LCD: only changed cells go over I2C
+# ---------------------------------------------------------------------------
+
+lcd, writer = hardware.lcd, monitor.lcd_writer
+writer.show(["T:24.1C  pH: 7.2", "TREND: STABLE"])
+writes = lcd.writes
+assert writer.show(["T:24.1C  pH: 7.2", "TREND: STABLE"]) == 0 and lcd.writes == writes, "unchanged frame was rewritten"
+assert writer.show(["T:24.3C  pH: 7.4", "TREND: STABLE"]) == 2, "expected 2 changed cells"
+assert lcd.writes == writes + 2, "expected two cursor runs"
+assert lcd.lines == ["T:24.3C  pH: 7.4", "TREND: STABLE   "]
+
+status = {'overall': 'CRITICAL', 'codes': (('PH_ACIDIC_CRITICAL', 5.23),)}
+assert flask2.lcd_alert_lines(status) == ("!! CRITICAL  !! ", "pH: 5.2 ACIDIC  ")
+
+print(f"OK: {CYCLES} cycles, one read per sensor per cycle (DS18B20 from cache), one history sample per cycle, diffed LCD writes")
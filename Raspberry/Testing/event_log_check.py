@@ -0,0 +1,68 @@
+# Structured logging check on simulated hardware.
+# Runs the monitor with LOGGING.MODE "structured" and checks the per-cycle
+# report becomes one event, the event file is written once per cycle and
+# rotated into gzip archives, and /api/events serves the bounded ring.
+import contextlib
+import glob
+import gzip
+import io
+import json
+import os
+
+from check_rig import configure, start_monitor
+import flask2
+import simulated_hw
+
+work_dir = configure({"LOGGING": {"LEVEL": "INFO", "MAX_BYTES": 8192, "BACKUPS": 2, "RING_SIZE": 50}})
+event_file = os.path.join(work_dir, "events.jsonl")
+flask2.configure({"LOGGING": {"FILE": event_file}})
+console = io.StringIO()
+
+hardware = simulated_hw.SimulatedHardware(simulated_hw.SensorTrace.synthetic(days=1, seed=2))
+monitor = start_monitor(hardware)
+log = flask2.EVENT_LOG
+assert log is not None and log.path == event_file
+
+CYCLES = 60
+writes = log.writes
+with contextlib.redirect_stdout(console):
+    for _ in range(CYCLES):
+        monitor.monitor_tick()
+        hardware.clock.advance(flask2.config.TEMP_READ_INTERVAL)
+assert log.writes - writes == CYCLES, f"{log.writes - writes} file writes for {CYCLES} cycles"
+assert not console.getvalue(), f"structured mode printed {console.getvalue()!r}"
+assert log.dropped == 0
+
+# Rotation: the live file stays under MAX_BYTES, at most BACKUPS archives
+archives = sorted(glob.glob(event_file + ".*.gz"))
+assert log.rotations >= 2 and len(archives) == 2, (log.rotations, archives)
+# (the live file is only recreated by the first write after a rotation)
+assert not os.path.exists(event_file) or os.path.getsize(event_file) < 8192
+events = [json.loads(line) for line in gzip.open(archives[0], "rt")]
+if os.path.exists(event_file):
+    events += [json.loads(line) for line in open(event_file)]
+cycles = [e for e in events if e.get('event') == 'cycle']
+assert cycles and cycles[-1]['fields']['cycle'] == CYCLES, cycles[-1]
+assert set(cycles[-1]['fields']) >= {'readings', 'averages', 'status', 'score', 'uplink', 'sms'}
+
+# Ring: bounded, newest last, filterable by id and level
+client = flask2.app.test_client()
+body = client.get("/api/events?limit=1000").get_json()
+assert len(body['events']) == 50 and body['events'][-1]['id'] == body['last_id']
+assert body['events'][-1]['fields']['cycle'] == CYCLES
+assert client.get(f"/api/events?since={body['last_id']}").get_json()['events'] == []
+flask2.logger.warning("probe %s not answering", "north")
+newer = client.get(f"/api/events?since={body['last_id']}&level=warning").get_json()['events']
+assert [e['message'] for e in newer] == ["probe north not answering"], newer
+assert client.get("/api/events?level=LOUD").status_code == 400
+
+# Switching back to text mode detaches the file and prints the report again
+flask2.configure({"LOGGING": {"MODE": "text"}})
+monitor.apply_config(None, flask2.config, ["LOGGING.MODE"])
+assert flask2.EVENT_LOG is None
+with contextlib.redirect_stdout(console):
+    monitor.monitor_tick()
+assert "POND MONITORING REPORT" in console.getvalue()
+monitor.cleanup()
+print(f"OK: {CYCLES} cycles, {CYCLES} event file writes, {log.rotations} rotations "
+      f"({len(archives)} gzip archives kept), ring capped at 50 events")
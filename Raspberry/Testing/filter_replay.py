@@ -0,0 +1,138 @@
+# Offline replay of a sensor trace through flask2's filter stage.
+# Injects faults into a synthetic (or recorded CSV) trace, replays it
+# through FilterStage and checks spikes are rejected, real steps get
+# through, the quieter temperature sensor dominates the fused estimate,
+# sensor health follows dropouts and readings in the top alert bands still
+# reach the rules.
+#
+#   python filter_replay.py                  # two synthetic days, with checks
+#   python filter_replay.py --trace readings.csv --no-faults
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "project"))
+import flask2  # noqa: E402
+import simulated_hw  # noqa: E402
+
+SPIKE_EVERY = 97
+
+
+def inject_faults(trace, seed=7):
+    # Water temperature is a smooth diurnal curve with one 6 h heat wave; the
+    # RS485 thermistor reads it with 0.5 C noise, the DS18B20 with 0.1 C.
+    # On top: single-frame Modbus garbage, DS18B20 power-on 85.0 reads and a
+    # DS18B20 that drops out for an hour
+    rng = random.Random(seed)
+    columns = {field: list(column) for field, column in trace.columns.items()}
+    interval = trace.interval
+    heat = range(len(trace) // 3, len(trace) // 3 + int(6 * 3600 // interval))
+    truth = [26.0 + 2.5 * math.sin(2 * math.pi * (i * interval % 86400) / 86400) + (10.0 if i in heat else 0.0)
+             for i in range(len(trace))]
+    spikes = set(range(SPIKE_EVERY, len(trace), SPIKE_EVERY))
+    for i in range(len(trace)):
+        columns['temperature'][i] = truth[i] + rng.gauss(0, 0.5)
+        columns['water_temp'][i] = truth[i] + rng.gauss(0, 0.1)
+    for i in spikes:
+        columns['ph'][i] += rng.choice((-3.0, 3.0))
+        columns['ec'][i] *= 10
+        columns['nitrogen'][i] = 0.0
+        columns['water_temp'][i] = 85.0
+    dropout = range(len(trace) // 2, len(trace) // 2 + 3600 // int(trace.interval))
+    for i in dropout:
+        columns['water_temp'][i] = -127.0
+    return simulated_hw.SensorTrace(columns, trace.interval), truth, spikes, dropout
+
+
+def rms(errors):
+    errors = [e for e in errors if not math.isnan(e)]
+    return math.sqrt(sum(e * e for e in errors) / len(errors))
+
+
+def check(trace, truth, spikes, dropout):
+    stage = flask2.FilterStage.from_config(flask2.config.FILTERS, flask2.QUALITY_RULES.sensor_ranges)
+    start = time.perf_counter()
+    result = flask2.replay_trace(stage, trace)
+    per_sample_us = (time.perf_counter() - start) / len(trace) * 1e6
+    raw, filtered = result['raw'], result['filtered']
+
+    passed = [i for i in spikes if abs(filtered['ph'][i] - raw['ph'][i - 1]) > 1.0
+              or filtered['ec'][i] > 500 or filtered['nitrogen'][i] < 20]
+    assert not passed, f"{len(passed)} injected spikes reached the output, e.g. sample {passed[0]}"
+    assert all(math.isnan(filtered['ds18b20'][i]) for i in spikes if i not in dropout), "85.0 C read was fused"
+
+    # Heat waves are real steps: the output must follow within half a window (+ fusion reset)
+    window = flask2.config.FILTERS.WINDOW
+    steps = [i for i in range(1, len(trace)) if abs(truth[i] - truth[i - 1]) > 5]
+    for i in steps:
+        settle = i + window // 2 + 4
+        assert abs(filtered['temperature'][settle] - truth[settle]) < 1.0, f"step at {i} not followed"
+
+    weights = stage.fusion.weights()
+    assert weights['ds18b20'] > 0.7, f"quieter DS18B20 should dominate the fusion: {weights}"
+    # Compare away from faults and from the samples where a step is still being confirmed
+    settling = {j for i in steps for j in range(i, i + window // 2 + 4)}
+    steady = [i for i in range(len(trace)) if i not in spikes and i not in dropout and i not in settling]
+    blend = [0.6 * raw['temperature'][i] + 0.4 * raw['ds18b20'][i] - truth[i] for i in steady]
+    fused = [filtered['temperature'][i] - truth[i] for i in steady]
+    assert rms(fused) < rms(blend), f"fused RMS {rms(fused):.3f} not better than 0.6/0.4 blend {rms(blend):.3f}"
+    assert stage.out_of_range['ds18b20'] >= len(dropout)
+    return stage, per_sample_us, rms(fused), rms(blend)
+
+
+def replay_health(trace, truth, spikes, dropout):
+    # Health scores during and after the DS18B20 dropout
+    stage = flask2.FilterStage.from_config(flask2.config.FILTERS, flask2.QUALITY_RULES.sensor_ranges)
+    partial = simulated_hw.SensorTrace({f: c[:dropout.stop] for f, c in trace.columns.items()}, trace.interval)
+    flask2.replay_trace(stage, partial)
+    scores = stage.health.scores
+    assert scores['ds18b20'] < 10 and scores['ph'] > 80, scores
+    return dict(scores)
+
+
+def check_alert_bands(trace):
+    # Nitrogen and phosphorus jump past their CRITICAL limits (200 mg/kg): the
+    # range check must let them through and the rules must raise both alerts
+    columns = {field: list(column) for field, column in trace.columns.items()}
+    jump = len(trace) // 2
+    for i in range(jump, len(trace)):
+        columns['nitrogen'][i] = 250.0
+        columns['phosphorus'][i] = 260.0
+    stage = flask2.FilterStage.from_config(flask2.config.FILTERS, flask2.QUALITY_RULES.sensor_ranges)
+    filtered = flask2.replay_trace(stage, simulated_hw.SensorTrace(columns, trace.interval))['filtered']
+    assert stage.out_of_range['nitrogen'] == 0 and stage.out_of_range['phosphorus'] == 0, stage.out_of_range
+    recent = slice(len(trace) - flask2.config.HISTORY_SIZE, len(trace))
+    averages = {param: sum(filtered[param][recent]) / flask2.config.HISTORY_SIZE
+                for param in ('temperature', 'ph', 'ec', 'nitrogen', 'phosphorus')}
+    codes = [code for code, _ in flask2.QUALITY_RULES.evaluate(averages)['codes']]
+    assert "NITROGEN_CRITICAL" in codes and "PHOSPHORUS_CRITICAL" in codes, codes
+    return codes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a sensor trace through the filter stage")
+    parser.add_argument("--days", type=float, default=2, help="synthetic days to replay (default 2)")
+    parser.add_argument("--trace", help="CSV trace to replay instead of the synthetic one")
+    parser.add_argument("--no-faults", action="store_true", help="replay the trace as recorded")
+    args = parser.parse_args()
+
+    trace = (simulated_hw.SensorTrace.from_csv(args.trace) if args.trace
+             else simulated_hw.SensorTrace.synthetic(days=args.days, seed=4))
+    if args.no_faults:
+        stage = flask2.FilterStage.from_config(flask2.config.FILTERS, flask2.QUALITY_RULES.sensor_ranges)
+        flask2.replay_trace(stage, trace)
+        for key, value in stage.stats().items():
+            print(f"{key:<15}{value}")
+        sys.exit(0)
+
+    faulty, truth, spikes, dropout = inject_faults(trace)
+    stage, per_sample_us, fused_rms, blend_rms = check(faulty, truth, spikes, dropout)
+    health = replay_health(faulty, truth, spikes, dropout)
+    check_alert_bands(trace)
+    print(f"OK: {len(faulty)} samples at {per_sample_us:.1f} us each, {len(spikes)} spikes rejected, "
+          f"fused temperature RMS {fused_rms:.3f} C vs {blend_rms:.3f} C for the fixed blend "
+          f"(weights {stage.fusion.weights()}), DS18B20 health {health['ds18b20']:.0f} after dropout, "
+          f"N/P above 200 mg/kg raise CRITICAL")
@@ -0,0 +1,107 @@
+# Fleet mode check: several pond probes on shared RS485 buses.
+# Runs FleetMonitor on simulated hardware and checks each probe is read once
+# per round, a dead slave backs off instead of stalling its bus, and every
+# pond's rows reach its own ThingSpeak channel as one bulk POST per interval.
+from collections import Counter
+
+from check_rig import FakeSession, configure
+import flask2
+import simulated_hw
+
+PONDS = [
+    {"NAME": "north", "PORT": "/dev/ttyUSB0", "SLAVE_ID": 1, "API_KEY": "K1", "CHANNEL_ID": "101"},
+    {"NAME": "south", "PORT": "/dev/ttyUSB0", "SLAVE_ID": 2, "API_KEY": "K2", "CHANNEL_ID": "102"},
+    {"NAME": "east", "PORT": "/dev/ttyUSB1", "SLAVE_ID": 3, "API_KEY": "K3", "CHANNEL_ID": "103"},
+]
+
+# ---------------------------------------------------------------------------
+# Pond list validation
+# ---------------------------------------------------------------------------
+
+for bad, expected in [([dict(PONDS[0]), dict(PONDS[0], NAME="dup")], "already used"),
+                      ([dict(PONDS[0], SLAVE_ID=300)], "1..247"),
+                      ([dict(PONDS[0], NAME="a b")], "NAME")]:
+    try:
+        flask2.build_config({"FLEET": {"PONDS": bad}})
+    except flask2.ConfigError as e:
+        assert expected in str(e), e
+    else:
+        raise AssertionError(f"accepted invalid pond list {bad}")
+
+configure({
+    "FLEET": {"PONDS": PONDS},
+    # Every interval's row goes out; report_by_exception_check covers skipping
+    "REPORTING": {"ENABLED": False},
+    "THINGSPEAK": {"BULK_MIN_INTERVAL": 0}
+})
+
+# ---------------------------------------------------------------------------
+# Polling rounds
+# ---------------------------------------------------------------------------
+
+hardware = simulated_hw.SimulatedHardware(simulated_hw.SensorTrace.synthetic(days=1, seed=5))
+session = FakeSession()
+fleet = flask2.FleetMonitor(start_threads=False, hardware=hardware, session=session)
+assert [bus.port for bus in fleet.buses] == ["/dev/ttyUSB0", "/dev/ttyUSB1"]
+probes = {spec["NAME"]: hardware.probes[(spec["PORT"], spec["SLAVE_ID"])] for spec in PONDS}
+clock = hardware.clock
+
+
+def run_rounds(count):
+    # Step the scheduler (uplinks included) until `count` more polling rounds ran
+    target = fleet.rounds + count
+    while fleet.rounds < target:
+        clock.now = max(clock.now, fleet.scheduler.next_due())
+        fleet.scheduler.run_pending()
+
+
+ROUNDS = 20
+run_rounds(ROUNDS)
+assert fleet.rounds == ROUNDS, fleet.rounds
+for name, probe in probes.items():
+    assert probe.transactions == ROUNDS, f"{name}: {probe.transactions} transactions in {ROUNDS} rounds"
+    assert fleet.ponds[name].cycle_count == ROUNDS
+scores = {name: pond.status['score'] for name, pond in fleet.ponds.items()}
+readings = {name: round(pond.reading['temperature'], 1) for name, pond in fleet.ponds.items()}
+assert len(set(readings.values())) > 1, f"ponds should replay different parts of the trace: {readings}"
+
+# ---------------------------------------------------------------------------
+# A slave that stops answering is backed off, the rest keep their rate
+# ---------------------------------------------------------------------------
+
+probes["south"].responding = False
+before = {name: probe.transactions for name, probe in probes.items()}
+reads_before = flask2.STAGE_SECONDS['modbus_read'].count
+errors_before = flask2.FLEET_READ_ERRORS["south"].value
+run_rounds(ROUNDS)
+polled = {name: probe.transactions - before[name] for name, probe in probes.items()}
+# Read metrics are published from this thread once both port workers are done
+assert flask2.STAGE_SECONDS['modbus_read'].count - reads_before == sum(polled.values())
+assert flask2.FLEET_READ_ERRORS["south"].value - errors_before == polled["south"]
+assert polled["north"] == ROUNDS and polled["east"] == ROUNDS, polled
+assert polled["south"] < ROUNDS // 2, f"dead slave polled {polled['south']} times in {ROUNDS} rounds"
+assert fleet.ponds["south"].cycle_count == ROUNDS
+
+probes["south"].responding = True
+run_rounds(flask2.config.FLEET.MAX_BACKOFF_ROUNDS + 1)
+assert fleet.ponds["south"].cycle_count > ROUNDS, "slave was not picked up again after answering"
+
+# ---------------------------------------------------------------------------
+# Uplink: one bulk POST per pond channel per send interval
+# ---------------------------------------------------------------------------
+
+posts, rows = Counter(), Counter()
+for url, body in session.posts:
+    channel = url.split("/channels/")[1].split("/")[0]
+    posts[channel] += 1
+    rows[channel] += len(body["updates"])
+sent = dict(posts)
+assert set(sent) == {"101", "102", "103"}, sent
+assert len(set(sent.values())) == 1 and all(rows[c] == sent[c] for c in sent), (sent, dict(rows))
+for name in probes:
+    assert fleet.ponds[name].store.pending_count() == 0, f"{name} has rows left to upload"
+
+fleet.cleanup()
+print(f"OK: {len(PONDS)} ponds on {len(fleet.buses)} buses, one read per probe per round, "
+      f"dead slave polled {polled['south']}/{ROUNDS} rounds, {sum(sent.values())} bulk POSTs "
+      f"({sent['101']} per channel), scores {scores}")
@@ -0,0 +1,142 @@
+# Local stand-in for the SIM800 GSM modem on a pseudo-terminal.
+# Run directly to push alerts through SmsDispatcher over a real serial port
+# and check the AT state machine, retries, dedup/cooldown and the outbox.
+import os
+import sys
+import tempfile
+import threading
+import time
+import tty
+
+import serial
+
+MODEM_LATENCY = 0.3      # seconds before the network confirms a message
+
+
+class PtyModem:
+    # Answers like a SIM800 in text mode: OK to commands, "> " to AT+CMGS,
+    # "+CMGS: <ref>" some time after Ctrl-Z. fail_sends makes the listed
+    # message numbers answer +CMS ERROR; silent_sends never answer at all.
+    def __init__(self, fail_sends=(), silent_sends=()):
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.device = os.ttyname(slave)
+        self.fail_sends = set(fail_sends)
+        self.silent_sends = set(silent_sends)
+        self.commands = []
+        self.delivered = []
+        self.attempts = 0
+        self.running = True
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _reply(self, text, delay=0.0):
+        if delay:
+            threading.Timer(delay, os.write, (self.master, text.encode())).start()
+        else:
+            os.write(self.master, text.encode())
+
+    def _serve(self):
+        buffer = b""
+        message = None
+        while self.running:
+            try:
+                buffer += os.read(self.master, 1024)
+            except OSError:
+                return
+            while True:
+                if message is not None:
+                    for end in (b"\x1a", b"\x1b"):
+                        if end in buffer:
+                            body, _, buffer = buffer.partition(end)
+                            self._message_done(message, (message_body + body).decode(), end == b"\x1a")
+                            message = None
+                            break
+                    else:
+                        message_body, buffer = message_body + buffer, b""
+                        break
+                    continue
+                if b"\r\n" not in buffer:
+                    break
+                line, _, buffer = buffer.partition(b"\r\n")
+                command = line.decode()
+                self.commands.append(command)
+                if command.startswith("AT+CMGS="):
+                    message, message_body = command.split('"')[1], b""
+                    self._reply("\r\n> ")
+                else:
+                    self._reply("\r\nOK\r\n")
+
+    def _message_done(self, phone, body, submitted):
+        if not submitted:
+            return
+        self.attempts += 1
+        if self.attempts in self.silent_sends:
+            return
+        if self.attempts in self.fail_sends:
+            self._reply("\r\n+CMS ERROR: 500\r\n", MODEM_LATENCY)
+            return
+        self.delivered.append((phone, body))
+        self._reply(f"\r\n+CMGS: {len(self.delivered)}\r\n\r\nOK\r\n", MODEM_LATENCY)
+
+
+def load_flask2():
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "project"))
+    import flask2
+    return flask2
+
+
+def wait_for(predicate, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+if __name__ == "__main__":
+    flask2 = load_flask2()
+    db_path = os.path.join(tempfile.mkdtemp(), "telemetry.db")
+    phones = ["+256700000001", "+256700000002"]
+
+    # Message 2 is rejected by the network, message 4 is never answered
+    modem = PtyModem(fail_sends={2}, silent_sends={4})
+    port = serial.Serial(modem.device, 9600, timeout=0)
+    gsm = flask2.GsmModem(port, command_timeout=1, prompt_timeout=1, send_timeout=1.5)
+    outbox = flask2.SmsOutbox(db_path)
+    dispatcher = flask2.SmsDispatcher(gsm, outbox, cooldown=600, max_attempts=3, retry_delay=0.2)
+    dispatcher.start()
+
+    start = time.perf_counter()
+    queued = dispatcher.submit(phones, "CRITICAL:PH_ACIDIC_CRITICAL", "POND ALERT: pH 5.1")
+    submit_ms = (time.perf_counter() - start) * 1000
+    assert queued == 2, f"queued {queued} messages, expected 2"
+    assert submit_ms < 100, f"submit() took {submit_ms:.0f} ms"
+
+    # Same alert again: already queued, then within cooldown once sent
+    assert dispatcher.submit(phones, "CRITICAL:PH_ACIDIC_CRITICAL", "POND ALERT: pH 5.0") == 0
+    assert wait_for(lambda: outbox.pending_count() == 0, 15), "outbox did not drain"
+    assert dispatcher.submit(phones, "CRITICAL:PH_ACIDIC_CRITICAL", "POND ALERT: pH 5.0") == 0
+    assert modem.commands[:3] == ["AT", "ATE0", "AT+CMGF=1"], modem.commands[:3]
+
+    # A different alert is new information and goes out
+    assert dispatcher.submit(phones[:1], "CRITICAL:TEMP_HOT", "POND ALERT: 36.2C") == 1
+    assert wait_for(lambda: outbox.pending_count() == 0, 15), "second alert did not drain"
+    dispatcher.stop()
+
+    stats = dispatcher.stats()
+    assert sorted(modem.delivered) == sorted([(phones[0], "POND ALERT: pH 5.1"),
+                                              (phones[1], "POND ALERT: pH 5.1"),
+                                              (phones[0], "POND ALERT: 36.2C")]), modem.delivered
+    assert stats['sent'] == 3 and stats['failed'] == 0, stats
+    assert stats['retries'] == 2, f"expected a retry for the rejected and the unanswered send: {stats}"
+
+    # Messages queued while the worker is down survive a restart
+    dispatcher.submit(phones[:1], "WARNING:TURBID", "POND ALERT: turbid")
+    outbox.close()
+    reopened = flask2.SmsOutbox(db_path)
+    assert reopened.pending_count() == 1, "pending SMS lost across restart"
+    modem.running = False
+    print(f"OK: {stats['sent']} SMS over {modem.device}, submit() {submit_ms:.1f} ms, "
+          f"{stats['retries']} retries (one +CMS ERROR, one timeout), {stats['deduplicated']} suppressed, "
+          f"outbox persisted across restart")
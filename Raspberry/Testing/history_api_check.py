@@ -0,0 +1,35 @@
+# /api/history query check on simulated hardware.
+# Runs a few hours of cycles, then checks a normal query answers and that
+# non-finite times, bad buckets and too few points get a 400, not a 500.
+from check_rig import configure, start_monitor
+import flask2
+import simulated_hw
+
+configure()
+
+hardware = simulated_hw.SimulatedHardware(simulated_hw.SensorTrace.synthetic(days=1, seed=5))
+monitor = start_monitor(hardware)
+for _ in range(3 * 3600 // flask2.config.TEMP_READ_INTERVAL):
+    monitor.ds18b20.poll()
+    monitor.run_cycle()
+    hardware.clock.advance(flask2.config.TEMP_READ_INTERVAL)
+monitor.store.commit()
+flask2.monitor = monitor
+client = flask2.app.test_client()
+
+now = hardware.clock.time()
+response = client.get(f"/api/history?param=ph&from={now - 3 * 3600}&to={now}")
+assert response.status_code == 200, response.data
+assert response.get_json()['points'], "no history served"
+response = client.get(f"/api/history?param=ph&from={now - 3 * 3600}&to={now}&method=lttb&points=2")
+assert response.status_code == 200 and len(response.get_json()['points']) <= 2, response.data
+
+BAD = ("from=nan", "to=nan", "from=-inf", "to=inf", f"from={now - 3600}&to=nan",
+       "points=0", "points=-5", "method=lttb&points=1", "bucket=inf", "bucket=nan", "bucket=0")
+for query in BAD:
+    response = client.get(f"/api/history?param=ph&{query}")
+    assert response.status_code == 400, (query, response.status_code, response.data)
+    assert response.get_json()['error'].startswith("Bad query"), (query, response.data)
+
+monitor.cleanup()
+print(f"OK: history served, {len(BAD)} malformed queries answered 400")
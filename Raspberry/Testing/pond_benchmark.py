@@ -0,0 +1,149 @@
+# Throughput benchmark for the pond monitor on simulated hardware.
+# Replays a synthetic (or recorded CSV) sensor trace at accelerated time
+# through the full pipeline: acquisition, rules, pump, LCD and uplink.
+#
+#   python pond_benchmark.py                # one simulated month
+#   python pond_benchmark.py --days 2 --json
+#   python pond_benchmark.py --trace readings.csv --interval 60
+#   python pond_benchmark.py --days 7 --fixed-rate   # adaptive sampling off
+import argparse
+import json
+import time
+from collections import defaultdict
+
+from check_rig import configure, start_monitor
+import flask2
+import simulated_hw
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def wrap(self, obj, method, stage):
+        func = getattr(obj, method)
+        samples = self.samples[stage]
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+
+        setattr(obj, method, timed)
+
+    def summary(self):
+        result = {}
+        for stage, samples in self.samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            result[stage] = {
+                'calls': len(ordered),
+                'mean_us': sum(ordered) / len(ordered) * 1e6,
+                'p50_us': ordered[len(ordered) // 2] * 1e6,
+                'p95_us': ordered[int(len(ordered) * 0.95)] * 1e6,
+                'p99_us': ordered[int(len(ordered) * 0.99)] * 1e6,
+                'max_us': ordered[-1] * 1e6,
+            }
+        return result
+
+
+def run(days, interval, trace_path=None, seed=1, adaptive=True):
+    configure({
+        "TEMP_READ_INTERVAL": interval,
+        "PHONE_NUMBERS": ["+256700000001", "+256700000002"],
+        "LOGGING": {"LEVEL": "WARNING"},
+        "SAMPLING": {"ENABLED": adaptive},
+        "THINGSPEAK": {"MIN_SEND_INTERVAL": 0, "API_KEY": "BENCHMARK"}
+    })
+
+    if trace_path:
+        trace = simulated_hw.SensorTrace.from_csv(trace_path, interval)
+    else:
+        trace = simulated_hw.SensorTrace.synthetic(days=days, interval=interval, seed=seed)
+    hardware = simulated_hw.SimulatedHardware(trace)
+    monitor = start_monitor(hardware)
+    monitor.uplink.start()
+    monitor.sms.start()
+
+    timer = StageTimer()
+    for method, stage in [('sample_sensors', 'acquire'), ('filter_sample', 'filter'), ('ingest', 'ingest'),
+                          ('evaluate', 'rules'), ('publish', 'publish'),
+                          ('pump_control', 'pump'), ('pump_off', 'pump'),
+                          ('display_tick', 'lcd'), ('thingspeak_tick', 'uplink'),
+                          ('save_checkpoint', 'checkpoint'), ('run_cycle', 'cycle')]:
+        timer.wrap(monitor, method, stage)
+    # On the Pi the 1-Wire sampler has its own thread; run it off the simulated clock
+    if monitor.ds18b20:
+        monitor.scheduler.every(flask2.config.ONEWIRE.INTERVAL, monitor.ds18b20.poll, name="onewire")
+    # The scheduler holds bound methods captured at registration; re-point them
+    for task in monitor.scheduler.tasks.values():
+        task.func = getattr(monitor, task.func.__name__, task.func)
+
+    clock = hardware.clock
+    end = clock.time() + days * 86400
+    wall_start = time.perf_counter()
+    while True:
+        due = monitor.scheduler.next_due()
+        if due is None or due > end:
+            break
+        clock.now = max(clock.now, due)
+        monitor.scheduler.run_pending()
+    wall = time.perf_counter() - wall_start
+
+    monitor.uplink.stop()
+    monitor.sms.stop()
+    uplink = monitor.uplink.stats()
+    cycles = monitor.cycle_count
+    report = {
+        'backend': hardware.name,
+        'simulated_days': days,
+        'interval_s': interval,
+        'cycles': cycles,
+        'wall_s': wall,
+        'cycles_per_s': cycles / wall if wall else 0.0,
+        'speedup': days * 86400 / wall if wall else 0.0,
+        'pump_starts': len(timer.samples['pump']) // 2,
+        'sms_sent': len(hardware.gsm.outbox) if hardware.gsm else 0,
+        'uplink_sent': uplink['sent'],
+        'uplink_backlog': monitor.store.pending_count(),
+        'sampling': monitor.sampling.stats() if monitor.sampling else None,
+        'stages': timer.summary(),
+    }
+    monitor.cleanup()
+    return report
+
+
+def print_report(report):
+    print(f"Backend:        {report['backend']}")
+    sampling = report['sampling']
+    rate = (f"adaptive, {sampling['alerts']} alerts" if sampling else f"{report['interval_s']} s/cycle")
+    print(f"Simulated:      {report['simulated_days']} days ({rate})")
+    print(f"Cycles:         {report['cycles']} in {report['wall_s']:.2f} s wall "
+          f"({report['cycles_per_s']:.0f} cycles/s, {report['speedup']:.0f}x real time)")
+    print(f"Pump starts:    {report['pump_starts']}, SMS sent: {report['sms_sent']}")
+    print(f"Uplink:         {report['uplink_sent']} sent, {report['uplink_backlog']} in backlog")
+    print()
+    print(f"{'stage':<10}{'calls':>9}{'mean us':>10}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}{'max us':>11}")
+    for stage, s in report['stages'].items():
+        print(f"{stage:<10}{s['calls']:>9}{s['mean_us']:>10.1f}{s['p50_us']:>10.1f}"
+              f"{s['p95_us']:>10.1f}{s['p99_us']:>10.1f}{s['max_us']:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pond monitor pipeline on simulated hardware")
+    parser.add_argument("--days", type=float, default=30, help="simulated days to run (default 30)")
+    parser.add_argument("--interval", type=float, default=15, help="seconds between sensor cycles")
+    parser.add_argument("--trace", help="CSV trace to replay instead of the synthetic one")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the synthetic trace")
+    parser.add_argument("--fixed-rate", action="store_true", help="sample and upload at fixed intervals")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args.days, args.interval, args.trace, args.seed, adaptive=not args.fixed_rate)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
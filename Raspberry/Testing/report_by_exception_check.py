@@ -0,0 +1,182 @@
+# Report-by-exception check for the ThingSpeak uplink.
+# Replays averaged readings through ExceptionReporter and checks the channel
+# can rebuild every series from the uploads within twice the deadband, then
+# runs the monitor on simulated hardware against fake update and bulk_update
+# endpoints and compares request volume with the filter on and off. No tick
+# may send both a bulk POST and an update: the channel would refuse one.
+import os
+
+from check_rig import FakeSession, configure, start_monitor
+import flask2
+import simulated_hw
+
+work_dir = configure()
+reporting = flask2.config.REPORTING
+deadbands = reporting.DEADBAND.to_dict()
+
+# ---------------------------------------------------------------------------
+# Swinging door
+# ---------------------------------------------------------------------------
+
+door = flask2.SwingingDoor(0.5)
+assert all(door.update(t, 10 + 0.2 * (-1) ** t) is None for t in range(100)), "noise closed the door"
+door = flask2.SwingingDoor(0.5)
+assert all(door.update(t, 0.1 * t + 0.2 * (-1) ** t) is None for t in range(100)), "a straight ramp closed the door"
+# Ramp then flat: one turning point, at most 2 * deviation / slope after the corner
+door = flask2.SwingingDoor(0.5)
+points = [door.update(t, 0.1 * min(t, 99)) for t in range(200)]
+points = [p for p in points if p]
+assert len(points) == 1 and 99 <= points[0][0] <= 99 + 2 * 0.5 / 0.1, points
+
+# ---------------------------------------------------------------------------
+# Without a bulk path the reporter must not count on turning points
+# ---------------------------------------------------------------------------
+
+reporter = flask2.ExceptionReporter(deadbands, reporting.HEARTBEAT, coalesce=False)
+reporter.mark_sent(0, {'temperature': 25.0})
+for t in range(15, 121, 15):
+    reporter.observe(t, {'temperature': 26.0})
+assert not reporter.take_points()
+assert reporter.due(60, {'temperature': 26.0}) and reporter.due(120, {'temperature': 26.0}), \
+    "a 1 C step was held back until the heartbeat"
+
+# ---------------------------------------------------------------------------
+# Offline replay: what the channel receives is enough to rebuild the series
+# ---------------------------------------------------------------------------
+
+
+def interpolate(points, t):
+    # Linear interpolation over sorted (timestamp, value) points
+    for (t0, v0), (t1, v1) in zip(points, points[1:]):
+        if t0 <= t <= t1:
+            return v0 if t1 == t0 else v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+    return points[-1][1]
+
+
+trace = simulated_hw.SensorTrace.synthetic(days=2, seed=4)
+window = {field: flask2.RollingWindow(flask2.config.HISTORY_SIZE) for field in flask2.ExceptionReporter.SERIES}
+reporter = flask2.ExceptionReporter(deadbands, reporting.HEARTBEAT)
+received = {field: [] for field in flask2.ExceptionReporter.SERIES}
+observed = []
+uploads = 0
+for i in range(len(trace)):
+    t = i * trace.interval
+    sample = trace.at(t)
+    for field in window:
+        window[field].append(sample[field])
+    row = {field: window[field].mean for field in window}
+    reporter.observe(t, row)
+    observed.append((t, row))
+    if i % 4 == 3:
+        points = reporter.take_points()
+        reporter.mark_points_sent(points)
+        due = reporter.due(t, row)
+        for stamp, values in points:
+            uploads += 1
+            for field, value in values.items():
+                received[field].append((stamp, value))
+        if due:
+            uploads += 1
+            reporter.mark_sent(t, row)
+            for field, value in row.items():
+                received[field].append((t, value))
+
+fixed_uploads = len(trace) // 4
+errors = {}
+for field, points in received.items():
+    points.sort()
+    last = points[-1][0]
+    errors[field] = max(abs(interpolate(points, t) - row[field]) for t, row in observed if t <= last)
+    assert errors[field] <= 2 * deadbands[field] + 1e-9, (field, errors[field], deadbands[field])
+assert uploads * 3 < fixed_uploads, f"{uploads} uploads vs {fixed_uploads} at one per minute"
+
+# ---------------------------------------------------------------------------
+# Monitor: single updates and bulk rows actually sent
+# ---------------------------------------------------------------------------
+
+class BulkSession(FakeSession):
+    def post(self, url, json=None, timeout=None):
+        assert all("created_at" in update for update in json["updates"])
+        return super().post(url, json, timeout)
+
+
+def run(enabled, days=1, channel="42"):
+    flask2.configure({
+        "SAMPLING": {"ENABLED": False},
+        "REPORTING": {"ENABLED": enabled},
+        "CHECKPOINT": {"FILE": os.path.join(work_dir, f"state-{enabled}-{channel}.ckpt")},
+        "THINGSPEAK": {"BACKUP_DB": os.path.join(work_dir, f"telemetry-{enabled}-{channel}.db"),
+                       "BACKUP_FILE": os.path.join(work_dir, "backup.csv"),
+                       "API_KEY": "CHECK", "CHANNEL_ID": channel,
+                       "MIN_SEND_INTERVAL": 0, "BULK_MIN_INTERVAL": 0}
+    })
+    hardware = simulated_hw.SimulatedHardware(simulated_hw.SensorTrace.synthetic(days=days, seed=6))
+    session = BulkSession()
+    monitor = start_monitor(hardware, session)
+    monitor.uplink.start()
+    # Count from here: the connection test at start-up is one update too
+    session.reset()
+    sent, posted, reported, decisions = [], [], [], []
+    send = monitor.send_to_thingspeak
+    monitor.send_to_thingspeak = lambda data, timestamp, *a: (sent.append((monitor.clock.time(), dict(data))),
+                                                             send(data, timestamp, *a))[1]
+    if monitor.bulk_uploader:
+        upload = monitor.bulk_uploader.upload
+        monitor.bulk_uploader.upload = lambda rows: (posted.append(monitor.clock.time()), upload(rows))[1]
+    if monitor.reporter:
+        mark_sent = monitor.reporter.mark_sent
+        monitor.reporter.mark_sent = lambda now, data: (reported.append((now, dict(data))), mark_sent(now, data))[1]
+        due = monitor.reporter.due
+
+        def record_due(now, data):
+            decisions.append((dict(data), due(now, data)))
+            return decisions[-1][1]
+        monitor.reporter.due = record_due
+    clock = hardware.clock
+    end = clock.time() + days * 86400
+    while monitor.scheduler.next_due() <= end:
+        clock.now = max(clock.now, monitor.scheduler.next_due())
+        monitor.scheduler.run_pending()
+    monitor.uplink.stop()
+    stats = monitor.reporter.stats() if monitor.reporter else None
+    monitor.cleanup()
+    requests_made = {'get': len(session.gets), 'post': len(session.posts),
+                     'rows': sum(len(body["updates"]) for _, body in session.posts)}
+    return requests_made, sent, posted, reported, stats, decisions
+
+
+baseline, baseline_sent, _, _, _, _ = run(False)
+result, sent, posted, reported, stats, _ = run(True)
+assert baseline['get'] == len(baseline_sent) and result['get'] == len(sent)
+assert result['get'] * 3 < baseline['get'], f"{result['get']} updates vs {baseline['get']}"
+# Rows due at a tick with turning points to post ride in the same bulk update
+in_bulk = len(reported) - len(sent)
+assert stats['coalesced'] and in_bulk and result['rows'] == stats['coalesced'] + in_bulk, (stats, result, in_bulk)
+assert result['post'] <= stats['reports'] + stats['suppressed'], "turning points were not coalesced"
+clashes = set(posted) & {t for t, _ in sent}
+assert not clashes, f"{len(clashes)} ticks sent a bulk POST and an update back to back"
+
+# Every status change reaches the channel at the tick that saw it
+statuses = [data['quality_status'] for _, data in baseline_sent]
+changes = sum(1 for a, b in zip(statuses, statuses[1:]) if a != b)
+sent_statuses = [data['quality_status'] for _, data in reported]
+assert sum(1 for a, b in zip(sent_statuses, sent_statuses[1:]) if a != b) == changes
+
+# No CHANNEL_ID, so no bulk endpoint: single updates only, and every skipped
+# row is within the deadband of the last one actually sent
+single, single_sent, _, single_reported, single_stats, decisions = run(True, channel="")
+assert single['post'] == 0 and single_stats['coalesced'] == 0 and single['get'] == len(single_sent)
+assert single['get'] * 2 < baseline['get'], f"{single['get']} updates vs {baseline['get']}"
+last = None
+for data, due in decisions:
+    if due:
+        last = data
+        continue
+    for field in flask2.ExceptionReporter.SERIES:
+        if data[field] is not None and last[field] is not None:
+            assert abs(data[field] - last[field]) <= deadbands[field], (field, data[field], last[field])
+
+print(f"OK: replay {uploads} uploads vs {fixed_uploads} fixed, max rebuild error "
+      f"{ {f: round(e, 3) for f, e in errors.items()} }; monitor {result['get']} updates + "
+      f"{result['rows']} bulk rows ({in_bulk} current) in {result['post']} POSTs vs {baseline['get']} updates, "
+      f"{changes} status changes all sent; {single['get']} updates without a bulk endpoint")
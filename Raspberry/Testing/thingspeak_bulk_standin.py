@@ -0,0 +1,172 @@
+# Local stand-in for ThingSpeak's bulk_update.json and update endpoints.
+# Run directly to drain a synthetic 1,000-row backlog through
+# ThingSpeakBulkUploader and check every row arrives with its timestamp, then
+# replay a backlog through UplinkWorker and check a row the channel keeps
+# refusing is dropped instead of being resent on every flush.
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_KEY = "STANDINKEY"
+CHANNEL_ID = "123456"
+MAX_UPDATES = 960
+# A field1 value the update endpoint refuses, standing in for any update
+# ThingSpeak answers with "0"
+REFUSED_FIELD1 = "99.0"
+
+
+class BulkUpdateHandler(BaseHTTPRequestHandler):
+    # Mimics ThingSpeak: 202 on success, 429 when posting faster than the
+    # channel rate limit, 401 on a bad key, 400 on an oversized/invalid body
+    min_interval = 1.0
+    fail_every = 0
+    last_post = 0.0
+    posts = 0
+    received = []
+    gets = 0
+    refused = 0
+    updates = []
+    lock = threading.Lock()
+
+    def _reply(self, code, body):
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        if not re.fullmatch(rf"/channels/{CHANNEL_ID}/bulk_update\.json", self.path):
+            return self._reply(404, {"status": "404", "error": "Not Found"})
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            return self._reply(400, {"status": "400", "error": "Invalid JSON"})
+        if body.get("write_api_key") != API_KEY:
+            return self._reply(401, {"status": "401", "error": "Unauthorized"})
+        updates = body.get("updates") or []
+        if len(updates) > MAX_UPDATES or any("created_at" not in u for u in updates):
+            return self._reply(400, {"status": "400", "error": "Bad updates"})
+
+        cls = type(self)
+        with cls.lock:
+            now = time.time()
+            if now - cls.last_post < cls.min_interval:
+                return self._reply(429, {"status": "429", "error": "Too Many Requests"})
+            cls.posts += 1
+            if cls.fail_every and cls.posts % cls.fail_every == 0:
+                return self._reply(503, {"status": "503", "error": "Service Unavailable"})
+            cls.last_post = now
+            cls.received.extend(updates)
+        self._reply(202, {"success": True})
+
+    def do_GET(self):
+        # Single updates: the entry number, or "0" when the update is refused
+        url = urlparse(self.path)
+        if url.path != "/update":
+            return self._reply(404, {"status": "404", "error": "Not Found"})
+        query = parse_qs(url.query)
+        cls = type(self)
+        with cls.lock:
+            cls.gets += 1
+            if query.get("api_key") != [API_KEY] or query.get("field1") == [REFUSED_FIELD1]:
+                cls.refused += 1
+                result = "0"
+            else:
+                cls.updates.append(query)
+                result = str(len(cls.updates))
+        payload = result.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(min_interval=1.0, fail_every=0):
+    BulkUpdateHandler.min_interval = min_interval
+    BulkUpdateHandler.fail_every = fail_every
+    BulkUpdateHandler.received = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BulkUpdateHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def load_flask2():
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "project"))
+    import flask2
+    return flask2
+
+
+if __name__ == "__main__":
+    flask2 = load_flask2()
+    ROWS = 1000
+
+    server = start_server(min_interval=1.0, fail_every=2)
+    url = f"http://127.0.0.1:{server.server_port}/channels/{CHANNEL_ID}/bulk_update.json"
+
+    store = flask2.TelemetryStore(os.path.join(tempfile.mkdtemp(), "telemetry.db"))
+    base = time.time() - ROWS * 60
+    timestamps = []
+    for i in range(ROWS):
+        ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(base + i * 60))
+        timestamps.append(ts)
+        store.add(ts, {"temperature": 24.0 + i % 5, "ph": 7.1, "quality_score": 0, "quality_status": "GOOD"})
+    store.commit()
+
+    uploader = flask2.ThingSpeakBulkUploader(url, API_KEY, chunk_size=MAX_UPDATES,
+                                             min_interval=1.0, retry_delay=0.2)
+    start = time.time()
+    while True:
+        page = store.pending(uploader.chunk_size)
+        if not page:
+            break
+        sent = uploader.upload(page)
+        assert sent, "bulk upload made no progress"
+        store.mark_sent(sent)
+    elapsed = time.time() - start
+
+    received = BulkUpdateHandler.received
+    assert len(received) == ROWS, f"server received {len(received)} of {ROWS} rows"
+    assert [u["created_at"] for u in received] == [uploader.created_at(ts) for ts in timestamps]
+    assert store.pending_count() == 0
+
+    # Backlog replay through single updates: one row is refused every time
+    store = flask2.TelemetryStore(os.path.join(tempfile.mkdtemp(), "telemetry.db"))
+    for i in range(6):
+        ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(base + i * 60))
+        store.add(ts, {"temperature": float(REFUSED_FIELD1) if i == 2 else 24.0 + i, "ph": 7.1})
+    store.commit()
+    worker = flask2.UplinkWorker(f"http://127.0.0.1:{server.server_port}/update", API_KEY, store,
+                                 min_interval=0, max_rejections=3)
+    worker.start()
+
+    def flush():
+        # What flush_thingspeak_backup does without a bulk uploader
+        for row_id, ts, row in store.pending():
+            worker.submit(ts, {k: v for k, v in row.items() if v is not None}, row_id)
+        deadline = time.time() + 10
+        while worker.stats()['backlog_in_flight'] and time.time() < deadline:
+            time.sleep(0.01)
+
+    for _ in range(worker.max_rejections + 2):
+        flush()
+    worker.stop()
+    assert len(BulkUpdateHandler.updates) == 5, f"{len(BulkUpdateHandler.updates)} of 5 good rows uploaded"
+    assert BulkUpdateHandler.refused == worker.max_rejections, \
+        f"refused row sent {BulkUpdateHandler.refused} times, expected {worker.max_rejections}"
+    assert store.pending_count() == 0 and worker.metrics['rejected'] == 1
+    server.shutdown()
+    print(f"OK: drained {ROWS} rows in {elapsed:.1f}s over {BulkUpdateHandler.posts} POSTs "
+          f"(every 2nd POST answered 503 and was retried); refused backlog row dropped after "
+          f"{BulkUpdateHandler.refused} tries, {len(BulkUpdateHandler.updates)} others uploaded once each")
@@ -0,0 +1,51 @@
+# Stall watchdog check.
+# Hangs a task on a real scheduler thread and checks the watchdog, running
+# on its own thread, still reports it; a healthy scheduler is never flagged.
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "project"))
+import flask2  # noqa: E402
+
+# The stall reports are expected here; keep them off the console
+flask2.logger.setLevel("CRITICAL")
+
+scheduler = flask2.Scheduler()
+release = threading.Event()
+hung = threading.Event()
+
+
+def stuck():
+    hung.set()
+    release.wait()
+
+
+scheduler.every(0.05, lambda: None, name="tick")
+scheduler.every(0.05, stuck, name="stuck", delay=0.2)
+watchdog = flask2.SchedulerWatchdog(scheduler, interval=0.05, timeout=0.3)
+flagged = []
+check = watchdog.check
+watchdog.check = lambda: flagged.append(check())
+
+scheduler.start()
+watchdog.start()
+time.sleep(0.15)
+assert not any(flagged), f"healthy scheduler flagged: {flagged}"
+
+assert hung.wait(2)
+deadline = time.monotonic() + 3
+while not (flagged and 'tick' in flagged[-1]) and time.monotonic() < deadline:
+    time.sleep(0.05)
+assert flagged and 'tick' in flagged[-1], "watchdog missed the stuck scheduler thread"
+stalls = flask2.METRICS.counter("pond_watchdog_stalls_total", "", task="tick").value
+assert stalls >= 1, stalls
+
+release.set()
+watchdog.stop()
+scheduler.stop()
+watchdog.thread.join(1)
+assert not watchdog.thread.is_alive()
+print(f"OK: watchdog flagged the stuck scheduler after {len(flagged)} checks "
+      f"({stalls:.0f} stall reports for 'tick')")
@@ -39,6 +39,7 @@ import minimalmodbus  # For RS485 Modbus communication
 from RPLCD.i2c import CharLCD  # For I2C LCD display control
 import threading  # For concurrent operations
 from collections import deque  # For efficient historical data storage
+from dataclasses import make_dataclass  # For the frozen, typed configuration
 import requests  # For HTTP requests to ThingSpeak API
 import csv
 import json
@@ -219,33 +220,121 @@ def restart_network_interface():
         logger.error(f"Failed to restart network interface: {e}")
         return False
 
+class ConfigSection:
+    """
+    Frozen, typed configuration node built from the DEFAULT_CONFIG schema.
+    
+    Each section of DEFAULT_CONFIG becomes a frozen dataclass, so the hot
+    paths read settings with a plain attribute lookup (config.GPIO.PUMP_PIN)
+    instead of chained dict.get() calls with repeated fallback values.
+    get() keeps dict-style lookups working for keys chosen at run time,
+    such as the pump mode in PUMP_RUN_DURATION.
+    """
+    
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__dataclass_fields__ else default
+
+def _section_classes(name, defaults, classes, path=""):
+    """
+    Create one frozen dataclass per (nested) section of DEFAULT_CONFIG.
+    
+    Returns:
+        dict: Dataclass per section path ("" for the top level, "GPIO", ...)
+    """
+    fields = []
+    for key, default in defaults.items():
+        if isinstance(default, dict):
+            _section_classes(key, default, classes, f"{path}{key}.")
+            fields.append((key, classes[f"{path}{key}"]))
+        else:
+            fields.append((key, tuple if isinstance(default, list) else type(default)))
+    class_name = "".join(part.title() for part in name.split("_")) + "Config"
+    classes[path.rstrip(".")] = make_dataclass(class_name, fields, bases=(ConfigSection,), frozen=True)
+    return classes
+
+CONFIG_CLASSES = _section_classes("POND", DEFAULT_CONFIG, {})
+
+def _check_value(path, default, value, errors):
+    """
+    Check one setting against the type of its default.
+    
+    Returns:
+        The value to use: the setting itself, or the default if it is invalid
+    """
+    if isinstance(default, bool):
+        if isinstance(value, bool):
+            return value
+        errors.append(f"{path}: expected true/false, got {value!r}")
+    elif isinstance(default, (int, float)):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+        errors.append(f"{path}: expected a number, got {value!r}")
+    elif isinstance(default, str):
+        if isinstance(value, str):
+            return value
+        errors.append(f"{path}: expected a string, got {value!r}")
+    elif isinstance(default, list):
+        if isinstance(value, list):
+            return tuple(value)
+        errors.append(f"{path}: expected a list, got {value!r}")
+        return tuple(default)
+    else:
+        return value
+    return default
+
+def build_config(values, defaults=DEFAULT_CONFIG, errors=None, path=""):
+    """
+    Build the frozen configuration from user values layered over the defaults.
+    
+    Nested sections are merged key by key, so a partial section in the file
+    keeps the defaults for every key it leaves out. Settings of the wrong
+    type fall back to their default and unknown keys are ignored; both are
+    collected in `errors` for the caller to log.
+    
+    Returns:
+        ConfigSection: Frozen configuration for `path` ("" for the whole tree)
+    """
+    errors = [] if errors is None else errors
+    kwargs = {}
+    for key, default in defaults.items():
+        where = f"{path}{key}"
+        value = values.get(key, default)
+        if isinstance(default, dict):
+            if not isinstance(value, dict):
+                errors.append(f"{where}: expected an object")
+                value = default
+            kwargs[key] = build_config(value, default, errors, f"{where}.")
+        else:
+            kwargs[key] = _check_value(where, default, value, errors)
+    for key in values:
+        if key not in defaults:
+            errors.append(f"{path}{key}: unknown setting (ignored)")
+    return CONFIG_CLASSES[path.rstrip(".")](**kwargs)
+
 def load_config():
     """
     Load configuration from JSON file or create default configuration file.
     
-    This function implements a merge strategy: user-defined values in the config
-    file override defaults, but nested dictionaries are merged rather than replaced.
-    This allows partial configuration updates without losing default values.
+    User-defined values in the config file override defaults; nested sections
+    are merged rather than replaced, so partial configuration updates keep
+    the remaining default values. The result is frozen and typed (see
+    ConfigSection), and DEFAULT_CONFIG itself is never modified.
     
     Returns:
-        dict: Configuration dictionary with user overrides applied to defaults
+        ConfigSection: Configuration with user overrides applied to defaults
     """
     if os.path.exists(CONFIG_FILE):
         try:
             with open(CONFIG_FILE, 'r') as f:
                 user_config = json.load(f)
-                merged_config = DEFAULT_CONFIG.copy()
-                
-                # Merge user config with defaults
-                # Nested dicts are merged, top-level values are replaced
-                for key, value in user_config.items():
-                    if key in merged_config and isinstance(merged_config[key], dict) and isinstance(value, dict):
-                        merged_config[key].update(value)  # Merge nested dictionaries
-                    else:
-                        merged_config[key] = value  # Replace top-level values
-                        
-                logger.info(f"✅ Configuration loaded from {CONFIG_FILE}")
-                return merged_config
+            if not isinstance(user_config, dict):
+                raise ValueError("top level must be an object")
+            errors = []
+            loaded = build_config(user_config, errors=errors)
+            for error in errors:
+                logger.warning(f"⚠️ Config {error}")
+            logger.info(f"✅ Configuration loaded from {CONFIG_FILE}")
+            return loaded
         except Exception as e:
             logger.error(f"Error loading config: {e}. Using defaults.")
     else:
@@ -257,7 +346,7 @@ def load_config():
         except Exception as e:
             logger.error(f"Error creating config file: {e}")
 
-    return DEFAULT_CONFIG
+    return build_config({})
 
 # Load configuration at module import time
 config = load_config()
@@ -302,7 +391,7 @@ def ensure_backup_file_exists():
     Returns:
         bool: True if backup file exists or was created, False on error
     """
-    backup_file = config.get('THINGSPEAK', {}).get('BACKUP_FILE')
+    backup_file = config.THINGSPEAK.BACKUP_FILE
     if not backup_file:
         logger.error("BACKUP_FILE not found in configuration.")
         return False
@@ -416,12 +505,12 @@ class SmartFishPondMonitor:
         # Automatically discards oldest values when maxlen is reached
         # This provides moving averages and trend analysis without manual array management
         self.history = {
-            'temp': deque(maxlen=config.get('HISTORY_SIZE', 5)),
-            'ph': deque(maxlen=config.get('HISTORY_SIZE', 5)),
-            'ec': deque(maxlen=config.get('HISTORY_SIZE', 5)),
-            'nitrogen': deque(maxlen=config.get('HISTORY_SIZE', 5)),
-            'phosphorus': deque(maxlen=config.get('HISTORY_SIZE', 5)),
-            'turbidity': deque(maxlen=config.get('HISTORY_SIZE', 5))
+            'temp': deque(maxlen=config.HISTORY_SIZE),
+            'ph': deque(maxlen=config.HISTORY_SIZE),
+            'ec': deque(maxlen=config.HISTORY_SIZE),
+            'nitrogen': deque(maxlen=config.HISTORY_SIZE),
+            'phosphorus': deque(maxlen=config.HISTORY_SIZE),
+            'turbidity': deque(maxlen=config.HISTORY_SIZE)
         }
 
         # ====================================================================
@@ -432,25 +521,25 @@ class SmartFishPondMonitor:
             GPIO.setmode(GPIO.BCM)
             
             # Configure input pin for turbidity sensor (pull-up resistor enabled)
-            GPIO.setup(config.get('GPIO', {}).get('TURBIDITY_PIN', 17), GPIO.IN, pull_up_down=GPIO.PUD_UP)
+            GPIO.setup(config.GPIO.TURBIDITY_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
             
             # Configure output pins for status LEDs
-            GPIO.setup(config.get('GPIO', {}).get('BLUE_LED_PIN', 27), GPIO.OUT)   # GOOD status
-            GPIO.setup(config.get('GPIO', {}).get('YELLOW_LED_PIN', 22), GPIO.OUT) # WARNING status
-            GPIO.setup(config.get('GPIO', {}).get('RED_LED_PIN', 5), GPIO.OUT)     # CRITICAL status
+            GPIO.setup(config.GPIO.BLUE_LED_PIN, GPIO.OUT)   # GOOD status
+            GPIO.setup(config.GPIO.YELLOW_LED_PIN, GPIO.OUT) # WARNING status
+            GPIO.setup(config.GPIO.RED_LED_PIN, GPIO.OUT)     # CRITICAL status
             
             # Configure output pins for buzzer and pump
-            GPIO.setup(config.get('GPIO', {}).get('BUZZER_PIN', 18), GPIO.OUT)
-            GPIO.setup(config.get('GPIO', {}).get('PUMP_PIN', 16), GPIO.OUT)
+            GPIO.setup(config.GPIO.BUZZER_PIN, GPIO.OUT)
+            GPIO.setup(config.GPIO.PUMP_PIN, GPIO.OUT)
 
             # Initialize PWM for buzzer (1000 Hz frequency)
             # PWM allows volume control via duty cycle
-            self.pwm_buzzer = GPIO.PWM(config.get('GPIO', {}).get('BUZZER_PIN', 18), 1000)
+            self.pwm_buzzer = GPIO.PWM(config.GPIO.BUZZER_PIN, 1000)
             self.pwm_buzzer.start(0)  # Start with 0% duty cycle (silent)
 
             # Initialize all LEDs to OFF and pump to OFF (HIGH = relay off)
             self.set_leds(0, 0, 0)
-            GPIO.output(config.get('GPIO', {}).get('PUMP_PIN', 16), GPIO.HIGH)
+            GPIO.output(config.GPIO.PUMP_PIN, GPIO.HIGH)
             logger.info("✅ GPIO initialized successfully")
         except Exception as e:
             logger.error(f"GPIO initialization failed: {e}")
@@ -498,13 +587,13 @@ class SmartFishPondMonitor:
             bool: True if connection test succeeds, False otherwise
         """
         test_payload = {
-            "api_key": config.get('THINGSPEAK', {}).get('API_KEY'),
+            "api_key": config.THINGSPEAK.API_KEY,
             "field1": 25.0  # Test value for temperature field
         }
         
         try:
             response = requests.get(
-                config.get('THINGSPEAK', {}).get('URL'),
+                config.THINGSPEAK.URL,
                 params=test_payload,
                 timeout=10
             )
@@ -571,8 +660,8 @@ class SmartFishPondMonitor:
         try:
             # Create Modbus instrument with port and slave ID
             instrument = minimalmodbus.Instrument(
-                config.get('SENSORS', {}).get('RS485_PORT', '/dev/ttyUSB0'),
-                config.get('SENSORS', {}).get('RS485_SLAVE_ID', 1)
+                config.SENSORS.RS485_PORT,
+                config.SENSORS.RS485_SLAVE_ID
             )
             # Configure serial communication parameters
             instrument.serial.baudrate = 9600
@@ -620,8 +709,8 @@ class SmartFishPondMonitor:
 
     def _init_gsm(self):
         try:
-            ser = serial.Serial(port=config.get('SENSORS', {}).get('GSM_PORT', "/dev/serial0"),
-                              baudrate=config.get('SENSORS', {}).get('GSM_BAUDRATE', 9600), timeout=5)
+            ser = serial.Serial(port=config.SENSORS.GSM_PORT,
+                              baudrate=config.SENSORS.GSM_BAUDRATE, timeout=5)
             self.send_at_command(ser, "AT", 1)
             self.send_at_command(ser, "ATE0", 1)
             self.send_at_command(ser, "AT+CMGF=1", 1)
@@ -658,7 +747,7 @@ class SmartFishPondMonitor:
 
     def read_turbidity(self):
         try:
-            return GPIO.input(config.get('GPIO', {}).get('TURBIDITY_PIN', 17)) == 0
+            return GPIO.input(config.GPIO.TURBIDITY_PIN) == 0
         except:
             return None
 
@@ -966,9 +1055,9 @@ class SmartFishPondMonitor:
 
     def set_leds(self, blue, yellow, red):
         try:
-            GPIO.output(config.get('GPIO', {}).get('BLUE_LED_PIN', 27), blue)
-            GPIO.output(config.get('GPIO', {}).get('YELLOW_LED_PIN', 22), yellow)
-            GPIO.output(config.get('GPIO', {}).get('RED_LED_PIN', 5), red)
+            GPIO.output(config.GPIO.BLUE_LED_PIN, blue)
+            GPIO.output(config.GPIO.YELLOW_LED_PIN, yellow)
+            GPIO.output(config.GPIO.RED_LED_PIN, red)
         except Exception as e:
             logger.debug(f"LED control error: {e}")
 
@@ -1036,7 +1125,7 @@ class SmartFishPondMonitor:
                     logger.info("⚠️ Critical condition detected. Starting 5-minute timer before SMS alert.")
 
                 elif (not self.state['critical']['alert_sent'] and
-                      current_time - self.state['critical']['start_time'] > config.get('CRITICAL_DURATION', 300)):
+                      current_time - self.state['critical']['start_time'] > config.CRITICAL_DURATION):
                     logger.info("🚨 Sustained critical condition confirmed. Sending SMS alert.")
                     self._send_sms_message(status)
                     self.state['sms']['last_sent_time'] = current_time
@@ -1062,7 +1151,7 @@ class SmartFishPondMonitor:
             message += f"\n\nActions:\n" + "\n".join(list(status['recommendations'])[:2])
 
         with self.gsm_lock:
-            for phone in config.get('PHONE_NUMBERS', []):
+            for phone in config.PHONE_NUMBERS:
                 try:
                     self.gsm.write(f'AT+CMGS="{phone}"\r\n'.encode())
                     time.sleep(1)
@@ -1089,17 +1178,17 @@ class SmartFishPondMonitor:
                 
                 if should_activate:
                     logger.info(f"▶️ Activating PUMP in {pump_mode} mode.")
-                    GPIO.output(config.get('GPIO', {}).get('PUMP_PIN', 16), GPIO.LOW)
+                    GPIO.output(config.GPIO.PUMP_PIN, GPIO.LOW)
                     with self.state_lock:
                         self.state['pump']['is_running'] = True
                         self.state['pump']['start_time'] = time.time()
                         self.state['pump']['should_run'] = False
 
                 if is_running:
-                    run_duration = config.get('PUMP_RUN_DURATION', {}).get(pump_mode, 300)
+                    run_duration = config.PUMP_RUN_DURATION.get(pump_mode, 300)
                     if time.time() - start_time > run_duration:
                         logger.info(f"⏹️ {pump_mode} pump cycle complete. Turning PUMP OFF.")
-                        GPIO.output(config.get('GPIO', {}).get('PUMP_PIN', 16), GPIO.HIGH)
+                        GPIO.output(config.GPIO.PUMP_PIN, GPIO.HIGH)
                         with self.state_lock:
                             self.state['pump']['is_running'] = False
                             self.state['pump']['mode'] = "OFF"
@@ -1344,7 +1433,7 @@ class SmartFishPondMonitor:
                 
                 self.state['indicators']['lcd_screen'] += 1
                 self.thread_watchdog['display'] = time.time()
-                time.sleep(config.get('LCD_REFRESH_INTERVAL', 5))
+                time.sleep(config.LCD_REFRESH_INTERVAL)
             except Exception as e:
                 logger.error(f"Error in display_loop: {e}")
                 self.thread_watchdog['display'] = time.time()
@@ -1410,7 +1499,7 @@ class SmartFishPondMonitor:
         Returns:
             bool: True if upload successful, False otherwise
         """
-        if not config.get('THINGSPEAK', {}).get('API_KEY'):
+        if not config.THINGSPEAK.API_KEY:
             logger.warning("ThingSpeak API key not configured")
             return False
 
@@ -1419,7 +1508,7 @@ class SmartFishPondMonitor:
             return False
 
         # Build payload with API key and sensor data
-        payload = {"api_key": config.get('THINGSPEAK', {}).get('API_KEY')}
+        payload = {"api_key": config.THINGSPEAK.API_KEY}
         
         # Map sensor data to ThingSpeak fields (only include non-None values)
         if data.get('temperature') is not None:
@@ -1445,9 +1534,9 @@ class SmartFishPondMonitor:
             payload['field8'] = status_code
             logger.debug(f"Sending status '{status_text}' as code {status_code} to Field 8")
 
-        max_retries = config.get('THINGSPEAK', {}).get('MAX_RETRIES', 3)
-        initial_delay = config.get('THINGSPEAK', {}).get('RETRY_DELAY', 5)
-        max_delay = config.get('THINGSPEAK', {}).get('MAX_RETRY_DELAY', 60)
+        max_retries = config.THINGSPEAK.MAX_RETRIES
+        initial_delay = config.THINGSPEAK.RETRY_DELAY
+        max_delay = config.THINGSPEAK.MAX_RETRY_DELAY
 
         for attempt in range(max_retries):
             if time.time() - self.state['thingspeak']['last_network_check'] > 30:
@@ -1468,7 +1557,7 @@ class SmartFishPondMonitor:
 
             try:
                 response = requests.get(
-                    config.get('THINGSPEAK', {}).get('URL'), 
+                    config.THINGSPEAK.URL, 
                     params=payload, 
                     timeout=10
                 )
@@ -1518,7 +1607,7 @@ class SmartFishPondMonitor:
         return False
 
     def save_thingspeak_backup(self, timestamp, data):
-        backup_file = config.get('THINGSPEAK', {}).get('BACKUP_FILE')
+        backup_file = config.THINGSPEAK.BACKUP_FILE
         if not backup_file:
             logger.error("Backup file path not configured.")
             return
@@ -1548,7 +1637,7 @@ class SmartFishPondMonitor:
             logger.error(f"Error saving ThingSpeak backup: {e}")
 
     def flush_thingspeak_backup(self):
-        backup_file = config.get('THINGSPEAK', {}).get('BACKUP_FILE')
+        backup_file = config.THINGSPEAK.BACKUP_FILE
         if not backup_file or not os.path.exists(backup_file):
             return
 
@@ -1652,7 +1741,7 @@ class SmartFishPondMonitor:
         while self.state['running']:
             try:
                 current_time = time.time()
-                send_interval = config.get('THINGSPEAK', {}).get('SEND_INTERVAL', 60)
+                send_interval = config.THINGSPEAK.SEND_INTERVAL
                 
                 if current_time - self.state['thingspeak']['last_sent_time'] >= send_interval:
                     data = {
@@ -1719,7 +1808,7 @@ class SmartFishPondMonitor:
                         print("\n❌ ERROR: Failed to read from RS485 sensor. Check wiring and power.")
                         print("Waiting for sensor data...")
                         first_cycle = False
-                    time.sleep(config.get('TEMP_READ_INTERVAL', 15))
+                    time.sleep(config.TEMP_READ_INTERVAL)
                     continue
 
                 first_cycle = False
@@ -1778,7 +1867,7 @@ class SmartFishPondMonitor:
                 self.update_indicators(status)
 
                 self.thread_watchdog['monitor'] = time.time()
-                time.sleep(config.get('TEMP_READ_INTERVAL', 15))
+                time.sleep(config.TEMP_READ_INTERVAL)
                 
             except KeyboardInterrupt:
                 self.state['running'] = False
@@ -1814,7 +1903,7 @@ class SmartFishPondMonitor:
             except:
                 pass
 
-        GPIO.output(config.get('GPIO', {}).get('PUMP_PIN', 16), GPIO.HIGH)
+        GPIO.output(config.GPIO.PUMP_PIN, GPIO.HIGH)
         logger.info("Pump turned OFF.")
 
         if self.gsm:
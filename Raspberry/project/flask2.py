@@ -3,24 +3,71 @@
 import os
 import glob
 import time
-import serial
 import random
-import RPi.GPIO as GPIO
+import math
 from datetime import datetime
-import minimalmodbus
-from RPLCD.i2c import CharLCD
 import threading
+import queue
+import array
+import bisect
+import heapq
+import itertools
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 import csv
 import json
+import gzip
+import hashlib
+import sqlite3
+import struct
+import zlib
 import logging
 from pathlib import Path
 import sys
 import socket
 import subprocess
-import re
-from flask import Flask, render_template_string, jsonify
+from dataclasses import dataclass, make_dataclass, replace
+from types import MappingProxyType
+from typing import Mapping, Optional
+from flask import Flask, jsonify, request, Response
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Hardware libraries are only needed by PiHardware; the simulated backends in
+# simulated_hw.py let the monitor run (and be benchmarked) on any Linux box.
+try:
+    import RPi.GPIO as GPIO
+except (ImportError, RuntimeError):
+    GPIO = None
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+try:
+    import minimalmodbus
+    ModbusIllegalRequest = minimalmodbus.IllegalRequestError
+except ImportError:
+    minimalmodbus = None
+
+    class ModbusIllegalRequest(Exception):
+        pass
+
+try:
+    from RPLCD.i2c import CharLCD
+except ImportError:
+    CharLCD = None
 
 # ============================================================================
 # LOGGING CONFIGURATION
@@ -29,6 +76,126 @@ from flask import Flask, render_template_string, jsonify
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def log_event(record, event_id=None):
+    # Structured form of a log record; `extra={'event': ..., 'fields': {...}}` adds data
+    event = {
+        'time': round(record.created, 3),
+        'level': record.levelname,
+        'message': record.getMessage()
+    }
+    if event_id is not None:
+        event['id'] = event_id
+    if hasattr(record, 'event'):
+        event['event'] = record.event
+    if hasattr(record, 'fields'):
+        event['fields'] = record.fields
+    return event
+
+class EventRing(logging.Handler):
+    """The most recent log records, kept in memory for /api/events.
+
+    Records are stored as-is and only formatted when someone reads them,
+    so a busy log costs one deque append per record and a fixed amount
+    of memory.
+    """
+
+    def __init__(self, capacity=500, level=logging.INFO):
+        super().__init__(level)
+        self.events = deque(maxlen=capacity)
+        self.sequence = itertools.count(1)
+
+    def resize(self, capacity):
+        with self.lock:
+            if capacity != self.events.maxlen:
+                self.events = deque(self.events, maxlen=capacity)
+
+    def emit(self, record):
+        self.events.append((next(self.sequence), record))
+
+    def snapshot(self, since=0, level=logging.NOTSET, limit=100):
+        with self.lock:
+            records = list(self.events)
+        selected = [(i, r) for i, r in records if i > since and r.levelno >= level]
+        return [log_event(record, i) for i, record in selected[-limit:]]
+
+    @property
+    def last_id(self):
+        return self.events[-1][0] if self.events else 0
+
+class BatchedFileLog(logging.Handler):
+    """JSON-lines event file written in one write() per flush().
+
+    Records wait in a bounded buffer (the oldest are dropped and counted if
+    flush() falls behind). Once the file passes max_bytes it is gzipped to
+    <path>.1.gz and older archives shift up, keeping `backups` of them.
+    """
+
+    def __init__(self, path, max_bytes=1 << 20, backups=5, max_buffer=1000, level=logging.INFO):
+        super().__init__(level)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffer = deque(maxlen=max_buffer)
+        self.dropped = 0
+        self.writes = 0
+        self.rotations = 0
+        try:
+            self.size = os.path.getsize(path)
+        except OSError:
+            self.size = 0
+
+    def emit(self, record):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(record)
+
+    def flush(self):
+        with self.lock:
+            if not self.buffer:
+                return 0
+            records = list(self.buffer)
+            self.buffer.clear()
+            data = "".join(json.dumps(log_event(r), ensure_ascii=False, default=str) + "\n" for r in records)
+            data = data.encode()
+            try:
+                with open(self.path, "ab") as f:
+                    f.write(data)
+            except OSError as e:
+                self.dropped += len(records)
+                sys.stderr.write(f"Event log write failed: {e}\n")
+                return 0
+            self.writes += 1
+            self.size += len(data)
+            if self.size >= self.max_bytes:
+                self.rotate()
+            return len(records)
+
+    def rotate(self):
+        try:
+            for i in range(self.backups - 1, 0, -1):
+                older = f"{self.path}.{i}.gz"
+                if os.path.exists(older):
+                    os.replace(older, f"{self.path}.{i + 1}.gz")
+            with open(self.path, "rb") as f:
+                compressed = gzip.compress(f.read(), compresslevel=6)
+            with open(self.path + ".1.gz.tmp", "wb") as f:
+                f.write(compressed)
+            os.replace(self.path + ".1.gz.tmp", self.path + ".1.gz")
+            os.remove(self.path)
+            self.size = 0
+            self.rotations += 1
+        except OSError as e:
+            sys.stderr.write(f"Event log rotation failed: {e}\n")
+
+    def close(self):
+        self.flush()
+        super().close()
+
+# Always on; configure_logging() sizes it and adds the event file
+EVENTS = EventRing()
+logger.addHandler(EVENTS)
+EVENT_LOG = None
+
 # ============================================================================
 # CONFIGURATION CONSTANTS
 # ============================================================================
@@ -55,9 +222,27 @@ DEFAULT_CONFIG = {
         "API_KEY": "",
         "SEND_INTERVAL": 60,
         "BACKUP_FILE": "pond_thingspeak_backup.csv",
+        "BACKUP_DB": "pond_telemetry.db",
+        "FLUSH_PAGE_SIZE": 50,
+        "RETENTION_DAYS": 30,
         "MAX_RETRIES": 3,
+        # Backlog rows the channel refuses ("0" or 4xx) this many times are dropped
+        "MAX_REJECTIONS": 3,
         "RETRY_DELAY": 5,
-        "MAX_RETRY_DELAY": 60
+        "MAX_RETRY_DELAY": 60,
+        "CHANNEL_ID": "",
+        "BULK_URL": "https://api.thingspeak.com/channels/{channel_id}/bulk_update.json",
+        "BULK_CHUNK_SIZE": 960,
+        "BULK_MIN_INTERVAL": 15,
+        "MIN_SEND_INTERVAL": 15,
+        "UPLINK_QUEUE_SIZE": 100,
+        "POOL_SIZE": 2
+    },
+    "HISTORY": {
+        "MINUTE_RETENTION_DAYS": 7,
+        "HOURLY_RETENTION_DAYS": 400,
+        "DEFAULT_POINTS": 300,
+        "MAX_POINTS": 2000
     },
     "GPIO": {
         "TURBIDITY_PIN": 17,
@@ -70,30 +255,296 @@ DEFAULT_CONFIG = {
     "SENSORS": {
         "RS485_PORT": '/dev/ttyUSB0',
         "RS485_SLAVE_ID": 1,
+        "RS485_BLOCK_READ": True,
         "GSM_PORT": "/dev/serial0",
         "GSM_BAUDRATE": 9600
     },
+    "NETWORK": {
+        "PROBE_HOST": "8.8.8.8",
+        "PROBE_PORT": 53,
+        "PROBE_TIMEOUT": 2,
+        "PROBE_INTERVAL": 30,
+        "OFFLINE_AFTER": 2,
+        "ONLINE_AFTER": 1,
+        "INTERFACE": "wlan0",
+        "RECOVERY_AFTER": 3,
+        "RECOVERY_COOLDOWN": 300
+    },
+    "SMS": {
+        "MAX_ATTEMPTS": 3,
+        "RETRY_DELAY": 60,
+        "COMMAND_TIMEOUT": 5,
+        "PROMPT_TIMEOUT": 10,
+        "SEND_TIMEOUT": 60,
+        "RETENTION_DAYS": 30
+    },
+    # Fleet mode: one process polling several pond probes on shared RS485
+    # buses. Each pond is {"NAME", "SLAVE_ID", "PORT" (default
+    # SENSORS.RS485_PORT), "API_KEY", "CHANNEL_ID"}.
+    "FLEET": {
+        "PONDS": [],
+        "BAUDRATE": 9600,
+        "MAX_BACKOFF_ROUNDS": 8
+    },
+    # MODE "text" prints the per-cycle report to the console; "structured"
+    # logs it as one "cycle" event instead and writes events to FILE
+    "LOGGING": {
+        "MODE": "text",
+        "LEVEL": "INFO",
+        "RING_SIZE": 500,
+        "FILE": "pond_events.jsonl",
+        "MAX_BYTES": 1048576,
+        "BACKUPS": 5
+    },
+    # Outlier rejection and temperature fusion between acquisition and
+    # history. MIN_DEVIATION is the smallest spread a channel's Hampel
+    # filter assumes, so quantised or very steady readings are not flagged.
+    "FILTERS": {
+        "ENABLED": True,
+        "WINDOW": 7,
+        "THRESHOLD": 3.0,
+        "MIN_DEVIATION": {
+            "temperature": 0.3,
+            "ds18b20": 0.3,
+            "ph": 0.15,
+            "ec": 10.0,
+            "nitrogen": 5.0,
+            "phosphorus": 5.0,
+            "potassium": 5.0
+        },
+        "PROCESS_NOISE": 0.0001,
+        "MIN_VARIANCE": 0.004,
+        "GATE": 4.0,
+        "HEALTH_ALPHA": 0.05
+    },
+    # DS18B20s are read on their own thread; the cycle uses the cached mean
+    # while it is younger than MAX_AGE seconds
+    "ONEWIRE": {
+        "INTERVAL": 5,
+        "MAX_AGE": 60,
+        "REDISCOVER_INTERVAL": 60
+    },
+    # Acquisition and uplink slow down by BACKOFF per run while the pond is
+    # steady (GOOD, every trend STABLE) and drop to their MIN on a WARNING,
+    # CRITICAL or trend. BUDGETs cap runs per hour (0 = no cap).
+    "SAMPLING": {
+        "ENABLED": True,
+        "MIN_INTERVAL": 5,
+        "MAX_INTERVAL": 60,
+        "UPLINK_MIN_INTERVAL": 15,
+        "UPLINK_MAX_INTERVAL": 300,
+        "BACKOFF": 1.5,
+        "SAMPLE_BUDGET": 360,
+        "UPLINK_BUDGET": 120
+    },
+    # Report by exception: an upload goes out when a field moved more than
+    # its DEADBAND since the channel last saw it, turbidity or the status
+    # changed, or HEARTBEAT seconds passed. Turning points found in between
+    # ride along with the next bulk update (needs THINGSPEAK.CHANNEL_ID).
+    "REPORTING": {
+        "ENABLED": True,
+        "HEARTBEAT": 900,
+        "DEADBAND": {
+            "temperature": 0.2,
+            "ph": 0.05,
+            "ec": 5.0,
+            "nitrogen": 2.0,
+            "phosphorus": 2.0,
+            "quality_score": 5
+        }
+    },
+    # Monitor state (history and filter windows, critical timer, pump run)
+    # is saved to FILE every INTERVAL seconds and restored at start-up when
+    # it is at most MAX_AGE seconds old
+    "CHECKPOINT": {
+        "ENABLED": True,
+        "FILE": "pond_state.ckpt",
+        "INTERVAL": 60,
+        "MAX_AGE": 900
+    },
     "PHONE_NUMBERS": ["", ""]
 }
 
-def check_network_connectivity():
+# Probe register map (holding registers, one decimal place)
+RS485_REGISTERS = {
+    'temperature': 19, 'ph': 13, 'ec': 7,
+    'nitrogen': 4, 'phosphorus': 5, 'potassium': 6
+}
+RS485_BLOCK_START = min(RS485_REGISTERS.values())
+RS485_BLOCK_COUNT = max(RS485_REGISTERS.values()) - RS485_BLOCK_START + 1
+RS485_INVALID_RAW = 0xFFFF
+
+# Water quality rule table. Each parameter is scored against its "below" and
+# "above" bands (first match wins, checked low side first); "missing" applies
+# when the parameter has no reading. Averages are taken over the history window.
+# "valid_range" is checked before upload; "sensor_range" is what the probe can
+# physically report, and the filter stage drops readings outside it. It must
+# sit outside every band, or the band could never fire.
+WATER_QUALITY_RULES = [
+    {
+        "param": "ph",
+        "valid_range": (0, 14),
+        "sensor_range": (0, 14),
+        "missing": {"code": "PH_SENSOR_FAULT", "level": "WARNING", "score": 30,
+                    "alert": "⚠️ pH sensor not in water or faulty", "recommendation": None},
+        "below": [
+            {"limit": 5.5, "code": "PH_ACIDIC_CRITICAL", "level": "CRITICAL", "score": 50,
+             "alert": "🚨 CRITICAL: pH {value:.1f} is dangerously acidic",
+             "recommendation": "URGENT: Add agricultural lime (CaCO₃) immediately"},
+            {"limit": 6.0, "code": "PH_ACIDIC", "level": "WARNING", "score": 25,
+             "alert": "⚠️ WARNING: pH {value:.1f} is acidic",
+             "recommendation": "Consider adding agricultural lime gradually"},
+            {"limit": 6.5, "code": "PH_LOW", "level": "INFO", "score": 10,
+             "alert": "ℹ️ pH {value:.1f} is slightly low but acceptable", "recommendation": None}
+        ],
+        "above": [
+            {"limit": 9.5, "code": "PH_ALKALINE_CRITICAL", "level": "CRITICAL", "score": 50,
+             "alert": "🚨 CRITICAL: pH {value:.1f} is dangerously alkaline",
+             "recommendation": "URGENT: Perform large water change"},
+            {"limit": 9.0, "code": "PH_ALKALINE", "level": "WARNING", "score": 25,
+             "alert": "⚠️ WARNING: pH {value:.1f} is too alkaline",
+             "recommendation": "Perform partial water change"},
+            {"limit": 8.5, "code": "PH_HIGH", "level": "INFO", "score": 10,
+             "alert": "ℹ️ pH {value:.1f} is slightly high but acceptable", "recommendation": None}
+        ]
+    },
+    {
+        "param": "temperature",
+        "valid_range": (-40, 80),
+        "sensor_range": (-40, 80),
+        "below": [
+            {"limit": 12, "code": "TEMP_COLD", "level": "CRITICAL", "score": 40,
+             "alert": "🚨 CRITICAL: Temperature {value:.1f}°C is too cold",
+             "recommendation": "Add pond heater immediately"},
+            {"limit": 18, "code": "TEMP_COOL", "level": "WARNING", "score": 15,
+             "alert": "⚠️ Temperature {value:.1f}°C is cool", "recommendation": None}
+        ],
+        "above": [
+            {"limit": 35, "code": "TEMP_HOT", "level": "CRITICAL", "score": 40,
+             "alert": "🚨 CRITICAL: Temperature {value:.1f}°C is too hot",
+             "recommendation": "Add shade and emergency aeration"},
+            {"limit": 30, "code": "TEMP_WARM", "level": "WARNING", "score": 15,
+             "alert": "⚠️ Temperature {value:.1f}°C is warm",
+             "recommendation": "Monitor closely and increase aeration"}
+        ]
+    },
+    {
+        "param": "ec",
+        "valid_range": (0, 5000),
+        "sensor_range": (0, 20000),
+        "above": [
+            {"limit": 2000, "code": "EC_HIGH", "level": "WARNING", "score": 30,
+             "alert": "⚠️ EC {value:.0f} μS/cm is high",
+             "recommendation": "Consider diluting with fresh water"}
+        ]
+    },
+    {
+        "param": "turbidity",
+        "above": [
+            {"limit": 0.8, "code": "TURBID", "level": "WARNING", "score": 20,
+             "alert": "⚠️ Water is consistently turbid",
+             "recommendation": "Check filter and consider water change"}
+        ]
+    },
+    {
+        "param": "nitrogen",
+        "valid_range": (0, 200),
+        "sensor_range": (0, 1999),
+        "above": [
+            {"limit": 200, "code": "NITROGEN_CRITICAL", "level": "CRITICAL", "score": 35,
+             "alert": "🚨 CRITICAL: Nitrogen extremely high: {value:.1f} mg/kg",
+             "recommendation": "URGENT: Stop feeding and perform large water change"},
+            {"limit": 150, "code": "NITROGEN_HIGH", "level": "WARNING", "score": 20,
+             "alert": "⚠️ WARNING: Nitrogen high: {value:.1f} mg/kg",
+             "recommendation": "Reduce feeding and increase water changes"},
+            {"limit": 100, "code": "NITROGEN_ELEVATED", "level": "INFO", "score": 5,
+             "alert": "ℹ️ Nitrogen elevated: {value:.1f} mg/kg (monitor)", "recommendation": None}
+        ]
+    },
+    {
+        "param": "phosphorus",
+        "valid_range": (0, 200),
+        "sensor_range": (0, 1999),
+        "above": [
+            {"limit": 200, "code": "PHOSPHORUS_CRITICAL", "level": "CRITICAL", "score": 35,
+             "alert": "🚨 CRITICAL: Phosphorus extremely high: {value:.1f} mg/kg",
+             "recommendation": "URGENT: Stop feeding and perform large water change"},
+            {"limit": 150, "code": "PHOSPHORUS_HIGH", "level": "WARNING", "score": 20,
+             "alert": "⚠️ WARNING: Phosphorus high: {value:.1f} mg/kg",
+             "recommendation": "Reduce feeding and increase water changes"},
+            {"limit": 100, "code": "PHOSPHORUS_ELEVATED", "level": "INFO", "score": 5,
+             "alert": "ℹ️ Phosphorus elevated: {value:.1f} mg/kg (monitor)", "recommendation": None}
+        ]
+    }
+]
+
+# Applies when none of these parameters has a reading at all
+NO_DATA_RULE = {
+    "params": ("temperature", "ph", "ec", "nitrogen", "phosphorus"),
+    "code": "NO_DATA", "level": "WARNING", "score": 50,
+    "alert": "⚠️ No valid sensor data available", "recommendation": None
+}
+
+# Overall status from the summed score, highest first
+QUALITY_SCORE_LEVELS = [(80, "CRITICAL"), (40, "WARNING")]
+
+# Pump run mode for a critical state, checked in order; first match wins
+PUMP_MODE_RULES = [
+    {"param": "temperature", "below": 15, "above": 32, "mode": "LONG"},
+    {"param": "ph", "below": 6.0, "above": 9.0, "mode": "SHORT"},
+    {"param": "turbidity", "above": 0.7, "mode": "NORMAL"}
+]
+DEFAULT_PUMP_MODE = "NORMAL"
+
+# LCD text for the top alert while the status is WARNING/CRITICAL, keyed by
+# rule code. {value} is the averaged reading that tripped the band.
+LCD_STATUS_HEADERS = {
+    "WARNING": "!   WARNING   !",
+    "CRITICAL": "!! CRITICAL  !!"
+}
+LCD_ALERT_LINES = {
+    "PH_SENSOR_FAULT": "pH sensor fault",
+    "PH_ACIDIC_CRITICAL": "pH:{value:4.1f} ACIDIC",
+    "PH_ACIDIC": "pH:{value:4.1f} ACIDIC",
+    "PH_LOW": "pH:{value:4.1f} LOW",
+    "PH_ALKALINE_CRITICAL": "pH:{value:4.1f} ALKALIN",
+    "PH_ALKALINE": "pH:{value:4.1f} ALKALIN",
+    "PH_HIGH": "pH:{value:4.1f} HIGH",
+    "TEMP_COLD": "T:{value:4.1f}C  COLD",
+    "TEMP_COOL": "T:{value:4.1f}C  COOL",
+    "TEMP_HOT": "T:{value:4.1f}C   HOT",
+    "TEMP_WARM": "T:{value:4.1f}C  WARM",
+    "EC_HIGH": "EC:{value:5.0f} HIGH",
+    "TURBID": "WATER TURBID",
+    "NITROGEN_CRITICAL": "N:{value:6.1f} CRIT",
+    "NITROGEN_HIGH": "N:{value:6.1f} HIGH",
+    "NITROGEN_ELEVATED": "N:{value:6.1f} ELEV",
+    "PHOSPHORUS_CRITICAL": "P:{value:6.1f} CRIT",
+    "PHOSPHORUS_HIGH": "P:{value:6.1f} HIGH",
+    "PHOSPHORUS_ELEVATED": "P:{value:6.1f} ELEV",
+    "NO_DATA": "No sensor data"
+}
+LCD_ALERT_FALLBACK = "Check system"
+
+def check_network_connectivity(host="8.8.8.8", port=53, timeout=2):
+    # A real round trip: TCP connect to the probe host, not a local name lookup
     try:
-        socket.gethostbyname('8.8.8.8')
-        return True
-    except socket.gaierror:
-        logger.warning("Network connectivity check failed")
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError as e:
+        logger.debug("Network probe to %s:%s failed: %s", host, port, e)
         return False
     except Exception as e:
-        logger.error(f"Error during network check: {e}")
+        logger.error("Error during network check: %s", e)
         return False
 
-def restart_network_interface():
+def restart_network_interface(interface="wlan0"):
     try:
-        logger.info("Attempting to restart network interface...")
-        subprocess.run(["sudo", "ip", "link", "set", "wlan0", "down"], 
+        logger.info("Attempting to restart network interface %s...", interface)
+        subprocess.run(["sudo", "ip", "link", "set", interface, "down"], 
                       stderr=subprocess.PIPE, stdout=subprocess.PIPE, timeout=10)
         time.sleep(2)
-        subprocess.run(["sudo", "ip", "link", "set", "wlan0", "up"], 
+        subprocess.run(["sudo", "ip", "link", "set", interface, "up"], 
                       stderr=subprocess.PIPE, stdout=subprocess.PIPE, timeout=10)
         time.sleep(5)
         try:
@@ -102,28 +553,3299 @@ def restart_network_interface():
         except:
             subprocess.run(["sudo", "systemctl", "restart", "networking"], 
                           timeout=10, check=False)
-        time.sleep(15)
-        if check_network_connectivity():
-            logger.info("✅ Network connectivity restored")
-            return True
-        else:
-            logger.warning("Network connectivity still down")
-            return False
+        logger.info("Network interface restart commands issued")
+        return True
     except Exception as e:
-        logger.error(f"Failed to restart network interface: {e}")
+        logger.error("Failed to restart network interface: %s", e)
         return False
 
-def load_config():
-    return DEFAULT_CONFIG
+# ============================================================================
+# CONFIGURATION LOADING
+# ============================================================================
+
+CONFIG_FILE = os.environ.get("POND_CONFIG", "pond_config.json")
+CONFIG_RELOAD_INTERVAL = 5
+
+# Inclusive bounds checked on load; "*" covers every key in a section
+CONFIG_LIMITS = {
+    "TEMP_READ_INTERVAL": (1, 3600),
+    "LCD_REFRESH_INTERVAL": (1, 3600),
+    "PUMP_RUN_DURATION.*": (1, 3600),
+    "SMS_COOLDOWN": (0, 86400),
+    "CRITICAL_DURATION": (0, 86400),
+    "HISTORY_SIZE": (2, 10000),
+    "THINGSPEAK.SEND_INTERVAL": (15, 86400),
+    "THINGSPEAK.MIN_SEND_INTERVAL": (0, 3600),
+    "THINGSPEAK.MAX_RETRIES": (1, 20),
+    "THINGSPEAK.MAX_REJECTIONS": (1, 100),
+    "THINGSPEAK.BULK_CHUNK_SIZE": (1, 960),
+    "THINGSPEAK.UPLINK_QUEUE_SIZE": (1, 100000),
+    "THINGSPEAK.POOL_SIZE": (1, 16),
+    "GPIO.*": (0, 27),
+    "SENSORS.RS485_SLAVE_ID": (1, 247),
+    "NETWORK.PROBE_PORT": (1, 65535),
+    "NETWORK.PROBE_INTERVAL": (1, 3600),
+    "SMS.MAX_ATTEMPTS": (1, 20),
+    "SMS.RETRY_DELAY": (1, 86400),
+    "FLEET.BAUDRATE": (1200, 115200),
+    "FLEET.MAX_BACKOFF_ROUNDS": (0, 1000),
+    "LOGGING.RING_SIZE": (10, 100000),
+    "LOGGING.MAX_BYTES": (4096, 1 << 30),
+    "LOGGING.BACKUPS": (1, 100),
+    "FILTERS.WINDOW": (3, 101),
+    "FILTERS.THRESHOLD": (1, 20),
+    "FILTERS.MIN_DEVIATION.*": (0, 1000),
+    "FILTERS.PROCESS_NOISE": (0, 1),
+    "FILTERS.MIN_VARIANCE": (0.0001, 100),
+    "FILTERS.GATE": (1, 100),
+    "FILTERS.HEALTH_ALPHA": (0.001, 1),
+    "ONEWIRE.INTERVAL": (1, 3600),
+    "ONEWIRE.MAX_AGE": (1, 86400),
+    "ONEWIRE.REDISCOVER_INTERVAL": (5, 86400),
+    "SAMPLING.MIN_INTERVAL": (1, 3600),
+    "SAMPLING.MAX_INTERVAL": (1, 86400),
+    "SAMPLING.UPLINK_MIN_INTERVAL": (1, 86400),
+    "SAMPLING.UPLINK_MAX_INTERVAL": (1, 86400),
+    "SAMPLING.BACKOFF": (1, 10),
+    "SAMPLING.SAMPLE_BUDGET": (0, 1000000),
+    "SAMPLING.UPLINK_BUDGET": (0, 1000000),
+    "REPORTING.HEARTBEAT": (15, 86400),
+    "REPORTING.DEADBAND.*": (0, 1000),
+    "CHECKPOINT.INTERVAL": (5, 86400),
+    "CHECKPOINT.MAX_AGE": (0, 31 * 86400)
+}
+
+# Allowed values for string settings
+CONFIG_CHOICES = {
+    "LOGGING.MODE": ("text", "structured"),
+    "LOGGING.LEVEL": ("DEBUG", "INFO", "WARNING", "ERROR")
+}
+
+# Changing these needs a restart: they are bound to open devices or files
+CONFIG_RESTART_KEYS = ("GPIO", "SENSORS", "HISTORY_SIZE", "THINGSPEAK.BACKUP_DB", "FLEET",
+                       "CHECKPOINT.ENABLED", "CHECKPOINT.FILE")
+
+class ConfigError(ValueError):
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+class ConfigSection:
+    """Frozen, typed config node built from the DEFAULT_CONFIG schema.
+
+    Hot paths use attribute lookups (config.GPIO.PUMP_PIN); get() and []
+    keep dict-style callers working.
+    """
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__dataclass_fields__ else default
+
+    def __getitem__(self, key):
+        if key not in self.__dataclass_fields__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.__dataclass_fields__
+
+    def keys(self):
+        return self.__dataclass_fields__.keys()
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.__dataclass_fields__]
+
+    def to_dict(self):
+        result = {}
+        for key, value in self.items():
+            if isinstance(value, ConfigSection):
+                value = value.to_dict()
+            elif isinstance(value, tuple):
+                value = list(value)
+            result[key] = value
+        return result
+
+def _section_classes(name, defaults, classes, path=""):
+    fields = []
+    for key, default in defaults.items():
+        if isinstance(default, dict):
+            _section_classes(key, default, classes, f"{path}{key}.")
+            fields.append((key, classes[f"{path}{key}"]))
+        else:
+            fields.append((key, tuple if isinstance(default, list) else type(default)))
+    class_name = "".join(part.title() for part in name.split("_")) + "Config"
+    classes[path.rstrip(".")] = make_dataclass(class_name, fields, bases=(ConfigSection,), frozen=True)
+    return classes
+
+CONFIG_CLASSES = _section_classes("POND", DEFAULT_CONFIG, {})
+
+def _limit_for(path):
+    if path in CONFIG_LIMITS:
+        return CONFIG_LIMITS[path]
+    return CONFIG_LIMITS.get(path.rsplit(".", 1)[0] + ".*") if "." in path else None
+
+def _check_value(path, default, value, errors):
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            errors.append(f"{path}: expected true/false, got {value!r}")
+            return default
+        return value
+    if isinstance(default, (int, float)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors.append(f"{path}: expected a number, got {value!r}")
+            return default
+        limit = _limit_for(path)
+        if limit and not limit[0] <= value <= limit[1]:
+            errors.append(f"{path}: {value} is outside {limit[0]}..{limit[1]}")
+            return default
+        return value
+    if isinstance(default, str):
+        if not isinstance(value, str):
+            errors.append(f"{path}: expected a string, got {value!r}")
+            return default
+        choices = CONFIG_CHOICES.get(path)
+        if choices and value not in choices:
+            errors.append(f"{path}: expected one of {', '.join(choices)}, got {value!r}")
+            return default
+        return value
+    if isinstance(default, list):
+        item_type = type(default[0]) if default else None
+        if not isinstance(value, list) or (item_type and not all(isinstance(v, item_type) for v in value)):
+            errors.append(f"{path}: expected a list of {item_type.__name__ if item_type else 'values'}")
+            return tuple(default)
+        return tuple(value)
+    return value
+
+def _build_section(defaults, values, errors, path=""):
+    kwargs = {}
+    for key, default in defaults.items():
+        where = f"{path}{key}"
+        value = values.get(key, default)
+        if isinstance(default, dict):
+            if not isinstance(value, dict):
+                errors.append(f"{where}: expected an object")
+                value = default
+            kwargs[key] = _build_section(default, value, errors, f"{where}.")
+        else:
+            kwargs[key] = _check_value(where, default, value, errors)
+    for key in values:
+        if key not in defaults:
+            errors.append(f"{path}{key}: unknown setting")
+    return CONFIG_CLASSES[path.rstrip(".")](**kwargs)
+
+def deep_merge(base, overrides):
+    # Returns a new dict; neither input (nor DEFAULT_CONFIG) is ever mutated
+    merged = {}
+    for key, value in base.items():
+        merged[key] = deep_merge(value, {}) if isinstance(value, dict) else value
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+@dataclass(frozen=True)
+class PondSpec:
+    name: str
+    port: str
+    slave_id: int
+    api_key: str = ""
+    channel_id: str = ""
+
+POND_SPEC_KEYS = ("NAME", "PORT", "SLAVE_ID", "API_KEY", "CHANNEL_ID")
+
+def pond_specs(entries, default_port):
+    # FLEET.PONDS entries -> PondSpecs, reporting problems like config loading does
+    errors = []
+    specs = []
+    names = set()
+    addresses = set()
+    for i, entry in enumerate(entries):
+        where = f"FLEET.PONDS[{i}]"
+        if not isinstance(entry, Mapping):
+            errors.append(f"{where}: expected an object")
+            continue
+        errors.extend(f"{where}.{key}: unknown setting" for key in entry if key not in POND_SPEC_KEYS)
+        for key in ("NAME", "PORT", "API_KEY", "CHANNEL_ID"):
+            if key in entry and not isinstance(entry[key], str):
+                errors.append(f"{where}.{key}: expected a string, got {entry[key]!r}")
+        name = entry.get("NAME")
+        port = entry.get("PORT", default_port)
+        slave_id = entry.get("SLAVE_ID")
+        if not isinstance(name, str) or not name.replace("-", "").replace("_", "").isalnum():
+            errors.append(f"{where}.NAME: expected letters, digits, '-' or '_'")
+        elif name in names:
+            errors.append(f"{where}.NAME: duplicate pond {name!r}")
+        if isinstance(slave_id, bool) or not isinstance(slave_id, int) or not 1 <= slave_id <= 247:
+            errors.append(f"{where}.SLAVE_ID: expected 1..247, got {slave_id!r}")
+        elif (port, slave_id) in addresses:
+            errors.append(f"{where}.SLAVE_ID: slave {slave_id} on {port} is already used")
+        names.add(name)
+        addresses.add((port, slave_id))
+        specs.append(PondSpec(name, port, slave_id, entry.get("API_KEY", ""), entry.get("CHANNEL_ID", "")))
+    if errors:
+        raise ConfigError(errors)
+    return tuple(specs)
+
+def build_config(overrides=None, base=None):
+    errors = []
+    values = deep_merge(base if base is not None else DEFAULT_CONFIG, overrides or {})
+    built = _build_section(DEFAULT_CONFIG, values, errors)
+    if not errors:
+        try:
+            pond_specs(built.FLEET.PONDS, built.SENSORS.RS485_PORT)
+        except ConfigError as e:
+            errors.extend(e.errors)
+        sampling = built.SAMPLING
+        for low, high in (("MIN_INTERVAL", "MAX_INTERVAL"), ("UPLINK_MIN_INTERVAL", "UPLINK_MAX_INTERVAL")):
+            if sampling[low] > sampling[high]:
+                errors.append(f"SAMPLING.{low}: {sampling[low]!r} is above SAMPLING.{high} ({sampling[high]!r})")
+    if errors:
+        raise ConfigError(errors)
+    return built
+
+def read_config_file(path):
+    with open(path, "r") as f:
+        user_config = json.load(f)
+    if not isinstance(user_config, dict):
+        raise ConfigError([f"{path}: top level must be an object"])
+    return build_config(user_config)
+
+def load_config(path=CONFIG_FILE):
+    if path and os.path.exists(path):
+        try:
+            loaded = read_config_file(path)
+            logger.info("✅ Configuration loaded from %s", path)
+            return loaded
+        except (OSError, ValueError) as e:
+            logger.error("Error loading config: %s. Using defaults.", e)
+    return build_config()
+
+def configure(overrides):
+    # Deep-merge overrides onto the running config and swap it in atomically
+    global config
+    config = build_config(overrides, config.to_dict())
+    return config
+
+def config_changes(old, new, path=""):
+    changed = []
+    for key, value in new.items():
+        previous = old.get(key)
+        if isinstance(value, ConfigSection):
+            changed.extend(config_changes(previous, value, f"{path}{key}."))
+        elif value != previous:
+            changed.append(f"{path}{key}")
+    return changed
+
+class ConfigWatcher:
+    """Polls the config file's mtime and swaps in a validated new config.
+
+    A file that fails to parse or validate is logged and ignored; the
+    running config stays in place. on_change(old, new, changed_keys) runs
+    after the swap so live objects can pick up new intervals.
+    """
+
+    def __init__(self, path, on_change=None):
+        self.path = path
+        self.on_change = on_change
+        self.mtime = self._stat()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def poll(self):
+        global config
+        mtime = self._stat()
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        if mtime is None:
+            return False
+        try:
+            new_config = read_config_file(self.path)
+        except (OSError, ValueError) as e:
+            logger.error("❌ Config reload rejected, keeping current settings: %s", e)
+            return False
+        old_config, config = config, new_config
+        changed = config_changes(old_config, new_config)
+        if changed:
+            logger.info("🔄 Config reloaded: %s", ', '.join(changed))
+            if self.on_change:
+                self.on_change(old_config, new_config, changed)
+        return True
 
 config = load_config()
 
+def configure_logging(log_config):
+    # Level and ring size apply live; the event file follows MODE and FILE
+    global EVENT_LOG
+    logger.setLevel(log_config.LEVEL)
+    EVENTS.resize(log_config.RING_SIZE)
+    structured = log_config.MODE == "structured" and log_config.FILE
+    if EVENT_LOG and (not structured or EVENT_LOG.path != log_config.FILE):
+        logger.removeHandler(EVENT_LOG)
+        EVENT_LOG.close()
+        EVENT_LOG = None
+    if structured:
+        if EVENT_LOG is None:
+            ensure_directory_exists(log_config.FILE)
+            EVENT_LOG = BatchedFileLog(log_config.FILE)
+            logger.addHandler(EVENT_LOG)
+        EVENT_LOG.max_bytes = log_config.MAX_BYTES
+        EVENT_LOG.backups = log_config.BACKUPS
+    return EVENT_LOG
+
+def ensure_directory_exists(file_path):
+    directory = os.path.dirname(file_path)
+    if directory and not os.path.exists(directory):
+        try:
+            os.makedirs(directory)
+            logger.info("Created directory: %s", directory)
+            return True
+        except Exception as e:
+            logger.error("Error creating directory %s: %s", directory, e)
+            return False
+    return True
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def _metric_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def _metric_value(value):
+    if isinstance(value, int):
+        return str(int(value))
+    if value == math.inf:
+        return "+Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value))
+
+class Counter:
+    """Monotonic count; or give it a func that is read at scrape time."""
+
+    __slots__ = ('value', 'func')
+
+    def __init__(self):
+        self.value = 0
+        self.func = None
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name, key):
+        value = self.value
+        if self.func is not None:
+            try:
+                value = self.func()
+            except Exception as e:
+                logger.debug("Metric %s unavailable: %s", name, e)
+                return
+        if value is not None:
+            yield f"{name}{_metric_labels(key)} {_metric_value(value)}"
+
+class Gauge(Counter):
+    __slots__ = ()
+
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    """Log-linear (HDR-style) histogram of durations in seconds.
+
+    Each power of two from 2**MIN_EXP (~1 us) to 2**MAX_EXP (128 s) is cut
+    into SUB_BUCKETS equal slices, so any recorded value is known to within
+    1/SUB_BUCKETS of itself. observe() is a frexp and a list increment.
+    Prometheus output folds the slices into power-of-two `le` buckets,
+    which are exact slice boundaries.
+    """
+
+    __slots__ = ('counts', 'count', 'sum')
+
+    SUB_BUCKETS = 16
+    MIN_EXP = -20
+    MAX_EXP = 7
+    EXPORT_EXPS = range(-14, MAX_EXP + 1)
+
+    def __init__(self):
+        # [0] underflow, [-1] overflow
+        self.counts = [0] * ((self.MAX_EXP - self.MIN_EXP) * self.SUB_BUCKETS + 2)
+        self.count = 0
+        self.sum = 0.0
+
+    @classmethod
+    def bucket_index(cls, value):
+        mantissa, exp = math.frexp(value)
+        if value <= 0 or exp <= cls.MIN_EXP:
+            return 0
+        if exp > cls.MAX_EXP:
+            return -1
+        return 1 + (exp - cls.MIN_EXP - 1) * cls.SUB_BUCKETS + int((mantissa * 2 - 1) * cls.SUB_BUCKETS)
+
+    @classmethod
+    def upper_bound(cls, index):
+        if index == 0:
+            return 2.0 ** cls.MIN_EXP
+        if index < 0 or index > (cls.MAX_EXP - cls.MIN_EXP) * cls.SUB_BUCKETS:
+            return math.inf
+        octave, sub = divmod(index - 1, cls.SUB_BUCKETS)
+        return 2.0 ** (cls.MIN_EXP + octave) * (1 + (sub + 1) / cls.SUB_BUCKETS)
+
+    def observe(self, value, _frexp=math.frexp, _min=MIN_EXP, _max=MAX_EXP, _sub=SUB_BUCKETS,
+                _base=1 - (MIN_EXP + 2) * SUB_BUCKETS):
+        # bucket_index() inlined; this runs on every timed stage
+        mantissa, exp = _frexp(value)
+        if value <= 0 or exp <= _min:
+            self.counts[0] += 1
+        elif exp > _max:
+            self.counts[-1] += 1
+        else:
+            self.counts[_base + exp * _sub + int(mantissa * 2 * _sub)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return self.upper_bound(index)
+        return math.inf
+
+    def samples(self, name, key):
+        counts = list(self.counts)
+        cumulative = counts[0]
+        index = 1
+        for exp in self.EXPORT_EXPS:
+            last = 1 + (exp - self.MIN_EXP) * self.SUB_BUCKETS
+            cumulative += sum(counts[index:last])
+            index = last
+            yield f"{name}_bucket{_metric_labels(key, [('le', _metric_value(2.0 ** exp))])} {cumulative}"
+        yield f"{name}_bucket{_metric_labels(key, [('le', '+Inf')])} {sum(counts)}"
+        yield f"{name}_sum{_metric_labels(key)} {_metric_value(self.sum)}"
+        yield f"{name}_count{_metric_labels(key)} {sum(counts)}"
+
+class MetricsRegistry:
+    """Named metric families with label sets, rendered in Prometheus text format.
+
+    Metrics are updated without locks: each one has a single writer thread,
+    and a scrape may at worst see a count one step behind its sum.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.families = {}
+
+    def _child(self, kind, factory, name, help_text, labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            family = self.families.get(name)
+            if family is None:
+                family = self.families[name] = {'type': kind, 'help': help_text, 'children': {}}
+            elif family['type'] != kind:
+                raise ValueError(f"Metric {name} is already a {family['type']}")
+            child = family['children'].get(key)
+            if child is None:
+                child = family['children'][key] = factory()
+            return child
+
+    def counter(self, name, help_text, func=None, **labels):
+        counter = self._child('counter', Counter, name, help_text, labels)
+        if func is not None:
+            counter.func = func
+        return counter
+
+    def gauge(self, name, help_text, func=None, **labels):
+        gauge = self._child('gauge', Gauge, name, help_text, labels)
+        if func is not None:
+            gauge.func = func
+        return gauge
+
+    def histogram(self, name, help_text, **labels):
+        return self._child('histogram', Histogram, name, help_text, labels)
+
+    def render(self):
+        with self.lock:
+            families = [(name, family['type'], family['help'], list(family['children'].items()))
+                        for name, family in sorted(self.families.items())]
+        lines = []
+        for name, kind, help_text, children in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in children:
+                lines.extend(metric.samples(name, key))
+        return "\n".join(lines) + "\n"
+
+METRICS = MetricsRegistry()
+
+# Timed stages of the monitor; STAGE_SECONDS[stage].observe(seconds)
+METRIC_STAGES = ("modbus_read", "ds18b20_read", "rules", "lcd_write", "sms_send",
+                 "thingspeak_upload", "backup_flush", "checkpoint", "cycle")
+STAGE_SECONDS = {
+    stage: METRICS.histogram("pond_stage_duration_seconds", "Time spent in each monitor stage", stage=stage)
+    for stage in METRIC_STAGES
+}
+SENSOR_ERRORS = {
+    sensor: METRICS.counter("pond_sensor_errors_total", "Failed sensor reads", sensor=sensor)
+    for sensor in ("rs485", "ds18b20")
+}
+
+METRICS.counter("pond_log_file_writes_total", "Batched writes to the event log file",
+                func=lambda: EVENT_LOG.writes if EVENT_LOG else 0)
+METRICS.counter("pond_log_records_dropped_total", "Log records dropped before reaching the event log file",
+                func=lambda: EVENT_LOG.dropped if EVENT_LOG else 0)
+METRICS.counter("pond_log_rotations_total", "Event log files rotated and compressed",
+                func=lambda: EVENT_LOG.rotations if EVENT_LOG else 0)
+
+# ============================================================================
+# LOCAL TELEMETRY STORE
+# ============================================================================
+
+TELEMETRY_FIELDS = ["temperature", "ph", "ec", "nitrogen", "phosphorus",
+                    "turbidity", "quality_score", "quality_status"]
+
+# Per-cycle readings are kept only as rollups: (table, bucket seconds, retention
+# config key). Queries read the coarsest table that fits the requested bucket.
+HISTORY_PARAMS = ["temperature", "ph", "ec", "nitrogen", "phosphorus", "turbidity", "quality_score"]
+HISTORY_ROLLUPS = [
+    ("history_minute", 60, "MINUTE_RETENTION_DAYS"),
+    ("history_hourly", 3600, "HOURLY_RETENTION_DAYS"),
+    ("history_daily", 86400, None)
+]
+
+def lttb(points, threshold):
+    # Largest-Triangle-Three-Buckets: keep the points that best preserve shape
+    if threshold >= len(points) or threshold < 2:
+        return list(points)
+    if threshold == 2:
+        return [points[0], points[-1]]
+    sampled = [points[0]]
+    every = (len(points) - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, len(points))
+        avg_x = sum(p[0] for p in points[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(p[1] for p in points[avg_start:avg_end]) / (avg_end - avg_start)
+        ax, ay = points[a]
+        best_area = -1
+        best = None
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+class TelemetryStore:
+    """SQLite (WAL) store for readings awaiting upload.
+
+    add() buffers rows in memory and commit() writes them in one transaction,
+    so the card sees one write per cycle. Uploaded rows are flagged sent
+    instead of rewriting anything, and pruned after RETENTION_DAYS.
+    """
+
+    def __init__(self, path):
+        ensure_directory_exists(path)
+        self.path = path
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS readings ("
+            " id INTEGER PRIMARY KEY,"
+            " timestamp TEXT NOT NULL,"
+            " temperature REAL, ph REAL, ec REAL, nitrogen REAL, phosphorus REAL,"
+            " turbidity REAL, quality_score REAL, quality_status TEXT,"
+            " sent INTEGER NOT NULL DEFAULT 0)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_readings_timestamp ON readings(timestamp)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_readings_pending ON readings(timestamp) WHERE sent = 0")
+        for table, _, _ in HISTORY_ROLLUPS:
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " param TEXT NOT NULL, bucket INTEGER NOT NULL,"
+                " count INTEGER NOT NULL, sum REAL NOT NULL, min REAL NOT NULL, max REAL NOT NULL,"
+                " PRIMARY KEY (param, bucket)) WITHOUT ROWID"
+            )
+        self.conn.commit()
+        self.rollups = {}
+
+    def add(self, timestamp, data, sent=False):
+        row = (timestamp,) + tuple(data.get(field) for field in TELEMETRY_FIELDS) + (1 if sent else 0,)
+        with self.lock:
+            self.buffer.append(row)
+
+    def record(self, timestamp, values):
+        # Fold one cycle's readings into the in-memory rollup buckets
+        with self.lock:
+            rollups = self.rollups
+            for param, value in values.items():
+                if value is None:
+                    continue
+                for table, size, _ in HISTORY_ROLLUPS:
+                    key = (table, param, int(timestamp // size) * size)
+                    acc = rollups.get(key)
+                    if acc is None:
+                        rollups[key] = [1, value, value, value]
+                    else:
+                        acc[0] += 1
+                        acc[1] += value
+                        if value < acc[2]:
+                            acc[2] = value
+                        if value > acc[3]:
+                            acc[3] = value
+
+    def commit(self):
+        with self.lock:
+            if not self.buffer and not self.rollups:
+                return 0
+            rows, self.buffer = self.buffer, []
+            rollups, self.rollups = self.rollups, {}
+            with self.conn:
+                if rows:
+                    self.conn.executemany(
+                        f"INSERT INTO readings (timestamp, {', '.join(TELEMETRY_FIELDS)}, sent) "
+                        f"VALUES ({', '.join('?' * (len(TELEMETRY_FIELDS) + 2))})",
+                        rows
+                    )
+                for table, _, _ in HISTORY_ROLLUPS:
+                    self.conn.executemany(
+                        f"INSERT INTO {table} (param, bucket, count, sum, min, max) VALUES (?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(param, bucket) DO UPDATE SET count = count + excluded.count, "
+                        "sum = sum + excluded.sum, min = MIN(min, excluded.min), max = MAX(max, excluded.max)",
+                        [(param, bucket) + tuple(acc) for (t, param, bucket), acc in rollups.items() if t == table]
+                    )
+            return len(rows)
+
+    def history(self, param, start, end, bucket):
+        """Bucketed [start, mean, min, max, count] rows for param in [start, end).
+
+        Reads the coarsest rollup table whose bucket divides the requested
+        one, so a month at hourly resolution touches ~720 rollup rows.
+        """
+        table, size = HISTORY_ROLLUPS[0][:2]
+        for candidate, candidate_size, _ in HISTORY_ROLLUPS:
+            if candidate_size <= bucket and bucket % candidate_size == 0:
+                table, size = candidate, candidate_size
+        bucket = max(size, bucket - bucket % size)
+        start = int(start // bucket) * bucket
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT (bucket / ?) * ? AS b, SUM(count), SUM(sum), MIN(min), MAX(max) FROM {table} "
+                "WHERE param = ? AND bucket >= ? AND bucket < ? GROUP BY b ORDER BY b",
+                (bucket, bucket, param, start, end)
+            ).fetchall()
+            # Buckets not yet committed are still in memory; merge them in
+            unflushed = [(b, acc) for (t, p, b), acc in self.rollups.items()
+                         if t == table and p == param and start <= b < end]
+        merged = {row[0]: list(row[1:]) for row in rows}
+        for b, (count, total, low, high) in unflushed:
+            key = b // bucket * bucket
+            acc = merged.get(key)
+            if acc is None:
+                merged[key] = [count, total, low, high]
+            else:
+                acc[0] += count
+                acc[1] += total
+                acc[2] = min(acc[2], low)
+                acc[3] = max(acc[3], high)
+        return bucket, [[b, acc[1] / acc[0], acc[2], acc[3], acc[0]] for b, acc in sorted(merged.items())]
+
+    def pending(self, limit=50):
+        with self.lock:
+            cursor = self.conn.execute(
+                f"SELECT id, timestamp, {', '.join(TELEMETRY_FIELDS)} FROM readings "
+                "WHERE sent = 0 ORDER BY timestamp, id LIMIT ?",
+                (limit,)
+            )
+            rows = cursor.fetchall()
+        return [(row[0], row[1], dict(zip(TELEMETRY_FIELDS, row[2:]))) for row in rows]
+
+    def pending_count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM readings WHERE sent = 0").fetchone()[0]
+
+    def mark_sent(self, row_ids, sent=1):
+        if not row_ids:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany("UPDATE readings SET sent = ? WHERE id = ?", [(sent, i) for i in row_ids])
+
+    def mark_rejected(self, row_ids):
+        # Rows that fail validation would never upload; take them out of the queue
+        self.mark_sent(row_ids, sent=-1)
+
+    def rescore(self, rules):
+        """Re-score readings still awaiting upload with the current rules.
+
+        Rows backed up by an older build, or imported from the CSV backup,
+        carry the score of the rules they were taken under. One
+        evaluate_batch() pass brings them up to date; returns the rows changed.
+        """
+        params = [field for field in TELEMETRY_FIELDS if field not in ('quality_score', 'quality_status')]
+        self.commit()
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT id, quality_score, quality_status, {', '.join(params)} FROM readings WHERE sent = 0"
+            ).fetchall()
+        if not rows:
+            return 0
+        values = np.array([row[3:] for row in rows], dtype=float)
+        result = rules.evaluate_batch({param: values[:, i] for i, param in enumerate(params)})
+        levels = {code: level for level, code in QUALITY_STATUS_CODES.items()}
+        changed = []
+        for row, score, overall in zip(rows, result['score'].tolist(), result['overall'].tolist()):
+            level = levels[overall]
+            if row[1] != score or row[2] != level:
+                changed.append((score, level, row[0]))
+        if changed:
+            with self.lock, self.conn:
+                self.conn.executemany("UPDATE readings SET quality_score = ?, quality_status = ? WHERE id = ?",
+                                      changed)
+        return len(changed)
+
+    def prune(self, retention_days, history_config=None):
+        now = time.time()
+        cutoff = datetime.fromtimestamp(now - retention_days * 86400).strftime("%Y-%m-%d %H:%M:%S")
+        history_config = history_config or {}
+        with self.lock, self.conn:
+            for table, _, retention_key in HISTORY_ROLLUPS:
+                days = history_config.get(retention_key) if retention_key else None
+                if days:
+                    self.conn.execute(f"DELETE FROM {table} WHERE bucket < ?", (int(now - days * 86400),))
+            return self.conn.execute("DELETE FROM readings WHERE sent != 0 AND timestamp < ?", (cutoff,)).rowcount
+
+    def import_csv_backup(self, csv_path):
+        # One-off migration of the old append-only CSV backup
+        if not csv_path or not os.path.exists(csv_path):
+            return 0
+        imported = 0
+        try:
+            with open(csv_path, "r", newline="") as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                for row in reader:
+                    if len(row) < 9:
+                        continue
+                    data = {}
+                    for field, value in zip(TELEMETRY_FIELDS, row[1:9]):
+                        if field == 'quality_status':
+                            data[field] = value.strip() or None
+                        else:
+                            try:
+                                data[field] = float(value)
+                            except ValueError:
+                                data[field] = None
+                    self.add(row[0], data)
+                    imported += 1
+            self.commit()
+            os.replace(csv_path, csv_path + ".imported")
+            logger.info("📥 Imported %s rows from %s", imported, csv_path)
+        except Exception as e:
+            logger.error("Error importing CSV backup: %s", e)
+        return imported
+
+    def close(self):
+        try:
+            self.commit()
+            with self.lock:
+                self.conn.close()
+        except Exception as e:
+            logger.error("Error closing telemetry store: %s", e)
+
+# ============================================================================
+# NETWORK REACHABILITY
+# ============================================================================
+
+class NetworkMonitor:
+    """Cached reachability flag refreshed by a background probe thread.
+
+    Callers read `online` (a plain bool) instead of probing themselves. The
+    flag flips offline after OFFLINE_AFTER failed probes and back online after
+    ONLINE_AFTER good ones. Interface recovery runs on its own thread after
+    RECOVERY_AFTER failed probes, at most once per RECOVERY_COOLDOWN.
+    """
+
+    def __init__(self, host="8.8.8.8", port=53, timeout=2, interval=30,
+                 offline_after=2, online_after=1, interface="wlan0",
+                 recovery_after=3, recovery_cooldown=300):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.interval = interval
+        self.offline_after = offline_after
+        self.online_after = online_after
+        self.interface = interface
+        self.recovery_after = recovery_after
+        self.recovery_cooldown = recovery_cooldown
+
+        self.online = True
+        self.last_probe_time = 0
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.recoveries = 0
+        self.last_recovery_time = 0
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.recovery_thread = None
+        self.thread = None
+
+    @classmethod
+    def from_config(cls, net_config):
+        return cls(
+            host=net_config.get('PROBE_HOST', '8.8.8.8'),
+            port=net_config.get('PROBE_PORT', 53),
+            timeout=net_config.get('PROBE_TIMEOUT', 2),
+            interval=net_config.get('PROBE_INTERVAL', 30),
+            offline_after=net_config.get('OFFLINE_AFTER', 2),
+            online_after=net_config.get('ONLINE_AFTER', 1),
+            interface=net_config.get('INTERFACE', 'wlan0'),
+            recovery_after=net_config.get('RECOVERY_AFTER', 3),
+            recovery_cooldown=net_config.get('RECOVERY_COOLDOWN', 300)
+        )
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="NetProbe", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+
+    def request_probe(self):
+        # Ask for an early refresh, e.g. after an upload error; never blocks
+        self.wakeup.set()
+
+    def probe(self):
+        reachable = check_network_connectivity(self.host, self.port, self.timeout)
+        self.last_probe_time = time.time()
+        if reachable:
+            self.consecutive_successes += 1
+            self.consecutive_failures = 0
+            if not self.online and self.consecutive_successes >= self.online_after:
+                self.online = True
+                logger.info("✅ Network connectivity restored")
+        else:
+            self.consecutive_failures += 1
+            self.consecutive_successes = 0
+            if self.online and self.consecutive_failures >= self.offline_after:
+                self.online = False
+                logger.warning("⚠️ Network is down. Uploads will back up until it returns.")
+            if self.consecutive_failures >= self.recovery_after:
+                self._start_recovery()
+        return reachable
+
+    def _start_recovery(self):
+        if self.recovery_thread and self.recovery_thread.is_alive():
+            return
+        if time.time() - self.last_recovery_time < self.recovery_cooldown:
+            return
+        self.last_recovery_time = time.time()
+        self.recoveries += 1
+        self.recovery_thread = threading.Thread(
+            target=restart_network_interface, args=(self.interface,), name="NetRecovery", daemon=True)
+        self.recovery_thread.start()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                self.probe()
+            except Exception as e:
+                logger.error("Error in network probe: %s", e)
+            # Probe faster while offline so recovery is noticed quickly
+            interval = self.interval if self.online else min(self.interval, 10)
+            self.wakeup.wait(timeout=interval)
+            self.wakeup.clear()
+
+# ============================================================================
+# THINGSPEAK UPLOAD
+# ============================================================================
+
+def thingspeak_fields(data):
+    fields = {}
+    if data.get('temperature') is not None:
+        fields['field1'] = data['temperature']
+    if data.get('ph') is not None:
+        fields['field2'] = data['ph']
+    if data.get('ec') is not None:
+        fields['field3'] = data['ec']
+    if data.get('nitrogen') is not None:
+        fields['field4'] = data['nitrogen']
+    if data.get('phosphorus') is not None:
+        fields['field5'] = data['phosphorus']
+    if data.get('turbidity') is not None:
+        fields['field6'] = 1 if data.get('turbidity') else 0
+    if data.get('quality_score') is not None:
+        fields['field7'] = data['quality_score']
+    if data.get('quality_status') is not None:
+        status_text = str(data['quality_status']).upper()
+        fields['field8'] = QUALITY_STATUS_CODES.get(status_text, -1)
+    return fields
+
+class ThingSpeakBulkUploader:
+    """Uploads backlog rows through ThingSpeak's bulk_update.json endpoint.
+
+    Rows go out in chunks of up to BULK_CHUNK_SIZE with their original
+    timestamps as created_at. Chunks are spaced BULK_MIN_INTERVAL apart
+    (the channel's rate limit) and retried with backoff on 429/5xx/timeouts.
+    """
+
+    def __init__(self, url, api_key, chunk_size=960, min_interval=15,
+                 max_retries=3, retry_delay=5, max_retry_delay=60, session=None):
+        self.url = url
+        self.api_key = api_key
+        self.chunk_size = max(1, min(int(chunk_size), 960))
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.session = session or requests
+        self.last_post_time = 0
+
+    @classmethod
+    def from_config(cls, ts_config, session=None):
+        channel_id = ts_config.get('CHANNEL_ID')
+        if not channel_id or not ts_config.get('API_KEY'):
+            return None
+        return cls(
+            ts_config.get('BULK_URL').format(channel_id=channel_id),
+            ts_config.get('API_KEY'),
+            chunk_size=ts_config.get('BULK_CHUNK_SIZE', 960),
+            min_interval=ts_config.get('BULK_MIN_INTERVAL', 15),
+            max_retries=ts_config.get('MAX_RETRIES', 3),
+            retry_delay=ts_config.get('RETRY_DELAY', 5),
+            max_retry_delay=ts_config.get('MAX_RETRY_DELAY', 60),
+            session=session
+        )
+
+    @staticmethod
+    def created_at(timestamp):
+        try:
+            return datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").astimezone().isoformat()
+        except (TypeError, ValueError):
+            return timestamp
+
+    def build_update(self, timestamp, data):
+        update = {"created_at": self.created_at(timestamp)}
+        update.update(thingspeak_fields(data))
+        return update
+
+    def _wait_for_slot(self):
+        wait = self.last_post_time + self.min_interval - time.time()
+        if wait > 0:
+            time.sleep(wait)
+
+    def post_chunk(self, updates):
+        body = {"write_api_key": self.api_key, "updates": updates}
+        for attempt in range(self.max_retries):
+            self._wait_for_slot()
+            delay = min(self.max_retry_delay, self.retry_delay * (2 ** attempt))
+            try:
+                response = self.session.post(self.url, json=body, timeout=30)
+                self.last_post_time = time.time()
+                if response.status_code in (200, 202):
+                    return True
+                if response.status_code == 429:
+                    retry_after = response.headers.get('Retry-After')
+                    delay = float(retry_after) if retry_after else max(delay, self.min_interval)
+                    logger.warning("⏱️ Bulk update rate limited (Attempt %s/%s)", attempt+1, self.max_retries)
+                elif 400 <= response.status_code < 500:
+                    logger.error("❌ Bulk update rejected: HTTP %s %s", response.status_code, response.text[:80])
+                    return False
+                else:
+                    logger.error("❌ Bulk update HTTP Error: %s", response.status_code)
+            except requests.exceptions.RequestException as e:
+                self.last_post_time = time.time()
+                logger.error("🌐 Bulk update failed (Attempt %s/%s): %s", attempt+1, self.max_retries, str(e)[:80])
+
+            if attempt < self.max_retries - 1:
+                time.sleep(delay)
+        return False
+
+    def upload(self, rows):
+        # rows: [(row_id, timestamp, data)]; returns the ids ThingSpeak accepted
+        accepted = []
+        for start in range(0, len(rows), self.chunk_size):
+            chunk = rows[start:start + self.chunk_size]
+            updates = [self.build_update(timestamp, data) for _, timestamp, data in chunk]
+            if not self.post_chunk(updates):
+                break
+            accepted.extend(row_id for row_id, _, _ in chunk)
+            logger.info("✅ Bulk uploaded %s backlog entries", len(chunk))
+        return accepted
+
+class UplinkWorker:
+    """Background sender for single ThingSpeak updates.
+
+    Producers call submit(), which never blocks: items go onto a bounded
+    schedule heap, and anything that does not fit is written to the backup
+    store instead. The worker owns a keep-alive Session, spaces sends
+    MIN_SEND_INTERVAL apart, and reschedules failures with exponential
+    backoff instead of sleeping. Items that exhaust their retries are backed
+    up (live readings) or left pending (backlog rows). A backlog row the
+    channel refuses outright max_rejections times is marked rejected, so it
+    stops taking a rate-limited slot on every flush. Pass `session` to send
+    through something other than a fresh requests.Session.
+    """
+
+    def __init__(self, url, api_key, store, queue_size=100, min_interval=15,
+                 max_retries=3, retry_delay=5, max_retry_delay=60, pool_size=2,
+                 on_network_error=None, is_online=None, max_rejections=3, session=None):
+        self.url = url
+        self.api_key = api_key
+        self.store = store
+        self.queue_size = queue_size
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_rejections = max_rejections
+        self.on_network_error = on_network_error
+        self.is_online = is_online
+
+        self.session = session
+        if session is None:
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+
+        self.cond = threading.Condition()
+        self.schedule = []
+        self.sequence = itertools.count()
+        self.in_flight_rows = set()
+        self.rejections = {}
+        self.last_send_time = 0
+        self.running = False
+        self.thread = None
+        self.metrics = {
+            'sent': 0, 'failed': 0, 'retries': 0, 'overflow': 0, 'rejected': 0,
+            'last_latency': None, 'avg_latency': None, 'max_latency': 0.0,
+            'consecutive_errors': 0
+        }
+
+    @classmethod
+    def from_config(cls, ts_config, store, on_network_error=None, is_online=None, session=None):
+        return cls(
+            ts_config.get('URL'), ts_config.get('API_KEY'), store,
+            queue_size=ts_config.get('UPLINK_QUEUE_SIZE', 100),
+            min_interval=ts_config.get('MIN_SEND_INTERVAL', 15),
+            max_retries=ts_config.get('MAX_RETRIES', 3),
+            retry_delay=ts_config.get('RETRY_DELAY', 5),
+            max_retry_delay=ts_config.get('MAX_RETRY_DELAY', 60),
+            pool_size=ts_config.get('POOL_SIZE', 2),
+            on_network_error=on_network_error,
+            is_online=is_online,
+            max_rejections=ts_config.get('MAX_REJECTIONS', 3),
+            session=session
+        )
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="Uplink", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=3):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+        self.session.close()
+
+    def submit(self, timestamp, data, row_id=None):
+        with self.cond:
+            if row_id is not None and row_id in self.in_flight_rows:
+                return True
+            if len(self.schedule) >= self.queue_size:
+                self.metrics['overflow'] += 1
+                if row_id is None:
+                    self.store.add(timestamp, data)
+                return False
+            if row_id is not None:
+                self.in_flight_rows.add(row_id)
+            heapq.heappush(self.schedule, (time.time(), next(self.sequence), timestamp, data, row_id, 0))
+            self.cond.notify()
+        return True
+
+    def free_slots(self):
+        with self.cond:
+            return self.queue_size - len(self.schedule)
+
+    def stats(self):
+        with self.cond:
+            stats = dict(self.metrics)
+            stats['queue_depth'] = len(self.schedule)
+            stats['backlog_in_flight'] = len(self.in_flight_rows)
+        return stats
+
+    def _next_item(self):
+        with self.cond:
+            while self.running:
+                now = time.time()
+                if self.schedule:
+                    due = max(self.schedule[0][0], self.last_send_time + self.min_interval)
+                    if due <= now:
+                        return heapq.heappop(self.schedule)
+                    self.cond.wait(timeout=due - now)
+                else:
+                    self.cond.wait()
+            return None
+
+    def _post(self, data):
+        params = {"api_key": self.api_key}
+        params.update(thingspeak_fields(data))
+        start = time.perf_counter()
+        try:
+            response = self.session.get(self.url, params=params, timeout=10)
+        finally:
+            latency = time.perf_counter() - start
+            STAGE_SECONDS['thingspeak_upload'].observe(latency)
+            metrics = self.metrics
+            metrics['last_latency'] = latency
+            metrics['max_latency'] = max(metrics['max_latency'], latency)
+            avg = metrics['avg_latency']
+            metrics['avg_latency'] = latency if avg is None else 0.8 * avg + 0.2 * latency
+        if response.status_code != 200:
+            logger.error("❌ HTTP Error: %s", response.status_code)
+            return False, response.status_code == 429 or response.status_code >= 500
+        result = response.text.strip()
+        if result.isdigit() and int(result) > 0:
+            logger.info("✅ ThingSpeak upload (Entry: %s)", result)
+            return True, False
+        # "0" means ThingSpeak rejected the update (rate limit or bad key)
+        logger.warning("⚠️ ThingSpeak returned '%s'", result)
+        return False, False
+
+    def _run(self):
+        while True:
+            item = self._next_item()
+            if item is None:
+                return
+            _, _, timestamp, data, row_id, attempt = item
+            try:
+                if self.is_online and not self.is_online():
+                    # Known offline: fail fast and let backoff/backup take over
+                    ok, retryable = False, True
+                else:
+                    self.last_send_time = time.time()
+                    ok, retryable = self._post(data)
+            except requests.exceptions.Timeout:
+                logger.warning("⏱️ Timeout (Attempt %s/%s)", attempt+1, self.max_retries)
+                ok, retryable = False, True
+            except requests.exceptions.RequestException as e:
+                logger.error("🌐 Network error (Attempt %s/%s): %s", attempt+1, self.max_retries, str(e)[:80])
+                ok, retryable = False, True
+                if self.on_network_error:
+                    self.on_network_error()
+            except Exception as e:
+                logger.error("❌ Unexpected uplink error: %s", e)
+                ok, retryable = False, False
+
+            if ok:
+                self.metrics['sent'] += 1
+                self.metrics['consecutive_errors'] = 0
+                if row_id is not None:
+                    self.store.mark_sent([row_id])
+                    self.rejections.pop(row_id, None)
+            elif retryable and attempt + 1 < self.max_retries:
+                delay = min(self.max_retry_delay, self.retry_delay * (2 ** attempt)) + random.uniform(0, 2)
+                logger.info("⏳ Retrying in %.1f seconds...", delay)
+                self.metrics['retries'] += 1
+                with self.cond:
+                    heapq.heappush(self.schedule, (time.time() + delay, next(self.sequence),
+                                                   timestamp, data, row_id, attempt + 1))
+                continue
+            else:
+                self.metrics['failed'] += 1
+                self.metrics['consecutive_errors'] += 1
+                if row_id is None:
+                    self.store.add(timestamp, data)
+                elif not retryable:
+                    rejections = self.rejections.get(row_id, 0) + 1
+                    if rejections >= self.max_rejections:
+                        logger.warning("🗑️ Backlog entry %s refused %s times; dropping it", timestamp, rejections)
+                        self.store.mark_rejected([row_id])
+                        self.rejections.pop(row_id, None)
+                        self.metrics['rejected'] += 1
+                    else:
+                        self.rejections[row_id] = rejections
+
+            if row_id is not None:
+                with self.cond:
+                    self.in_flight_rows.discard(row_id)
+
+# ============================================================================
+# REPORT BY EXCEPTION
+# ============================================================================
+
+class SwingingDoor:
+    """Swinging-door compression of one series within +/- `deviation`.
+
+    update() returns the previous point once it becomes a turning point,
+    that is when no straight line from the last archived point stays
+    within the deviation of every point since; otherwise None. On a flat
+    or steadily sloping series, noise whose full swing fits inside the
+    deviation never closes the door.
+    """
+
+    __slots__ = ('deviation', 'archived', 'held', 'upper', 'lower')
+
+    def __init__(self, deviation):
+        self.deviation = deviation
+        self.archived = None
+        self.held = None
+        self.upper = math.inf
+        self.lower = -math.inf
+
+    def restart(self, timestamp, value):
+        self.archived = (timestamp, value)
+        self.held = None
+        self.upper = math.inf
+        self.lower = -math.inf
+
+    def update(self, timestamp, value):
+        if self.archived is None:
+            self.restart(timestamp, value)
+            return None
+        start, origin = self.archived
+        elapsed = timestamp - start
+        if elapsed <= 0:
+            return None
+        upper = min(self.upper, (value + self.deviation - origin) / elapsed)
+        lower = max(self.lower, (value - self.deviation - origin) / elapsed)
+        if lower <= upper or self.held is None:
+            self.upper, self.lower, self.held = upper, lower, (timestamp, value)
+            return None
+        # Door closed: the held point is archived and the series restarts there
+        point = self.held
+        self.restart(*point)
+        self.update(timestamp, value)
+        return point
+
+
+class ExceptionReporter:
+    """Decides which readings go to ThingSpeak.
+
+    observe() runs each cycle's upload values through a SwingingDoor per
+    continuous field, with the field's deadband as the deviation, and
+    collects the turning points; take_points() hands them over so they can
+    be sent with their own timestamps. Only a bulk update can carry those,
+    so without one (`coalesce` False) no points are collected. due() says
+    whether the current values go out: a field moved more than its deadband
+    since the channel last saw it, turbidity or the status changed, or
+    `heartbeat` seconds passed. The channel only "sees" what the caller
+    confirms through mark_points_sent() and mark_sent().
+    """
+
+    SERIES = ('temperature', 'ph', 'ec', 'nitrogen', 'phosphorus')
+
+    def __init__(self, deadbands, heartbeat=900, coalesce=True):
+        self.deadbands = dict(deadbands)
+        self.heartbeat = heartbeat
+        self.coalesce = coalesce
+        self.doors = {field: SwingingDoor(self.deadbands.get(field, 0.0)) for field in self.SERIES}
+        self.points = {}
+        self.reported = {}
+        self.last_report = None
+        self.reports = 0
+        self.suppressed = 0
+        self.coalesced = 0
+
+    @classmethod
+    def from_config(cls, reporting, coalesce=True):
+        if not reporting.ENABLED:
+            return None
+        return cls(reporting.DEADBAND.to_dict(), reporting.HEARTBEAT, coalesce)
+
+    def observe(self, timestamp, data):
+        if not self.coalesce:
+            return
+        for field, door in self.doors.items():
+            value = data.get(field)
+            if value is None:
+                continue
+            point = door.update(timestamp, value)
+            if point is not None:
+                self.points.setdefault(point[0], {})[field] = point[1]
+
+    def changed(self, data):
+        reported = self.reported
+        for field, value in data.items():
+            if value is None:
+                continue
+            last = reported.get(field)
+            if last is None:
+                return True
+            if field == 'turbidity':
+                if bool(value) != bool(last):
+                    return True
+            elif field == 'quality_status':
+                if value != last:
+                    return True
+            elif abs(value - last) > self.deadbands.get(field, 0.0):
+                return True
+        return False
+
+    def take_points(self):
+        """Turning points collected since the last call, as [(timestamp, values)]."""
+        points = sorted(self.points.items())
+        self.points = {}
+        return points
+
+    def mark_points_sent(self, points):
+        # Points queued for a bulk update; due() then compares against them
+        for _, values in points:
+            self.reported.update(values)
+        self.coalesced += len(points)
+
+    def due(self, now, data):
+        due = self.last_report is None or now - self.last_report >= self.heartbeat or self.changed(data)
+        if not due:
+            self.suppressed += 1
+        return due
+
+    def mark_sent(self, now, data):
+        self.last_report = now
+        self.reports += 1
+        for field, value in data.items():
+            if value is None:
+                continue
+            self.reported[field] = value
+            door = self.doors.get(field)
+            if door:
+                door.restart(now, value)
+
+    def stats(self):
+        return {'reports': self.reports, 'suppressed': self.suppressed,
+                'coalesced': self.coalesced, 'pending': len(self.points)}
+
+# ============================================================================
+# SMS ALERTS
+# ============================================================================
+
+class GsmModem:
+    """Non-blocking AT command state machine for a SIM800-style modem.
+
+    init() and send_sms() only write the first command; poll() reads whatever
+    the modem has answered so far and moves on as soon as the reply it waits
+    for ('OK', '>', '+CMGS:' or 'ERROR') arrives, or gives up at the step's
+    deadline. Nothing here sleeps, so the caller decides how often to poll.
+    """
+
+    INIT_COMMANDS = ("AT", "ATE0", "AT+CMGF=1")
+
+    def __init__(self, port, clock=time, command_timeout=5, prompt_timeout=10, send_timeout=60):
+        self.port = port
+        self.clock = clock
+        self.command_timeout = command_timeout
+        self.prompt_timeout = prompt_timeout
+        self.send_timeout = send_timeout
+        self.state = "IDLE"
+        self.ready = False
+        self.buffer = ""
+        self.deadline = None
+        self.commands = deque()
+        self.command = None
+        self.body = None
+
+    @property
+    def busy(self):
+        return self.state != "IDLE"
+
+    def _begin(self):
+        if self.busy:
+            raise RuntimeError(f"GSM modem busy ({self.state})")
+        # Drop anything left over from an abandoned exchange
+        self.port.read_all()
+        self.buffer = ""
+
+    def _expect(self, state, timeout):
+        self.state = state
+        self.deadline = self.clock.time() + timeout
+
+    def _finish(self, ok, detail):
+        self.state = "IDLE"
+        self.deadline = None
+        self.body = None
+        return ok, detail
+
+    def _next_command(self):
+        self.command = self.commands.popleft()
+        self.buffer = ""
+        self.port.write((self.command + "\r\n").encode())
+        self._expect("COMMAND", self.command_timeout)
+
+    def init(self):
+        self._begin()
+        self.ready = False
+        self.commands = deque(self.INIT_COMMANDS)
+        self._next_command()
+
+    def send_sms(self, phone, text):
+        self._begin()
+        self.body = text.encode(errors="replace") + b"\x1a"
+        self.port.write(f'AT+CMGS="{phone}"\r\n'.encode())
+        self._expect("PROMPT", self.prompt_timeout)
+
+    def poll(self):
+        # None while the exchange is in progress, then (ok, detail)
+        if self.state == "IDLE":
+            return None
+        data = self.port.read_all()
+        if data:
+            self.buffer += data.decode(errors="ignore")
+        buffer = self.buffer
+
+        _, error, rest = buffer.partition("ERROR")
+        if error and "\n" in rest:
+            failed = self.command if self.state == "COMMAND" else self.state.lower()
+            return self._finish(False, f"{failed}: {buffer.strip()}")
+
+        if self.state == "COMMAND":
+            if "OK" in buffer:
+                if self.commands:
+                    self._next_command()
+                    return None
+                self.ready = True
+                return self._finish(True, "ready")
+        elif self.state == "PROMPT":
+            if ">" in buffer:
+                self.buffer = ""
+                self.port.write(self.body)
+                self._expect("SENDING", self.send_timeout)
+                return None
+        elif self.state == "SENDING":
+            reply = buffer.partition("+CMGS:")[2]
+            if "\n" in reply:
+                return self._finish(True, reply.split()[0])
+
+        if self.clock.time() >= self.deadline:
+            state = self.state
+            if state in ("PROMPT", "SENDING"):
+                # ESC abandons the half-entered message
+                self.port.write(b"\x1b")
+            # A modem that stops answering gets the init sequence again
+            self.ready = False
+            return self._finish(False, f"timeout waiting in {state}")
+        return None
+
+
+class SmsOutbox:
+    """SQLite queue of outgoing SMS, one row per recipient.
+
+    Messages survive a restart until sent or out of attempts. add() skips a
+    message whose key is already queued for that phone, or was sent to it
+    within the cooldown, so a flapping alert does not repeat itself.
+    """
+
+    def __init__(self, path):
+        ensure_directory_exists(path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sms_outbox ("
+            " id INTEGER PRIMARY KEY,"
+            " phone TEXT NOT NULL, key TEXT NOT NULL, body TEXT NOT NULL,"
+            " created REAL NOT NULL, due REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " sent_at REAL, detail TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_sms_outbox_key ON sms_outbox(phone, key)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_sms_outbox_due ON sms_outbox(due) WHERE status = 'pending'")
+        self.conn.commit()
+
+    def add(self, phone, key, body, now, cooldown=0):
+        with self.lock, self.conn:
+            duplicate = self.conn.execute(
+                "SELECT 1 FROM sms_outbox WHERE phone = ? AND key = ? AND "
+                "(status = 'pending' OR (status = 'sent' AND sent_at > ?)) LIMIT 1",
+                (phone, key, now - cooldown)
+            ).fetchone()
+            if duplicate:
+                return False
+            self.conn.execute(
+                "INSERT INTO sms_outbox (phone, key, body, created, due) VALUES (?, ?, ?, ?, ?)",
+                (phone, key, body, now, now)
+            )
+            return True
+
+    def next_due(self):
+        # (id, phone, body, attempts, due) of the oldest pending message
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, phone, body, attempts, due FROM sms_outbox "
+                "WHERE status = 'pending' ORDER BY due, id LIMIT 1"
+            ).fetchone()
+
+    def mark_sent(self, row_id, now, detail=None):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE sms_outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1, detail = ? WHERE id = ?",
+                (now, detail, row_id)
+            )
+
+    def retry(self, row_id, due, detail=None):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE sms_outbox SET due = ?, attempts = attempts + 1, detail = ? WHERE id = ?",
+                (due, detail, row_id)
+            )
+
+    def mark_failed(self, row_id, detail=None):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE sms_outbox SET status = 'failed', attempts = attempts + 1, detail = ? WHERE id = ?",
+                (detail, row_id)
+            )
+
+    def pending_count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM sms_outbox WHERE status = 'pending'").fetchone()[0]
+
+    def prune(self, retention_days, now=None):
+        now = time.time() if now is None else now
+        with self.lock, self.conn:
+            return self.conn.execute(
+                "DELETE FROM sms_outbox WHERE status != 'pending' AND created < ?",
+                (now - retention_days * 86400,)
+            ).rowcount
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class SmsDispatcher:
+    """Background SMS sender draining an SmsOutbox through a GsmModem.
+
+    submit() only writes to the outbox, so the monitor never waits on the
+    modem. The worker initialises the modem, sends one message at a time,
+    and reschedules failures with exponential backoff up to max_attempts.
+    step() does one unit of that work and can be driven directly in tests.
+    """
+
+    def __init__(self, modem, outbox, clock=time, cooldown=120, max_attempts=3,
+                 retry_delay=60, poll_interval=0.05):
+        self.modem = modem
+        self.outbox = outbox
+        self.clock = clock
+        self.cooldown = cooldown
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.current = None
+        self.send_started = None
+        self.init_after = 0
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.metrics = {'queued': 0, 'deduplicated': 0, 'sent': 0, 'retries': 0, 'failed': 0}
+
+    @classmethod
+    def from_config(cls, cfg, port, outbox, clock=time):
+        sms = cfg.SMS
+        modem = GsmModem(port, clock, command_timeout=sms.COMMAND_TIMEOUT,
+                         prompt_timeout=sms.PROMPT_TIMEOUT, send_timeout=sms.SEND_TIMEOUT) if port else None
+        return cls(modem, outbox, clock, cooldown=cfg.SMS_COOLDOWN,
+                   max_attempts=sms.MAX_ATTEMPTS, retry_delay=sms.RETRY_DELAY)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="SMS", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=3):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+
+    def submit(self, phones, key, body):
+        now = self.clock.time()
+        queued = 0
+        for phone in phones:
+            if not phone:
+                continue
+            if self.outbox.add(phone, key, body, now, self.cooldown):
+                queued += 1
+            else:
+                self.metrics['deduplicated'] += 1
+        self.metrics['queued'] += queued
+        if queued:
+            if not self.modem:
+                logger.warning("⚠️ GSM module not available; %s SMS kept in the outbox", queued)
+            with self.cond:
+                self.cond.notify()
+        return queued
+
+    def stats(self):
+        stats = dict(self.metrics)
+        stats['pending'] = self.outbox.pending_count()
+        stats['modem_ready'] = bool(self.modem and self.modem.ready)
+        return stats
+
+    def step(self):
+        # One unit of work; returns seconds until the next call is useful (None: wait for submit)
+        modem = self.modem
+        if modem is None:
+            return None
+        now = self.clock.time()
+
+        if modem.busy:
+            result = modem.poll()
+            if result is None:
+                return self.poll_interval
+            self._finished(now, *result)
+            return 0
+
+        if not modem.ready:
+            if now < self.init_after:
+                return self.init_after - now
+            modem.init()
+            return self.poll_interval
+
+        row = self.outbox.next_due()
+        if row is None:
+            return None
+        row_id, phone, body, attempts, due = row
+        if due > now:
+            return due - now
+        self.current = row
+        self.send_started = time.perf_counter()
+        modem.send_sms(phone, body)
+        return self.poll_interval
+
+    def _finished(self, now, ok, detail):
+        row, self.current = self.current, None
+        if row is None:
+            if ok:
+                logger.info("✅ GSM module initialized")
+            else:
+                logger.error("❌ GSM initialization failed: %s", detail)
+                self.init_after = now + self.retry_delay
+            return
+
+        row_id, phone, _, attempts, _ = row
+        STAGE_SECONDS['sms_send'].observe(time.perf_counter() - self.send_started)
+        if ok:
+            self.outbox.mark_sent(row_id, now, detail)
+            self.metrics['sent'] += 1
+            logger.info("✅ SMS sent to %s (ref %s)", phone, detail)
+        elif attempts + 1 < self.max_attempts:
+            delay = self.retry_delay * (2 ** attempts)
+            self.outbox.retry(row_id, now + delay, detail)
+            self.metrics['retries'] += 1
+            logger.warning("⏳ SMS to %s failed (%s); retrying in %.1f seconds", phone, detail, delay)
+        else:
+            self.outbox.mark_failed(row_id, detail)
+            self.metrics['failed'] += 1
+            logger.error("❌ SMS failed to %s: %s", phone, detail)
+
+    def _run(self):
+        while self.running:
+            try:
+                delay = self.step()
+            except Exception as e:
+                logger.error("❌ SMS worker error: %s", e)
+                if self.modem:
+                    self.modem.state, self.modem.ready = "IDLE", False
+                self.current = None
+                delay = self.retry_delay
+            if delay == 0:
+                continue
+            with self.cond:
+                if self.running:
+                    self.cond.wait(timeout=delay)
+
+def sms_alert(status, when, pond=None):
+    # (dedup key, message) for a critical status
+    where = f" {pond}" if pond else ""
+    message = f"🚨 POND ALERT{where} ({status['overall']})\n"
+    message += f"Time: {datetime.fromtimestamp(when).strftime('%Y-%m-%d %H:%M')}\n\n"
+    message += "Critical Issues:\n" + "\n".join(status['alerts'][:3])
+    if status['recommendations']:
+        message += "\n\nActions:\n" + "\n".join(list(status['recommendations'])[:2])
+    # Same level and same tripped rules is the same alert for dedup/cooldown
+    key = (f"{pond}:" if pond else "") + status['overall'] + ":" + ",".join(sorted(code for code, _ in status['codes']))
+    return key, message
+
+# ============================================================================
+# WATER QUALITY RULES ENGINE
+# ============================================================================
+
+class WaterQualityRules:
+    """Compiles the rule tables once into per-parameter band tuples.
+
+    Each band is (limit, score, code, alert, recommendation) with the alert
+    template's bound format method, sorted so the first band that holds
+    wins. evaluate() walks those tuples for one set of averages;
+    evaluate_batch() scores NumPy columns of stored readings in one pass.
+    """
+
+    def __init__(self, rules=WATER_QUALITY_RULES, no_data=NO_DATA_RULE,
+                 score_levels=QUALITY_SCORE_LEVELS, pump_rules=PUMP_MODE_RULES,
+                 default_pump_mode=DEFAULT_PUMP_MODE):
+        self.params = []
+        self.valid_ranges = {}
+        self.sensor_ranges = {}
+        self._bands = {}
+        self._checks = []
+        for rule in rules:
+            param = rule['param']
+            self.params.append(param)
+            if 'valid_range' in rule:
+                self.valid_ranges[param] = tuple(rule['valid_range'])
+            if 'sensor_range' in rule:
+                self.sensor_ranges[param] = tuple(rule['sensor_range'])
+            # Tightest band first on each side, so the first comparison that holds wins
+            below = sorted(rule.get('below', []), key=lambda band: band['limit'])
+            above = sorted(rule.get('above', []), key=lambda band: band['limit'], reverse=True)
+            missing = rule.get('missing')
+            self._bands[param] = (below, above, missing)
+            self._checks.append((param, self._band(missing) if missing else None,
+                                 tuple(map(self._band, below)), tuple(map(self._band, above))))
+        self.no_data = no_data
+        self.no_data_params = tuple(no_data['params'])
+        self.score_levels = sorted(score_levels, reverse=True)
+        self.pump_rules = pump_rules
+        self.default_pump_mode = default_pump_mode
+
+    @staticmethod
+    def _band(band):
+        return (float(band['limit']) if 'limit' in band else None, int(band['score']), band['code'],
+                band['alert'].format, band['recommendation'])
+
+    def evaluate(self, values):
+        get = values.get
+        status = {'overall': 'GOOD', 'score': 0, 'alerts': [], 'codes': [], 'recommendations': set(), 'trends': {}}
+        for param in self.no_data_params:
+            if get(param) is not None:
+                break
+        else:
+            no_data = self.no_data
+            status['alerts'].append(no_data['alert'])
+            status['codes'].append((no_data['code'], None))
+            status['score'] = no_data['score']
+            status['overall'] = no_data['level']
+            return status
+
+        score = 0
+        alerts = status['alerts']
+        codes = status['codes']
+        recommendations = status['recommendations']
+        for param, missing, below, above in self._checks:
+            value = get(param)
+            hit = None
+            if value is None:
+                hit = missing
+            else:
+                for band in below:
+                    if value < band[0]:
+                        hit = band
+                        break
+                else:
+                    for band in above:
+                        if value > band[0]:
+                            hit = band
+                            break
+            if hit is not None:
+                _, band_score, code, alert, recommendation = hit
+                score += band_score
+                alerts.append(alert(value=value))
+                codes.append((code, value))
+                if recommendation:
+                    recommendations.add(recommendation)
+
+        status['score'] = score
+        for threshold, level in self.score_levels:
+            if score >= threshold:
+                status['overall'] = level
+                break
+        return status
+
+    def evaluate_batch(self, columns):
+        # columns: {param: array-like}, NaN marks a missing reading
+        if np is None:
+            raise RuntimeError("NumPy is required for batch rule evaluation")
+
+        arrays = {param: np.asarray(col, dtype=float) for param, col in columns.items()}
+        size = len(next(iter(arrays.values())))
+        nan_column = np.full(size, np.nan)
+        score = np.zeros(size, dtype=np.int64)
+        bands = {}
+
+        for param in self.params:
+            below, above, missing = self._bands[param]
+            below_limits = [band['limit'] for band in below]
+            above_limits = [band['limit'] for band in reversed(above)]
+            col = arrays.get(param, nan_column)
+            is_missing = np.isnan(col)
+            codes = np.full(size, None, dtype=object)
+
+            if below:
+                i = np.searchsorted(below_limits, col, side='right')
+                hit_below = ~is_missing & (i < len(below))
+                band_scores = np.array([band['score'] for band in below])
+                score += np.where(hit_below, band_scores[np.minimum(i, len(below) - 1)], 0)
+                codes[hit_below] = np.array([band['code'] for band in below], dtype=object)[i[hit_below]]
+            else:
+                hit_below = np.zeros(size, dtype=bool)
+
+            if above:
+                j = np.searchsorted(above_limits, col, side='left') - 1
+                hit_above = ~is_missing & ~hit_below & (j >= 0)
+                band_scores = np.array([band['score'] for band in reversed(above)])
+                score += np.where(hit_above, band_scores[np.maximum(j, 0)], 0)
+                codes[hit_above] = np.array([band['code'] for band in reversed(above)], dtype=object)[j[hit_above]]
+
+            if missing:
+                score += np.where(is_missing, missing['score'], 0)
+                codes[is_missing] = missing['code']
+
+            bands[param] = codes
+
+        no_data = np.ones(size, dtype=bool)
+        for param in self.no_data['params']:
+            no_data &= np.isnan(arrays.get(param, nan_column))
+        score = np.where(no_data, self.no_data['score'], score)
+
+        overall = np.full(size, QUALITY_STATUS_CODES['GOOD'], dtype=np.int8)
+        for threshold, level in reversed(self.score_levels):
+            overall[score >= threshold] = QUALITY_STATUS_CODES[level]
+        overall[no_data] = QUALITY_STATUS_CODES[self.no_data['level']]
+
+        return {'score': score, 'overall': overall, 'bands': bands}
+
+    def pump_mode(self, values):
+        for rule in self.pump_rules:
+            value = values.get(rule['param'])
+            if value is None:
+                continue
+            if ('below' in rule and value < rule['below']) or ('above' in rule and value > rule['above']):
+                return rule['mode']
+        return self.default_pump_mode
+
+QUALITY_RULES = WaterQualityRules()
+
+# ============================================================================
+# ROLLING HISTORY WINDOW
+# ============================================================================
+
+class RollingWindow:
+    """Fixed-size ring of floats with O(1) sum/mean/min/max and half-window means."""
+
+    def __init__(self, capacity):
+        self.capacity = max(1, int(capacity))
+        self._values = array.array('d', bytes(8 * self.capacity))
+        self._head = 0
+        self._count = 0
+        self._seq = 0
+        self._sum_first = 0.0
+        self._sum_second = 0.0
+        self._min_queue = deque()
+        self._max_queue = deque()
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self._at(i)
+
+    def _at(self, i):
+        return self._values[(self._head + i) % self.capacity]
+
+    def append(self, value):
+        value = float(value)
+        mid = self._count // 2
+        if self._count == self.capacity:
+            oldest = self._values[self._head]
+            if mid:
+                # Oldest leaves the first half, the old midpoint crosses over into it
+                crossing = self._at(mid)
+                self._sum_first += crossing - oldest
+                self._sum_second -= crossing
+            else:
+                self._sum_second -= oldest
+            self._values[self._head] = value
+            self._head = (self._head + 1) % self.capacity
+        else:
+            self._values[(self._head + self._count) % self.capacity] = value
+            self._count += 1
+            if self._count // 2 > mid:
+                crossing = self._at(mid)
+                self._sum_first += crossing
+                self._sum_second -= crossing
+        self._sum_second += value
+
+        self._seq += 1
+        expired = self._seq - self._count
+        while self._min_queue and self._min_queue[-1][1] >= value:
+            self._min_queue.pop()
+        self._min_queue.append((self._seq, value))
+        while self._min_queue[0][0] <= expired:
+            self._min_queue.popleft()
+        while self._max_queue and self._max_queue[-1][1] <= value:
+            self._max_queue.pop()
+        self._max_queue.append((self._seq, value))
+        while self._max_queue[0][0] <= expired:
+            self._max_queue.popleft()
+
+        if self._seq % self.capacity == 0:
+            self._resync()
+
+    def _resync(self):
+        # Re-sum once per window to stop floating point drift over long runs
+        mid = self._count // 2
+        self._sum_first = sum(self._at(i) for i in range(mid))
+        self._sum_second = sum(self._at(i) for i in range(mid, self._count))
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+        self._sum_first = 0.0
+        self._sum_second = 0.0
+        self._min_queue.clear()
+        self._max_queue.clear()
+
+    @property
+    def sum(self):
+        return self._sum_first + self._sum_second
+
+    @property
+    def mean(self):
+        if not self._count:
+            return None
+        return self.sum / self._count
+
+    @property
+    def min(self):
+        return self._min_queue[0][1] if self._count else None
+
+    @property
+    def max(self):
+        return self._max_queue[0][1] if self._count else None
+
+    @property
+    def last(self):
+        return self._at(self._count - 1) if self._count else None
+
+    def half_means(self):
+        mid = self._count // 2
+        if not mid:
+            return None, None
+        return self._sum_first / mid, self._sum_second / (self._count - mid)
+
+def window_trend(window):
+    if len(window) < 3:
+        return "STABLE"
+    first_half_avg, second_half_avg = window.half_means()
+    diff = second_half_avg - first_half_avg
+    threshold = max(0.1 * abs(first_half_avg), 0.2)
+    if diff > threshold:
+        return "INCREASING"
+    elif diff < -threshold:
+        return "DECREASING"
+    return "STABLE"
+
+# ============================================================================
+# SENSOR FILTERS
+# ============================================================================
+
+# Filtered channels: the RS485 probe's registers plus the DS18B20
+PROBE_FILTER_CHANNELS = ("temperature", "ph", "ec", "nitrogen", "phosphorus", "potassium")
+FILTER_CHANNELS = PROBE_FILTER_CHANNELS + ("ds18b20",)
+
+class HampelFilter:
+    """Rejects spikes against the median of the last `size` readings.
+
+    A reading more than `threshold` scaled MADs (never less than
+    min_deviation) from the window median is an outlier and is replaced by
+    that median. The raw value still enters the window, so a real step
+    change gets through once it fills half of it. The ring is preallocated
+    and the MAD is found by walking the sorted window outward from the
+    median, so a sample builds no lists and costs O(size).
+    """
+
+    def __init__(self, size=7, threshold=3.0, min_deviation=0.0):
+        self.size = max(3, int(size))
+        self.threshold = threshold
+        self.min_deviation = min_deviation
+        self._ring = array.array('d', bytes(8 * self.size))
+        self._sorted = []
+        self._head = 0
+        self.outliers = 0
+
+    def __len__(self):
+        return len(self._sorted)
+
+    @property
+    def median(self):
+        ordered = self._sorted
+        count = len(ordered)
+        if not count:
+            return None
+        mid = count // 2
+        return ordered[mid] if count % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+    def update(self, value):
+        # Returns (value to use, whether the reading was an outlier)
+        ordered = self._sorted
+        count = len(ordered)
+        outlier = False
+        median = None
+        if count >= 3:
+            median = self.median
+            # Deviations from the median grow walking outward through the
+            # sorted window; merging both sides yields them in order
+            right = bisect.bisect_right(ordered, median)
+            left = right - 1
+            for _ in range(count // 2 + 1):
+                if right == count or (left >= 0 and median - ordered[left] <= ordered[right] - median):
+                    mad = median - ordered[left]
+                    left -= 1
+                else:
+                    mad = ordered[right] - median
+                    right += 1
+            outlier = abs(value - median) > self.threshold * max(1.4826 * mad, self.min_deviation)
+
+        self._push(value)
+        if outlier:
+            self.outliers += 1
+            return median, True
+        return value, False
+
+    def _push(self, value):
+        ordered = self._sorted
+        if len(ordered) == self.size:
+            del ordered[bisect.bisect_left(ordered, self._ring[self._head])]
+        self._ring[self._head] = value
+        self._head = (self._head + 1) % self.size
+        bisect.insort(ordered, value)
+
+    def values(self):
+        # Window contents, oldest first
+        count = len(self._sorted)
+        if count < self.size:
+            return self._ring[:count].tolist()
+        return (self._ring[self._head:] + self._ring[:self._head]).tolist()
+
+    def load(self, values):
+        self.clear()
+        for value in list(values)[-self.size:]:
+            self._push(value)
+
+    def clear(self):
+        self._sorted.clear()
+        self._head = 0
+
+class TemperatureFusion:
+    """One-state Kalman filter over several temperature sources.
+
+    Each source's noise variance is learned from its own innovations, so
+    the quieter sensor gets the larger weight instead of a fixed blend.
+    Readings more than `gate` standard deviations from the estimate are
+    not fused; if every source disagrees `reset_after` times in a row the
+    estimate restarts from them (the water really did change).
+    """
+
+    def __init__(self, sources=("rs485", "ds18b20"), process_noise=1e-4, min_variance=0.004,
+                 initial_variance=0.25, gate=4.0, alpha=0.05, reset_after=3):
+        self.process_noise = process_noise
+        self.min_variance = min_variance
+        self.initial_variance = initial_variance
+        self.gate = gate
+        self.alpha = alpha
+        self.reset_after = reset_after
+        self.noise = {source: initial_variance for source in sources}
+        self.rejected = dict.fromkeys(sources, 0)
+        self.estimate = None
+        self.variance = None
+        self.last_time = None
+        self.misses = 0
+
+    def weights(self):
+        # Share of the estimate each source currently contributes
+        inverse = {source: 1.0 / variance for source, variance in self.noise.items()}
+        total = sum(inverse.values())
+        return {source: value / total for source, value in inverse.items()}
+
+    def _restart(self, timestamp, values):
+        self.estimate = sum(values) / len(values)
+        self.variance = self.initial_variance
+        self.last_time = timestamp
+        self.misses = 0
+
+    def update(self, timestamp, readings):
+        # readings: {source: value or None}; returns (estimate, {source: fused?})
+        fused = dict.fromkeys(readings)
+        values = [value for value in readings.values() if value is not None]
+        if self.estimate is None:
+            if values:
+                self._restart(timestamp, values)
+                fused = {source: value is not None for source, value in readings.items()}
+            return self.estimate, fused
+
+        self.variance += self.process_noise * max(0.0, timestamp - self.last_time)
+        self.last_time = timestamp
+        gate = self.gate * self.gate
+        for source, value in readings.items():
+            if value is None:
+                continue
+            noise = self.noise[source]
+            innovation = value - self.estimate
+            spread = self.variance + noise
+            if innovation * innovation > gate * spread:
+                self.rejected[source] += 1
+                fused[source] = False
+                continue
+            gain = self.variance / spread
+            self.estimate += gain * innovation
+            self.variance *= 1 - gain
+            # E[innovation^2] = P + R, so innovation^2 - P estimates R
+            sample = innovation * innovation - (spread - noise)
+            self.noise[source] = max(self.min_variance, noise + self.alpha * (sample - noise))
+            fused[source] = True
+
+        if values and not any(fused.values()):
+            self.misses += 1
+            if self.misses >= self.reset_after:
+                self._restart(timestamp, values)
+        else:
+            self.misses = 0
+        return self.estimate, fused
+
+class SensorHealth:
+    """0-100 per sensor: the weighted share of recent readings that arrived and passed the filters."""
+
+    def __init__(self, sensors, alpha=0.05):
+        self.alpha = alpha
+        self.scores = dict.fromkeys(sensors, 100.0)
+
+    def update(self, sensor, ok):
+        score = self.scores[sensor]
+        self.scores[sensor] = score + self.alpha * ((100.0 if ok else 0.0) - score)
+
+class FilterStage:
+    """Cleans one cycle's readings before they reach the history windows.
+
+    Every channel is range-checked against the rule table's sensor ranges
+    and run through its own HampelFilter. The RS485 and DS18B20
+    temperatures are then fused by TemperatureFusion. SensorHealth scores
+    each input from the outcome.
+    """
+
+    def __init__(self, window=7, threshold=3.0, min_deviation=None, sensor_ranges=None,
+                 fusion=None, health_alpha=0.05):
+        min_deviation = min_deviation or {}
+        sensor_ranges = sensor_ranges or {}
+        self.filters = {channel: HampelFilter(window, threshold, min_deviation.get(channel, 0.0))
+                        for channel in FILTER_CHANNELS}
+        temperature_range = sensor_ranges.get('temperature')
+        self.ranges = {channel: sensor_ranges.get(channel) for channel in FILTER_CHANNELS}
+        self.ranges['ds18b20'] = temperature_range
+        self.fusion = fusion or TemperatureFusion()
+        self.health = SensorHealth(FILTER_CHANNELS, health_alpha)
+        self.out_of_range = dict.fromkeys(FILTER_CHANNELS, 0)
+        # Readings the Hampel filters replaced in the latest process() call
+        self.last_outliers = 0
+
+    @classmethod
+    def from_config(cls, cfg, sensor_ranges=None):
+        if not cfg.ENABLED:
+            return None
+        return cls(
+            window=cfg.WINDOW,
+            threshold=cfg.THRESHOLD,
+            min_deviation=cfg.MIN_DEVIATION.to_dict(),
+            sensor_ranges=sensor_ranges,
+            fusion=TemperatureFusion(process_noise=cfg.PROCESS_NOISE, min_variance=cfg.MIN_VARIANCE, gate=cfg.GATE),
+            health_alpha=cfg.HEALTH_ALPHA
+        )
+
+    def _filter(self, channel, value):
+        if value is None:
+            return None, False
+        limits = self.ranges[channel]
+        if limits and not limits[0] <= value <= limits[1]:
+            self.out_of_range[channel] += 1
+            return None, False
+        value, outlier = self.filters[channel].update(value)
+        self.last_outliers += outlier
+        return value, not outlier
+
+    def process(self, timestamp, rs485, ds18b20_temp=None):
+        """Returns (cleaned RS485 readings, cleaned DS18B20 temperature, fused temperature)."""
+        cleaned = dict(rs485)
+        ok = {}
+        self.last_outliers = 0
+        for channel in PROBE_FILTER_CHANNELS:
+            if channel in rs485:
+                cleaned[channel], ok[channel] = self._filter(channel, rs485[channel])
+            else:
+                ok[channel] = False
+        ds18b20_temp, ok['ds18b20'] = self._filter('ds18b20', ds18b20_temp)
+
+        temperature, fused = self.fusion.update(timestamp, {'rs485': cleaned.get('temperature'),
+                                                            'ds18b20': ds18b20_temp})
+        ok['temperature'] = ok['temperature'] and fused['rs485'] is not False
+        ok['ds18b20'] = ok['ds18b20'] and fused['ds18b20'] is not False
+        health = self.health
+        for channel, passed in ok.items():
+            health.update(channel, passed)
+        return cleaned, ds18b20_temp, temperature
+
+    def stats(self):
+        return {
+            'health': {channel: round(score, 1) for channel, score in self.health.scores.items()},
+            'outliers': {channel: f.outliers for channel, f in self.filters.items()},
+            'out_of_range': dict(self.out_of_range),
+            'fusion_weights': {source: round(w, 3) for source, w in self.fusion.weights().items()}
+        }
+
+def replay_trace(stage, trace, start=None):
+    """Runs every sample of a SensorTrace through `stage` offline.
+
+    Returns {'raw': columns, 'filtered': columns} where the temperature
+    column holds the fused estimate. Nothing touches hardware or history.
+    """
+    start = time.time() if start is None else start
+    raw = {channel: array.array('d') for channel in FILTER_CHANNELS}
+    filtered = {channel: array.array('d') for channel in FILTER_CHANNELS}
+    nan = float('nan')
+    for i in range(len(trace)):
+        sample = trace.at(i * trace.interval)
+        rs485 = {channel: sample[channel] for channel in PROBE_FILTER_CHANNELS}
+        cleaned, ds18b20_temp, temperature = stage.process(start + i * trace.interval, rs485, sample['water_temp'])
+        cleaned['temperature'] = temperature
+        cleaned['ds18b20'] = ds18b20_temp
+        for channel in FILTER_CHANNELS:
+            raw[channel].append(rs485[channel] if channel != 'ds18b20' else sample['water_temp'])
+            value = cleaned[channel]
+            filtered[channel].append(nan if value is None else value)
+    return {'raw': raw, 'filtered': filtered}
+
+# ============================================================================
+# PER-CYCLE SNAPSHOTS
+# ============================================================================
+
+@dataclass(frozen=True)
+class SensorSample:
+    timestamp: float
+    rs485: Mapping
+    ds18b20_temp: Optional[float]
+    turbidity: Optional[bool]
+    # Fused water temperature, set once the sample has been filtered
+    temperature: Optional[float] = None
+
+    @property
+    def valid(self):
+        return bool(self.rs485)
+
+@dataclass(frozen=True)
+class CycleSnapshot:
+    cycle: int
+    sample: SensorSample
+    status: Mapping
+
+def freeze_status(status):
+    return MappingProxyType({
+        'overall': status['overall'],
+        'score': status['score'],
+        'alerts': tuple(status['alerts']),
+        'codes': tuple(status['codes']),
+        'recommendations': tuple(status['recommendations']),
+        'trends': MappingProxyType(dict(status['trends']))
+    })
+
+@dataclass(frozen=True)
+class PublishedSnapshot:
+    body: bytes
+    etag: str
+    event: bytes
+
+def sse_event(event, data, event_id=None):
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + data.decode())
+    return ("\n".join(lines) + "\n\n").encode()
+
+def diff_payload(old, new):
+    # Changed fields only, one level into nested dicts (readings, status, ...)
+    patch = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            changed = {k: v for k, v in value.items() if previous.get(k, None) != v or k not in previous}
+            removed = [k for k in previous if k not in value]
+            for k in removed:
+                changed[k] = None
+            if changed:
+                patch[key] = changed
+        elif previous != value or key not in old:
+            patch[key] = value
+    return patch
+
+class SnapshotPublisher:
+    """Latest dashboard payload, serialized once per cycle.
+
+    publish() builds a new immutable PublishedSnapshot and swaps it in with
+    a single attribute assignment, so readers (the /api/data route) take no
+    lock and never re-serialize; they just read `current`. Live subscribers
+    (the SSE stream) get a patch with only the fields that changed, encoded
+    once and shared by every subscriber queue. A subscriber that falls
+    behind is resynced with the full snapshot instead of growing a backlog.
+    """
+
+    def __init__(self, payload=None, subscriber_queue=16):
+        self.current = None
+        self.payload = {}
+        self.sequence = 0
+        self.subscriber_queue = subscriber_queue
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.publish(payload or {
+            'last_update': None,
+            'sensor_readings': {},
+            'status': {},
+            'historical_data': {},
+            'system_status': 'Initializing...'
+        })
+
+    def publish(self, payload):
+        body = json.dumps(payload, separators=(',', ':')).encode()
+        etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+        if self.current is not None and etag == self.current.etag:
+            return self.current
+        patch = diff_payload(self.payload, payload)
+        self.sequence += 1
+        self.payload = payload
+        self.current = PublishedSnapshot(body, etag, sse_event("snapshot", body, self.sequence))
+        if patch:
+            self.broadcast(sse_event("patch", json.dumps(patch, separators=(',', ':')).encode(), self.sequence))
+        return self.current
+
+    def broadcast(self, message):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                self._resync(subscriber)
+
+    def _drain(self, subscriber):
+        try:
+            while True:
+                subscriber.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _resync(self, subscriber):
+        self._drain(subscriber)
+        try:
+            subscriber.put_nowait(self.current.event)
+        except queue.Full:
+            pass
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.subscriber_queue)
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def close(self):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            self._drain(subscriber)
+            subscriber.put_nowait(None)
+
+# ============================================================================
+# LCD RENDERING
+# ============================================================================
+
+LCD_COLS = 16
+LCD_ROWS = 2
+
+def lcd_line(text):
+    return text[:LCD_COLS].ljust(LCD_COLS)
+
+# Bound str.format per alert code: rendering an alert is one call, no text parsing
+LCD_ALERT_FORMATS = {code: template.format for code, template in LCD_ALERT_LINES.items()}
+
+_TREND_WORDS = {"INCREASING": "UP", "DECREASING": "DOWN", "STABLE": "--"}
+LCD_TREND_LINES = {
+    (temp, ph): lcd_line(f"TREND: {temp_word:<4} {ph_word:<4}")
+    for temp, temp_word in _TREND_WORDS.items()
+    for ph, ph_word in _TREND_WORDS.items()
+}
+LCD_TREND_LINES["STABLE", "STABLE"] = lcd_line("TREND: STABLE")
+
+def lcd_alert_lines(status):
+    header = lcd_line(LCD_STATUS_HEADERS[status['overall']])
+    if not status['codes']:
+        return header, lcd_line(LCD_ALERT_FALLBACK)
+    code, value = status['codes'][0]
+    fmt = LCD_ALERT_FORMATS.get(code)
+    # A rule added without an LCD line still shows which rule tripped
+    return header, lcd_line(fmt(value=value) if fmt else code)
+
+def lcd_changed_runs(old, new, merge_gap=1):
+    # (start, end) column spans that differ. Spans split by at most merge_gap
+    # unchanged cells are joined: resending a cell is cheaper than a cursor move.
+    runs = []
+    start = end = None
+    for col, (was, now) in enumerate(zip(old, new)):
+        if was == now:
+            continue
+        if start is not None and col - end > merge_gap:
+            runs.append((start, end))
+            start = None
+        if start is None:
+            start = col
+        end = col + 1
+    if start is not None:
+        runs.append((start, end))
+    return runs
+
+class LcdWriter:
+    """Remembers the frame on the LCD and writes only the cells that changed."""
+
+    def __init__(self, lcd, rows=LCD_ROWS):
+        self.lcd = lcd
+        self.rows = rows
+        self.frame = None
+        self.cells_written = 0
+
+    def invalidate(self):
+        # Next show() clears the panel and redraws from blank
+        self.frame = None
+
+    def show(self, lines):
+        lines = [lcd_line(line) for line in lines]
+        # Unknown until every write lands; a failed write forces a full redraw
+        frame, self.frame = self.frame, None
+        if frame is None:
+            self.lcd.clear()
+            frame = [" " * LCD_COLS] * self.rows
+        written = 0
+        for row, (old, new) in enumerate(zip(frame, lines)):
+            for start, end in lcd_changed_runs(old, new):
+                self.lcd.cursor_pos = (row, start)
+                self.lcd.write_string(new[start:end])
+                written += end - start
+        self.frame = lines
+        self.cells_written += written
+        return written
+
+# ============================================================================
+# RS485 PROBE
+# ============================================================================
+
+def probe_ph(raw_value, temperature):
+    if raw_value is None or raw_value <= 0.5:
+        return None
+    ph = raw_value / 3.13
+    temp_compensation = (temperature - 25) * 0.01
+    return ph - temp_compensation
+
+def combine_temperatures(rs485_temp, ds18b20_temp):
+    if rs485_temp is not None and ds18b20_temp is not None:
+        return 0.6 * rs485_temp + 0.4 * ds18b20_temp
+    elif rs485_temp is not None:
+        return rs485_temp
+    elif ds18b20_temp is not None:
+        return ds18b20_temp
+    return None
+
+def read_probe_register(instrument, register, sleep=time.sleep, retries=2):
+    for attempt in range(retries):
+        try:
+            return instrument.read_register(register, 1, functioncode=3)
+        except Exception as e:
+            logger.debug("RS485 read attempt %s failed: %s", attempt + 1, e)
+            if attempt < retries - 1:
+                sleep(0.1)
+    return None
+
+def read_probe(instrument, block_read=True, sleep=time.sleep, retries=2, fallback=True):
+    """Reads every RS485_REGISTERS value from one probe.
+
+    Returns (values, fallback, block_read): values by parameter (None where
+    unreadable), how many registers a block read had to re-read one at a
+    time, and whether block reads are still worth trying next time. With
+    fallback=False a block read that gets no answer at all is not retried
+    register by register (a dead slave would cost one timeout per register).
+    """
+    raw = None
+    attempted = block_read
+    if block_read:
+        # One transaction for the whole 4-19 span, per-register reads only for what fails
+        for attempt in range(retries):
+            try:
+                raw = instrument.read_registers(RS485_BLOCK_START, RS485_BLOCK_COUNT, functioncode=3)
+                break
+            except ModbusIllegalRequest as e:
+                logger.warning("RS485 probe rejected block read (%s), using single-register reads", e)
+                block_read = False
+                break
+            except Exception as e:
+                logger.debug("RS485 block read attempt %s failed: %s", attempt + 1, e)
+                if attempt < retries - 1:
+                    sleep(0.1)
+        if raw is None and block_read and not fallback:
+            return dict.fromkeys(RS485_REGISTERS), 0, block_read
+
+    values = {}
+    reread = 0
+    for param, reg in RS485_REGISTERS.items():
+        value = None
+        if raw is not None and len(raw) == RS485_BLOCK_COUNT:
+            word = raw[reg - RS485_BLOCK_START]
+            if word != RS485_INVALID_RAW:
+                value = word / 10.0
+        if value is None:
+            reread += attempted
+            value = read_probe_register(instrument, reg, sleep, retries)
+        values[param] = value
+    if reread:
+        logger.debug("RS485 block read: %s register(s) re-read individually", reread)
+    return values, reread, block_read
+
+def probe_data(values):
+    # Register values -> readings; pH is derived from the raw electrode value
+    data = {'temperature': values['temperature']}
+    for param in RS485_REGISTERS:
+        if param == 'temperature':
+            continue
+        value = values[param]
+        if param == 'ph':
+            data['ph_raw'] = value
+            data[param] = probe_ph(value, data['temperature'] if data['temperature'] is not None else 25)
+        else:
+            data[param] = value
+    return data
+
+# ============================================================================
+# 1-WIRE TEMPERATURE
+# ============================================================================
+
+W1_DEVICES = '/sys/bus/w1/devices'
+
+def parse_w1_slave(lines):
+    # Classic w1_slave text: "... crc=xx YES" then "... t=23125"
+    if len(lines) < 2 or not lines[0].strip().endswith('YES'):
+        return None
+    equals_pos = lines[1].find('t=')
+    if equals_pos == -1:
+        return None
+    return float(lines[1][equals_pos + 2:]) / 1000.0
+
+class W1Bus:
+    """DS18B20 probes behind the kernel w1-therm driver.
+
+    Reads each probe's `temperature` attribute where the kernel has it and
+    parses w1_slave otherwise. On bus masters with therm_bulk_read, one
+    trigger converts every probe at once, so a round costs one ~750 ms
+    conversion instead of one per probe.
+    """
+
+    def __init__(self, root=W1_DEVICES, conversion_timeout=1.0):
+        self.root = root
+        self.conversion_timeout = conversion_timeout
+
+    def discover(self):
+        return sorted(os.path.basename(path) for path in glob.glob(os.path.join(self.root, '28-*')))
+
+    def trigger_conversion(self):
+        # True once a bulk conversion finished; False where the bus cannot do one
+        triggers = []
+        for path in glob.glob(os.path.join(self.root, 'w1_bus_master*', 'therm_bulk_read')):
+            try:
+                with open(path, 'w') as f:
+                    f.write('trigger\n')
+                triggers.append(path)
+            except OSError:
+                pass
+        if not triggers:
+            return False
+        pending = triggers
+        deadline = time.monotonic() + self.conversion_timeout
+        while pending and time.monotonic() < deadline:
+            time.sleep(0.05)
+            # Reads -1 while any probe on that master is still converting
+            pending = [path for path in pending if self._read_text(path) == '-1']
+        return not pending
+
+    @staticmethod
+    def _read_text(path):
+        try:
+            with open(path) as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def read(self, device):
+        base = os.path.join(self.root, device)
+        try:
+            with open(os.path.join(base, 'temperature')) as f:
+                text = f.read().strip()
+            return int(text) / 1000.0 if text else None
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            return None
+        # Older kernels; raises if the probe itself is gone
+        with open(os.path.join(base, 'w1_slave')) as f:
+            return parse_w1_slave(f.readlines())
+
+class OneWireSampler:
+    """Reads every DS18B20 on a background thread and caches the result.
+
+    The monitor calls temperature(), which only looks at the cache. Each
+    round converts the probes (in bulk where the bus allows), reads them
+    and publishes the mean of the good readings with its timestamp.
+    Probes are rediscovered every rediscover_interval and after a failed
+    read, so hot-plugged or replaced probes are picked up.
+    """
+
+    VALID_RANGE = (-10, 60)
+
+    def __init__(self, bus, clock=time, interval=5, rediscover_interval=60):
+        self.bus = bus
+        self.clock = clock
+        self.interval = interval
+        self.rediscover_interval = rediscover_interval
+        self.devices = []
+        self.readings = {}
+        self.current = (None, None)
+        self.rounds = 0
+        self.bulk_rounds = 0
+        self.last_discovery = None
+        self.rediscover = True
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    @classmethod
+    def from_config(cls, bus, ow_config, clock=time):
+        return cls(bus, clock, interval=ow_config.INTERVAL, rediscover_interval=ow_config.REDISCOVER_INTERVAL)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="OneWire", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+
+    def discover(self):
+        found = self.bus.discover()
+        for device in sorted(set(found) - set(self.devices)):
+            logger.info("🌡️ DS18B20 %s found", device)
+        for device in sorted(set(self.devices) - set(found)):
+            logger.warning("⚠️ DS18B20 %s disappeared", device)
+            self.readings.pop(device, None)
+        self.devices = found
+        self.last_discovery = self.clock.time()
+        self.rediscover = False
+        return found
+
+    def poll(self):
+        # One round over every probe; returns the new mean or None
+        if self.rediscover or self.clock.time() - self.last_discovery >= self.rediscover_interval:
+            self.discover()
+        self.rounds += 1
+        if not self.devices:
+            return None
+        if self.bus.trigger_conversion():
+            self.bulk_rounds += 1
+
+        values = []
+        low, high = self.VALID_RANGE
+        for device in self.devices:
+            start = time.perf_counter()
+            try:
+                value = self.bus.read(device)
+            except OSError as e:
+                logger.debug("Error reading DS18B20 %s: %s", device, e)
+                value = None
+                self.rediscover = True
+            STAGE_SECONDS['ds18b20_read'].observe(time.perf_counter() - start)
+            if value is None or not low < value < high:
+                SENSOR_ERRORS['ds18b20'].inc()
+                continue
+            self.readings[device] = (value, self.clock.time())
+            values.append(value)
+        if not values:
+            return None
+        self.current = (sum(values) / len(values), self.clock.time())
+        return self.current[0]
+
+    def temperature(self, max_age):
+        value, stamp = self.current
+        if value is None or self.clock.time() - stamp > max_age:
+            return None
+        return value
+
+    @property
+    def age(self):
+        stamp = self.current[1]
+        return None if stamp is None else self.clock.time() - stamp
+
+    def snapshot(self):
+        now = self.clock.time()
+        return {device: {'value': round(value, 3), 'age': round(now - stamp, 1)}
+                for device, (value, stamp) in list(self.readings.items())}
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error("Error in 1-Wire sampler: %s", e)
+            self.wakeup.wait(timeout=self.interval)
+            self.wakeup.clear()
+
+# ============================================================================
+# HARDWARE BACKENDS
+# ============================================================================
+
+class PiHardware:
+    """The real peripherals on the Raspberry Pi.
+
+    SmartFishPondMonitor only talks to hardware through a backend like this:
+    `gpio` (RPi.GPIO-compatible), `clock` (time/sleep), and open_* factories
+    for the RS485 probe, the DS18B20, the LCD and the GSM modem.
+    """
+
+    name = "raspberry-pi"
+
+    def __init__(self):
+        if GPIO is None:
+            raise RuntimeError("RPi.GPIO is not available; use simulated_hw.SimulatedHardware off the Pi")
+        self.gpio = GPIO
+        self.clock = time
+
+    def open_modbus(self, port, slave_id, baudrate=9600):
+        instrument = minimalmodbus.Instrument(port, slave_id)
+        instrument.serial.baudrate = baudrate
+        instrument.serial.bytesize = 8
+        instrument.serial.parity = minimalmodbus.serial.PARITY_NONE
+        instrument.serial.stopbits = 1
+        instrument.serial.timeout = 1
+        return instrument
+
+    def open_onewire(self):
+        os.system('modprobe w1-gpio')
+        os.system('modprobe w1-therm')
+        if not os.path.isdir(W1_DEVICES):
+            return None
+        return W1Bus()
+
+    def open_lcd(self):
+        return CharLCD('PCF8574', 0x27)
+
+    def open_gsm(self, port, baudrate):
+        return serial.Serial(port=port, baudrate=baudrate, timeout=5)
+
+# ============================================================================
+# TASK SCHEDULER
+# ============================================================================
+
+class ScheduledTask:
+    """One scheduler entry. Periodic tasks have a period; one-shots have None."""
+
+    __slots__ = ('name', 'func', 'period', 'error_delay', 'blocking', 'due', 'entry',
+                 'cancelled', 'busy', 'runs', 'errors', 'last_run', 'last_duration')
+
+    def __init__(self, name, func, due, period=None, error_delay=None, blocking=False):
+        self.name = name
+        self.func = func
+        self.due = due
+        # Sequence number of the task's live heap entry; older ones are stale
+        self.entry = None
+        self.period = period
+        self.error_delay = error_delay
+        self.blocking = blocking
+        self.cancelled = False
+        self.busy = False
+        self.runs = 0
+        self.errors = 0
+        self.last_run = None
+        self.last_duration = 0.0
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    """Single-threaded timer heap that replaces per-job polling threads.
+
+    Each task declares a period or a deadline. The scheduler thread sleeps on
+    a Condition until the earliest deadline, so it wakes only when there is
+    work and stop() interrupts it immediately. A periodic task may return a
+    number of seconds to override its next delay. Tasks marked blocking
+    (network uploads) run on one helper thread so they cannot hold up the
+    sensor cycle; a blocking task is not re-queued while it is still running.
+    expedite() brings a periodic task's next run forward. With a
+    SimulatedClock, call run_pending() instead of start() to step through
+    simulated time synchronously.
+    """
+
+    def __init__(self, clock=time):
+        self.clock = clock
+        self.cond = threading.Condition()
+        self.heap = []
+        self.sequence = itertools.count()
+        self.tasks = {}
+        self.running = False
+        self.thread = None
+        self.io_queue = queue.Queue()
+        self.io_thread = None
+
+    def call_at(self, due, func, name=None):
+        return self._push(ScheduledTask(name or func.__name__, func, due))
+
+    def call_later(self, delay, func, name=None):
+        return self.call_at(self.clock.time() + delay, func, name)
+
+    def call_soon(self, func, name=None):
+        return self.call_at(self.clock.time(), func, name)
+
+    def every(self, period, func, name=None, delay=0, error_delay=None, blocking=False):
+        task = ScheduledTask(name or func.__name__, func, self.clock.time() + delay, period,
+                             error_delay, blocking)
+        self.tasks[task.name] = task
+        return self._push(task)
+
+    def _push(self, task):
+        with self.cond:
+            task.entry = next(self.sequence)
+            heapq.heappush(self.heap, (task.due, task.entry, task))
+            self.cond.notify()
+        return task
+
+    def expedite(self, name, delay=0):
+        # Run a periodic task within `delay` seconds unless it is due sooner
+        # or already running; its superseded heap entry is skipped later
+        with self.cond:
+            task = self.tasks.get(name)
+            due = self.clock.time() + delay
+            if task is None or task.cancelled or task.busy or task.due <= due:
+                return False
+            task.due = due
+            self._push(task)
+        return True
+
+    @staticmethod
+    def _stale(entry):
+        _, sequence, task = entry
+        return task.cancelled or sequence != task.entry
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="Scheduler", daemon=True)
+        self.io_thread = threading.Thread(target=self._run_io, name="SchedulerIO", daemon=True)
+        self.thread.start()
+        self.io_thread.start()
+
+    def stop(self, timeout=1):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.io_queue.put(None)
+        for t in (self.thread, self.io_thread):
+            if t and t.is_alive() and t is not threading.current_thread():
+                t.join(timeout=timeout)
+
+    def next_due(self):
+        with self.cond:
+            while self.heap and self._stale(self.heap[0]):
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
+
+    def run_pending(self):
+        ran = 0
+        while True:
+            with self.cond:
+                if not self.heap or self.heap[0][0] > self.clock.time():
+                    return ran
+                entry = heapq.heappop(self.heap)
+            if not self._stale(entry):
+                self._execute(entry[2])
+                ran += 1
+
+    def stats(self):
+        now = self.clock.time()
+        with self.cond:
+            return {
+                name: {
+                    'period': task.period,
+                    'runs': task.runs,
+                    'errors': task.errors,
+                    'busy': task.busy,
+                    'overdue': max(0.0, now - task.due),
+                    'last_run': task.last_run,
+                    'last_duration': task.last_duration
+                }
+                for name, task in self.tasks.items()
+            }
+
+    def _next_task(self):
+        with self.cond:
+            while self.running:
+                if self.heap:
+                    now = self.clock.time()
+                    due, _, task = self.heap[0]
+                    if due <= now:
+                        entry = heapq.heappop(self.heap)
+                        if self._stale(entry):
+                            continue
+                        return task
+                    self.cond.wait(timeout=due - now)
+                else:
+                    self.cond.wait()
+            return None
+
+    def _execute(self, task):
+        start = time.perf_counter()
+        task.last_run = self.clock.time()
+        override = None
+        try:
+            override = task.func()
+        except Exception as e:
+            task.errors += 1
+            logger.error("Error in %s task: %s", task.name, e)
+            override = task.error_delay
+        task.runs += 1
+        task.last_duration = time.perf_counter() - start
+        if task.period is not None and not task.cancelled:
+            numeric = isinstance(override, (int, float)) and not isinstance(override, bool)
+            delay = override if numeric else task.period
+            task.due = self.clock.time() + delay
+            task.busy = False
+            self._push(task)
+
+    def _run(self):
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            if task.blocking:
+                task.busy = True
+                self.io_queue.put(task)
+            else:
+                self._execute(task)
+
+    def _run_io(self):
+        while True:
+            task = self.io_queue.get()
+            if task is None or not self.running:
+                return
+            self._execute(task)
+
+
+class SchedulerWatchdog:
+    """Stall detector that runs beside the Scheduler, not on it.
+
+    A task that hangs holds up the scheduler thread, so a check scheduled
+    as one of its own tasks would never run. This thread wakes every
+    `interval` seconds, reads scheduler.stats() and flags every task more
+    than `timeout` seconds past its due time.
+    """
+
+    def __init__(self, scheduler, interval=30, timeout=120):
+        self.scheduler = scheduler
+        self.interval = interval
+        self.timeout = timeout
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="Watchdog", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def check(self):
+        stalled = []
+        for name, task in self.scheduler.stats().items():
+            if task['overdue'] > self.timeout:
+                stalled.append(name)
+                METRICS.counter("pond_watchdog_stalls_total", "Watchdog checks that found a task overdue",
+                                task=name).inc()
+                logger.error("⚠️ Task '%s' is %.0fs overdue; the scheduler appears to be stuck!", name, task['overdue'])
+        return stalled
+
+    def _run(self):
+        while not self.stopping.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error("Watchdog check failed: %s", e)
+
+# ============================================================================
+# ADAPTIVE SAMPLING
+# ============================================================================
+
+class AdaptiveInterval:
+    """Delay between runs of one periodic stream (acquisition or uplink).
+
+    Steady decisions stretch the delay by `backoff` up to `high`; anything
+    else snaps it to `low`. An hourly `budget` (token bucket holding one
+    hour of credit, 0 = unlimited) can only lengthen the delay, so bursts
+    during an incident spend what steady state saved.
+    """
+
+    def __init__(self, low, high, backoff, budget, clock=time, start=None):
+        self.low = low
+        self.high = high
+        self.backoff = backoff
+        self.budget = budget
+        self.clock = clock
+        self.current = min(high, max(low, start if start is not None else high))
+        self.tokens = float(budget)
+        self.refilled = clock.time()
+        self.runs = 0
+        self.throttled = 0
+
+    def next(self, steady, spend=True):
+        # spend=False: the run did nothing that counts against the budget
+        self.current = min(self.high, self.current * self.backoff) if steady else self.low
+        self.runs += 1
+        if not self.budget or not spend:
+            return self.current
+        now = self.clock.time()
+        rate = self.budget / 3600.0
+        self.tokens = min(float(self.budget), self.tokens + (now - self.refilled) * rate) - 1
+        self.refilled = now
+        if self.tokens >= 1:
+            return self.current
+        # Out of credit: wait until the next run is paid for
+        wait = (1 - self.tokens) / rate
+        if wait > self.current:
+            self.throttled += 1
+            return wait
+        return self.current
+
+    def stats(self):
+        return {'interval': round(self.current, 1), 'runs': self.runs,
+                'credit': None if not self.budget else round(self.tokens, 1), 'throttled': self.throttled}
+
+
+class SamplingController:
+    """Picks the acquisition and uplink delays from the latest status.
+
+    The pond is steady when the status is GOOD and every trend is STABLE;
+    then both streams slow down towards their maximum. A WARNING, CRITICAL
+    or any rising/falling trend is an alert and puts both on their minimum.
+    A reading the filters rejected while the status is still GOOD may be
+    the start of a real step, which the Hampel window only passes after a
+    few more samples: acquisition speeds up to confirm it ("confirm"),
+    the uplink does not.
+    """
+
+    def __init__(self, sample, uplink):
+        self.sample = sample
+        self.uplink = uplink
+        self.mode = "steady"
+        self.alerts = 0
+
+    @classmethod
+    def from_config(cls, sampling, sample_start, uplink_start, clock=time):
+        if not sampling.ENABLED:
+            return None
+        return cls(AdaptiveInterval(sampling.MIN_INTERVAL, sampling.MAX_INTERVAL, sampling.BACKOFF,
+                                    sampling.SAMPLE_BUDGET, clock, sample_start),
+                   AdaptiveInterval(sampling.UPLINK_MIN_INTERVAL, sampling.UPLINK_MAX_INTERVAL, sampling.BACKOFF,
+                                    sampling.UPLINK_BUDGET, clock, uplink_start))
+
+    @staticmethod
+    def is_steady(status):
+        return status['overall'] == 'GOOD' and all(trend == "STABLE" for trend in status['trends'].values())
+
+    def observe(self, status, suspect=False):
+        # Returns True when an alert has just started
+        if not self.is_steady(status):
+            mode = "alert"
+        else:
+            mode = "confirm" if suspect else "steady"
+        entered = mode == "alert" and self.mode != "alert"
+        if entered:
+            self.alerts += 1
+        self.mode = mode
+        return entered
+
+    def next_sample_delay(self):
+        return self.sample.next(self.mode == "steady")
+
+    def next_uplink_delay(self, sent=True):
+        return self.uplink.next(self.mode != "alert", spend=sent)
+
+    def stats(self):
+        return {'mode': self.mode, 'alerts': self.alerts,
+                'sample': self.sample.stats(), 'uplink': self.uplink.stats()}
+
+# ============================================================================
+# STATE CHECKPOINTS
+# ============================================================================
+
+# Little-endian: magic, version, saved_at, cycle; then critical timer, pump,
+# last status and the history/filter windows; CRC32 of everything before it
+CHECKPOINT_MAGIC = b"PONDCKPT"
+CHECKPOINT_VERSION = 1
+CHECKPOINT_HEADER = struct.Struct("<8sHdI")
+CHECKPOINT_CRITICAL = struct.Struct("<dBB")
+CHECKPOINT_PUMP = struct.Struct("<Bd")
+CHECKPOINT_CRC = struct.Struct("<I")
+
+def _pack_text(text):
+    data = text.encode()
+    return struct.pack("<B", len(data)) + data
+
+def _pack_windows(windows):
+    parts = [struct.pack("<B", len(windows))]
+    for name, values in windows.items():
+        parts.append(_pack_text(name))
+        parts.append(struct.pack("<H", len(values)))
+        parts.append(array.array('d', values).tobytes())
+    return b"".join(parts)
+
+def encode_checkpoint(state):
+    critical = state['critical']
+    pump = state['pump']
+    start_time = critical['start_time']
+    body = b"".join((
+        CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, state['saved_at'], state['cycle']),
+        CHECKPOINT_CRITICAL.pack(math.nan if start_time is None else start_time,
+                                 critical['sustained'], critical['alert_sent']),
+        CHECKPOINT_PUMP.pack(pump['is_running'], pump['start_time']),
+        _pack_text(pump['mode']),
+        _pack_text(state['status']),
+        _pack_windows(state['history']),
+        _pack_windows(state['filters'])
+    ))
+    return body + CHECKPOINT_CRC.pack(zlib.crc32(body))
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.data, self.offset)
+        self.offset += layout.size
+        return values
+
+    def text(self):
+        (size,) = struct.unpack_from("<B", self.data, self.offset)
+        start = self.offset + 1
+        self.offset = start + size
+        return self.data[start:self.offset].decode()
+
+    def windows(self):
+        (count,) = struct.unpack_from("<B", self.data, self.offset)
+        self.offset += 1
+        windows = {}
+        for _ in range(count):
+            name = self.text()
+            (size,) = struct.unpack_from("<H", self.data, self.offset)
+            start = self.offset + 2
+            self.offset = start + 8 * size
+            values = array.array('d')
+            values.frombytes(self.data[start:self.offset])
+            windows[name] = values
+        return windows
+
+def decode_checkpoint(data):
+    """Inverse of encode_checkpoint; raises ValueError on a damaged file."""
+    if len(data) < CHECKPOINT_HEADER.size + CHECKPOINT_CRC.size:
+        raise ValueError("checkpoint truncated")
+    body, (crc,) = data[:-CHECKPOINT_CRC.size], CHECKPOINT_CRC.unpack(data[-CHECKPOINT_CRC.size:])
+    if zlib.crc32(body) != crc:
+        raise ValueError("checkpoint checksum mismatch")
+    reader = _Reader(body)
+    try:
+        magic, version, saved_at, cycle = reader.unpack(CHECKPOINT_HEADER)
+        if magic != CHECKPOINT_MAGIC or version != CHECKPOINT_VERSION:
+            raise ValueError(f"not a version {CHECKPOINT_VERSION} checkpoint")
+        start_time, sustained, alert_sent = reader.unpack(CHECKPOINT_CRITICAL)
+        is_running, pump_start = reader.unpack(CHECKPOINT_PUMP)
+        return {
+            'saved_at': saved_at,
+            'cycle': cycle,
+            'critical': {'start_time': None if math.isnan(start_time) else start_time,
+                         'sustained': bool(sustained), 'alert_sent': bool(alert_sent)},
+            'pump': {'is_running': bool(is_running), 'start_time': pump_start, 'mode': reader.text()},
+            'status': reader.text(),
+            'history': reader.windows(),
+            'filters': reader.windows()
+        }
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"checkpoint malformed: {e}")
+
+def write_checkpoint(path, data):
+    # Write-then-rename: a crash leaves either the old file or the new one
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def read_checkpoint(path):
+    try:
+        with open(path, "rb") as f:
+            return decode_checkpoint(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("⚠️ Ignoring checkpoint %s: %s", path, e)
+        return None
+
 # ============================================================================
 # MAIN MONITORING CLASS
 # ============================================================================
 
 class SmartFishPondMonitor:
-    def __init__(self):
+    def __init__(self, start_threads=True, hardware=None, session=None):
+        self.hw = hardware or PiHardware()
+        self.gpio = self.hw.gpio
+        self.clock = self.hw.clock
+        configure_logging(config.LOGGING)
+
         self.state = {
             'running': True,
             'pump': {
@@ -135,13 +3857,9 @@ class SmartFishPondMonitor:
             'indicators': {
                 'last_status': 'GOOD',
                 'lcd_screen': 0,
-                'last_lcd_content': "",
                 'lcd_error_count': 0,
                 'lcd_available': True
             },
-            'sms': {
-                'last_sent_time': 0
-            },
             'critical': {
                 'start_time': None,
                 'sustained': False,
@@ -150,180 +3868,329 @@ class SmartFishPondMonitor:
             'thingspeak': {
                 'last_sent_time': 0,
                 'last_reading': {},
-                'connection_errors': 0,
-                'last_network_check': 0,
-                'network_error_count': 0
+                'last_prune': 0
             },
             'sensor_errors': {
                 'rs485_error_count': 0,
                 'last_successful_read': None
+            },
+            'rs485': {
+                'block_read': config.SENSORS.RS485_BLOCK_READ,
+                'last_bus_time': None,
+                'last_mode': None,
+                'fallback_registers': 0
             }
         }
 
         self.state_lock = threading.Lock()
-        self.gsm_lock = threading.Lock()
-
-        self.thread_watchdog = {
-            'monitor': time.time(),
-            'display': time.time(),
-            'pump': time.time(),
-            'thingspeak': time.time()
-        }
 
+        self.scheduler = Scheduler(self.clock)
+        self.pump_off_task = None
+        self.awaiting_first_sample = True
+
+        self.rules = QUALITY_RULES
+        self.filters = FilterStage.from_config(config.FILTERS, self.rules.sensor_ranges)
+        self.sampling = SamplingController.from_config(config.SAMPLING, config.TEMP_READ_INTERVAL,
+                                                       config.THINGSPEAK.SEND_INTERVAL, self.clock)
+
+        self.store = TelemetryStore(config.THINGSPEAK.BACKUP_DB)
+        self.store.import_csv_backup(config.THINGSPEAK.BACKUP_FILE)
+        if np is not None:
+            rescored = self.store.rescore(self.rules)
+            if rescored:
+                logger.info("🔁 Re-scored %s backed-up readings with the current rules", rescored)
+        self.bulk_uploader = ThingSpeakBulkUploader.from_config(config.THINGSPEAK)
+        # Turning points need the bulk endpoint; single updates carry no timestamp
+        self.reporter = ExceptionReporter.from_config(config.REPORTING, coalesce=self.bulk_uploader is not None)
+        self.network = NetworkMonitor.from_config(config.NETWORK)
+        self.uplink = UplinkWorker.from_config(config.THINGSPEAK, self.store,
+                                               on_network_error=self.network.request_probe,
+                                               is_online=lambda: self.network.online,
+                                               session=session)
+        if self.bulk_uploader:
+            self.bulk_uploader.session = self.uplink.session
+
+        history_size = config.HISTORY_SIZE
         self.history = {
-            'temp': deque(maxlen=config.get('HISTORY_SIZE', 5)),
-            'ph': deque(maxlen=config.get('HISTORY_SIZE', 5)),
-            'ec': deque(maxlen=config.get('HISTORY_SIZE', 5)),
-            'nitrogen': deque(maxlen=config.get('HISTORY_SIZE', 5)),
-            'phosphorus': deque(maxlen=config.get('HISTORY_SIZE', 5)),
-            'turbidity': deque(maxlen=config.get('HISTORY_SIZE', 5))
+            'temp': RollingWindow(history_size),
+            'ph': RollingWindow(history_size),
+            'ec': RollingWindow(history_size),
+            'nitrogen': RollingWindow(history_size),
+            'phosphorus': RollingWindow(history_size),
+            'turbidity': RollingWindow(history_size)
         }
 
         try:
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setup(config.get('GPIO', {}).get('TURBIDITY_PIN', 17), GPIO.IN, pull_up_down=GPIO.PUD_UP)
-            GPIO.setup(config.get('GPIO', {}).get('BLUE_LED_PIN', 27), GPIO.OUT)
-            GPIO.setup(config.get('GPIO', {}).get('YELLOW_LED_PIN', 22), GPIO.OUT)
-            GPIO.setup(config.get('GPIO', {}).get('RED_LED_PIN', 5), GPIO.OUT)
-            GPIO.setup(config.get('GPIO', {}).get('BUZZER_PIN', 18), GPIO.OUT)
-            GPIO.setup(config.get('GPIO', {}).get('PUMP_PIN', 16), GPIO.OUT)
-
-            self.pwm_buzzer = GPIO.PWM(config.get('GPIO', {}).get('BUZZER_PIN', 18), 1000)
+            self.gpio.setmode(self.gpio.BCM)
+            self.gpio.setup(config.GPIO.TURBIDITY_PIN, self.gpio.IN, pull_up_down=self.gpio.PUD_UP)
+            self.gpio.setup(config.GPIO.BLUE_LED_PIN, self.gpio.OUT)
+            self.gpio.setup(config.GPIO.YELLOW_LED_PIN, self.gpio.OUT)
+            self.gpio.setup(config.GPIO.RED_LED_PIN, self.gpio.OUT)
+            self.gpio.setup(config.GPIO.BUZZER_PIN, self.gpio.OUT)
+            self.gpio.setup(config.GPIO.PUMP_PIN, self.gpio.OUT)
+
+            self.pwm_buzzer = self.gpio.PWM(config.GPIO.BUZZER_PIN, 1000)
             self.pwm_buzzer.start(0)
             self.set_leds(0, 0, 0)
             logger.info("✅ GPIO initialized successfully")
         except Exception as e:
-            logger.error(f"GPIO initialization failed: {e}")
+            logger.error("GPIO initialization failed: %s", e)
             raise
 
         self.lcd = self._init_lcd()
+        self.lcd_writer = LcdWriter(self.lcd) if self.lcd else None
         self.rs485_instrument = self._init_rs485()
-        self.device_file = self._init_ds18b20()
+        self.ds18b20 = self._init_ds18b20()
         self.gsm = self._init_gsm()
+        self.sms = SmsDispatcher.from_config(config, self.gsm, SmsOutbox(config.THINGSPEAK.BACKUP_DB), self.clock)
         self.test_thingspeak_connection()
 
-        self.monitor_thread = threading.Thread(target=self.monitor_loop, name="Monitor", daemon=True)
-        self.display_thread = threading.Thread(target=self.display_loop, name="Display", daemon=True)
-        self.pump_thread = threading.Thread(target=self.pump_control_loop, name="Pump", daemon=True)
-        self.thingspeak_thread = threading.Thread(target=self.thingspeak_loop, name="ThingSpeak", daemon=True)
-        self.watchdog_thread = threading.Thread(target=self.watchdog_loop, name="Watchdog", daemon=True)
-
-        for t in [self.monitor_thread, self.display_thread, self.pump_thread,
-                 self.thingspeak_thread, self.watchdog_thread]:
-            t.start()
+        self.cycle_count = 0
+        self.last_snapshot = None
+        self.dashboard = SnapshotPublisher()
+        self.checkpoint_path = config.CHECKPOINT.FILE if config.CHECKPOINT.ENABLED else None
+        self.last_checkpoint = None
+        self.restore_checkpoint()
+
+        self.scheduler.every(config.TEMP_READ_INTERVAL, self.monitor_tick,
+                             name="monitor", error_delay=5)
+        self.scheduler.every(config.LCD_REFRESH_INTERVAL, self.display_tick,
+                             name="display", error_delay=5)
+        self.scheduler.every(config.THINGSPEAK.SEND_INTERVAL, self.thingspeak_tick,
+                             name="thingspeak", delay=5, error_delay=10, blocking=True)
+        self.watchdog = SchedulerWatchdog(self.scheduler)
+        self.config_watcher = ConfigWatcher(CONFIG_FILE, self.apply_config)
+        self.scheduler.every(CONFIG_RELOAD_INTERVAL, self.config_watcher.poll, name="config")
+        if self.checkpoint_path:
+            self.scheduler.every(config.CHECKPOINT.INTERVAL, self.save_checkpoint, name="checkpoint",
+                                 delay=config.CHECKPOINT.INTERVAL, error_delay=30)
+        self.register_metrics()
+
+        if start_threads:
+            self.network.start()
+            self.uplink.start()
+            self.sms.start()
+            if self.ds18b20:
+                self.ds18b20.start()
+            self.scheduler.start()
+            self.watchdog.start()
+
+    def register_metrics(self, registry=METRICS):
+        # Scrape-time views of state the components already keep
+        registry.counter("pond_cycles_total", "Completed monitoring cycles", func=lambda: self.cycle_count)
+        registry.gauge("pond_last_cycle_age_seconds", "Seconds since the last completed cycle",
+                       func=lambda: self.clock.time() - self.last_snapshot.sample.timestamp if self.last_snapshot else None)
+        registry.gauge("pond_quality_score", "Water quality score of the last cycle",
+                       func=lambda: self.last_snapshot.status['score'] if self.last_snapshot else None)
+        registry.gauge("pond_quality_status", "Overall status of the last cycle (0 GOOD, 1 WARNING, 2 CRITICAL)",
+                       func=lambda: QUALITY_STATUS_CODES[self.last_snapshot.status['overall']] if self.last_snapshot else None)
+        for param, window in (('temperature', 'temp'), ('ph', 'ph'), ('ec', 'ec'), ('nitrogen', 'nitrogen'),
+                              ('phosphorus', 'phosphorus'), ('turbidity', 'turbidity')):
+            registry.gauge("pond_reading", "Averaged reading over the history window",
+                           func=lambda window=window: self.get_average(self.history[window]), param=param)
+        registry.gauge("pond_pump_running", "1 while the pump is on",
+                       func=lambda: int(self.state['pump']['is_running']))
+        registry.gauge("pond_network_online", "1 while the uplink probe succeeds",
+                       func=lambda: int(self.network.online))
+
+        for field, help_text in (('sent', "ThingSpeak updates accepted"), ('failed', "ThingSpeak updates given up on"),
+                                 ('retries', "ThingSpeak update retries"), ('overflow', "Updates diverted to the backlog by a full queue"),
+                                 ('rejected', "Backlog rows dropped after the channel refused them MAX_REJECTIONS times")):
+            registry.counter(f"pond_uplink_{field}_total", help_text,
+                             func=lambda field=field: self.uplink.metrics[field])
+        registry.gauge("pond_uplink_queue_depth", "Items waiting in the uplink queue",
+                       func=lambda: self.uplink.stats()['queue_depth'])
+        registry.gauge("pond_backlog_rows", "Readings in the local store awaiting upload",
+                       func=self.store.pending_count)
+
+        for field, help_text in (('sent', "SMS messages sent"), ('failed', "SMS messages given up on"),
+                                 ('retries', "SMS send retries"), ('deduplicated', "SMS suppressed as duplicates or within the cooldown")):
+            registry.counter(f"pond_sms_{field}_total", help_text,
+                             func=lambda field=field: self.sms.metrics[field])
+        registry.gauge("pond_sms_pending", "Messages waiting in the SMS outbox", func=self.sms.outbox.pending_count)
+        registry.gauge("pond_gsm_ready", "1 once the GSM modem has been initialised",
+                       func=lambda: int(bool(self.sms.modem and self.sms.modem.ready)))
+        for channel in FILTER_CHANNELS:
+            registry.gauge("pond_sensor_health", "Share of recent readings that arrived and passed the filters (0-100)",
+                           func=lambda channel=channel: self.filters.health.scores[channel] if self.filters else None,
+                           sensor=channel)
+            registry.counter("pond_sensor_outliers_total", "Readings replaced by the Hampel filter",
+                             func=lambda channel=channel: self.filters.filters[channel].outliers if self.filters else 0,
+                             sensor=channel)
+        registry.gauge("pond_ds18b20_probes", "DS18B20 probes found on the 1-Wire bus",
+                       func=lambda: len(self.ds18b20.devices) if self.ds18b20 else 0)
+        registry.gauge("pond_ds18b20_age_seconds", "Age of the cached DS18B20 temperature",
+                       func=lambda: self.ds18b20.age if self.ds18b20 else None)
+        for stream in ('sample', 'uplink'):
+            registry.gauge("pond_sampling_interval_seconds", "Current adaptive delay between runs",
+                           func=lambda stream=stream: getattr(self.sampling, stream).current if self.sampling else None,
+                           stream=stream)
+            registry.counter("pond_sampling_throttled_total", "Runs delayed beyond the interval by the hourly budget",
+                             func=lambda stream=stream: getattr(self.sampling, stream).throttled if self.sampling else 0,
+                             stream=stream)
+        for field, help_text in (('reports', "Uploads the report-by-exception filter let through"),
+                                 ('suppressed', "Uploads skipped as within the deadbands"),
+                                 ('coalesced', "Turning points sent along with a later upload")):
+            registry.counter(f"pond_report_{field}_total", help_text,
+                             func=lambda field=field: getattr(self.reporter, field) if self.reporter else 0)
+        registry.gauge("pond_sampling_steady", "1 while the adaptive sampler is in the steady state",
+                       func=lambda: int(self.sampling.mode == "steady") if self.sampling else None)
+        registry.gauge("pond_checkpoint_age_seconds", "Seconds since the monitor state was last checkpointed",
+                       func=lambda: self.clock.time() - self.last_checkpoint if self.last_checkpoint else None)
+        registry.counter("pond_lcd_cells_written_total", "Character cells sent to the LCD",
+                         func=lambda: self.lcd_writer.cells_written if self.lcd_writer else 0)
+
+        for name in self.scheduler.tasks:
+            registry.counter("pond_task_runs_total", "Scheduled task runs",
+                             func=lambda name=name: self.scheduler.tasks[name].runs, task=name)
+            registry.counter("pond_task_errors_total", "Scheduled task runs that raised",
+                             func=lambda name=name: self.scheduler.tasks[name].errors, task=name)
+            registry.gauge("pond_task_overdue_seconds", "How late a scheduled task is",
+                           func=lambda name=name: self.scheduler.stats()[name]['overdue'], task=name)
+
+    def apply_config(self, old, new, changed):
+        # Thresholds are read from `config` at use; intervals live on objects
+        tasks = self.scheduler.tasks
+        tasks['monitor'].period = new.TEMP_READ_INTERVAL
+        tasks['display'].period = new.LCD_REFRESH_INTERVAL
+        tasks['thingspeak'].period = new.THINGSPEAK.SEND_INTERVAL
+        if 'checkpoint' in tasks:
+            tasks['checkpoint'].period = new.CHECKPOINT.INTERVAL
+
+        ts = new.THINGSPEAK
+        self.uplink.url = ts.URL
+        self.uplink.api_key = ts.API_KEY
+        self.uplink.min_interval = ts.MIN_SEND_INTERVAL
+        self.uplink.max_retries = ts.MAX_RETRIES
+        self.uplink.max_rejections = ts.MAX_REJECTIONS
+        self.uplink.retry_delay = ts.RETRY_DELAY
+        self.uplink.max_retry_delay = ts.MAX_RETRY_DELAY
+        self.bulk_uploader = ThingSpeakBulkUploader.from_config(ts, session=self.uplink.session)
+
+        net = new.NETWORK
+        self.network.host = net.PROBE_HOST
+        self.network.port = net.PROBE_PORT
+        self.network.timeout = net.PROBE_TIMEOUT
+        self.network.interval = net.PROBE_INTERVAL
+        self.network.offline_after = net.OFFLINE_AFTER
+        self.network.online_after = net.ONLINE_AFTER
+        self.network.interface = net.INTERFACE
+        self.network.recovery_after = net.RECOVERY_AFTER
+        self.network.recovery_cooldown = net.RECOVERY_COOLDOWN
+
+        self.sms.cooldown = new.SMS_COOLDOWN
+        self.sms.max_attempts = new.SMS.MAX_ATTEMPTS
+        self.sms.retry_delay = new.SMS.RETRY_DELAY
+        if self.sms.modem:
+            self.sms.modem.command_timeout = new.SMS.COMMAND_TIMEOUT
+            self.sms.modem.prompt_timeout = new.SMS.PROMPT_TIMEOUT
+            self.sms.modem.send_timeout = new.SMS.SEND_TIMEOUT
+
+        if any(key.startswith("LOGGING.") for key in changed):
+            configure_logging(new.LOGGING)
+        if self.ds18b20:
+            self.ds18b20.interval = new.ONEWIRE.INTERVAL
+            self.ds18b20.rediscover_interval = new.ONEWIRE.REDISCOVER_INTERVAL
+        if any(key.startswith("FILTERS.") for key in changed):
+            # New filter settings start from empty windows
+            self.filters = FilterStage.from_config(new.FILTERS, self.rules.sensor_ranges)
+        if any(key.startswith("REPORTING.") for key in changed):
+            self.reporter = ExceptionReporter.from_config(new.REPORTING)
+        if self.reporter:
+            self.reporter.coalesce = self.bulk_uploader is not None
+        if any(key.startswith("SAMPLING.") for key in changed):
+            self.sampling = SamplingController.from_config(new.SAMPLING, new.TEMP_READ_INTERVAL,
+                                                           new.THINGSPEAK.SEND_INTERVAL, self.clock)
+
+        restart = [key for key in changed if key.startswith(CONFIG_RESTART_KEYS)]
+        if restart:
+            logger.warning("⚠️ Restart needed to apply: %s", ', '.join(restart))
 
     def test_thingspeak_connection(self):
         test_payload = {
-            "api_key": config.get('THINGSPEAK', {}).get('API_KEY'),
+            "api_key": config.THINGSPEAK.API_KEY,
             "field1": 25.0
         }
         try:
-            response = requests.get(
-                config.get('THINGSPEAK', {}).get('URL'),
+            response = self.uplink.session.get(
+                config.THINGSPEAK.URL,
                 params=test_payload,
                 timeout=10
             )
             if response.status_code == 200:
                 result = response.text.strip()
                 if result.isdigit() and int(result) > 0:
-                    logger.info(f"✅ ThingSpeak connection test PASSED")
+                    logger.info("✅ ThingSpeak connection test PASSED")
                     return True
         except Exception as e:
-            logger.error(f"❌ Connection test failed: {e}")
+            logger.error("❌ Connection test failed: %s", e)
         return False
 
     def _init_lcd(self):
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                lcd = CharLCD('PCF8574', 0x27)
+                lcd = self.hw.open_lcd()
                 lcd.clear()
                 lcd.write_string("Initializing...")
                 logger.info("✅ LCD initialized")
                 return lcd
             except Exception as e:
-                logger.error(f"LCD initialization failed: {e}")
+                logger.error("LCD initialization failed: %s", e)
                 if attempt < max_retries - 1:
-                    time.sleep(2)
+                    self.clock.sleep(2)
         self.state['indicators']['lcd_available'] = False
         logger.warning("LCD unavailable")
         return None
 
     def _init_rs485(self):
         try:
-            instrument = minimalmodbus.Instrument(
-                config.get('SENSORS', {}).get('RS485_PORT', '/dev/ttyUSB0'),
-                config.get('SENSORS', {}).get('RS485_SLAVE_ID', 1)
+            instrument = self.hw.open_modbus(
+                config.SENSORS.RS485_PORT,
+                config.SENSORS.RS485_SLAVE_ID
             )
-            instrument.serial.baudrate = 9600
-            instrument.serial.bytesize = 8
-            instrument.serial.parity = minimalmodbus.serial.PARITY_NONE
-            instrument.serial.stopbits = 1
-            instrument.serial.timeout = 1
             logger.info("✅ RS485 sensor initialized")
             return instrument
         except Exception as e:
-            logger.error(f"❌ RS485 initialization failed: {e}")
+            logger.error("❌ RS485 initialization failed: %s", e)
             return None
 
     def _init_ds18b20(self):
         try:
-            os.system('modprobe w1-gpio')
-            os.system('modprobe w1-therm')
-            base_dir = '/sys/bus/w1/devices/'
-            device_folders = glob.glob(base_dir + '28-*')
-            if not device_folders:
-                logger.error("No DS18B20 temperature sensor found")
+            bus = self.hw.open_onewire()
+            if not bus:
+                logger.error("No 1-Wire bus found")
                 return None
-            device_folder = device_folders[0]
-            device_file = device_folder + '/w1_slave'
-            logger.info("✅ DS18B20 temperature sensor initialized")
-            return device_file
+            sampler = OneWireSampler.from_config(bus, config.ONEWIRE, self.clock)
+            # One synchronous round so the first cycle already has a reading
+            sampler.poll()
+            if sampler.devices:
+                logger.info("✅ DS18B20 temperature sensor initialized (%d probe(s))", len(sampler.devices))
+            else:
+                logger.error("No DS18B20 temperature sensor found; will keep looking")
+            return sampler
         except Exception as e:
-            logger.error(f"❌ DS18B20 initialization failed: {e}")
+            logger.error("❌ DS18B20 initialization failed: %s", e)
             return None
 
     def _init_gsm(self):
+        # Only opens the port; the SMS worker runs the AT init sequence
         try:
-            ser = serial.Serial(port=config.get('SENSORS', {}).get('GSM_PORT', "/dev/serial0"),
-                              baudrate=config.get('SENSORS', {}).get('GSM_BAUDRATE', 9600), timeout=5)
-            self.send_at_command(ser, "AT", 1)
-            self.send_at_command(ser, "ATE0", 1)
-            self.send_at_command(ser, "AT+CMGF=1", 1)
-            logger.info("✅ GSM module initialized")
-            return ser
+            return self.hw.open_gsm(config.SENSORS.GSM_PORT,
+                                    config.SENSORS.GSM_BAUDRATE)
         except Exception as e:
-            logger.error(f"❌ GSM initialization failed: {e}")
+            logger.error("❌ GSM initialization failed: %s", e)
             return None
 
-    def send_at_command(self, ser, command, delay=1):
-        try:
-            ser.write((command + "\r\n").encode())
-            time.sleep(delay)
-            return ser.read_all().decode(errors="ignore").strip()
-        except Exception as e:
-            logger.error(f"Error sending AT command: {e}")
-            return ""
-
     def read_ds18b20_temp(self):
-        if not self.device_file:
+        # Cached by the sampler thread; never touches sysfs
+        if not self.ds18b20:
             return None
-        try:
-            with open(self.device_file, 'r') as f:
-                lines = f.readlines()
-            if lines and lines[0].strip().endswith('YES') and 't=' in lines[1]:
-                equals_pos = lines[1].find('t=')
-                if equals_pos != -1:
-                    temp_c = float(lines[1][equals_pos + 2:]) / 1000.0
-                    if -10 < temp_c < 60:
-                        return temp_c
-        except Exception as e:
-            logger.debug(f"Error reading DS18B20: {e}")
-        return None
+        return self.ds18b20.temperature(config.ONEWIRE.MAX_AGE)
 
     def read_turbidity(self):
         try:
-            return GPIO.input(config.get('GPIO', {}).get('TURBIDITY_PIN', 17)) == 0
+            return self.gpio.input(config.GPIO.TURBIDITY_PIN) == 0
         except:
             return None
 
@@ -333,70 +4200,50 @@ class SmartFishPondMonitor:
             return {}
 
         try:
-            data = {}
-            registers = {
-                'temperature': 19, 'ph': 13, 'ec': 7,
-                'nitrogen': 4, 'phosphorus': 5, 'potassium': 6
-            }
-
-            temp_value = self._read_register_with_retry(registers['temperature'])
-            data['temperature'] = temp_value
-
-            for param, reg in registers.items():
-                if param == 'temperature':
-                    continue
-                value = self._read_register_with_retry(reg)
-                if param == 'ph':
-                    data['ph_raw'] = value
-                    if value is not None and value > 0.5:
-                        data[param] = self.calculate_ph(value, data.get('temperature', 25))
-                    else:
-                        data[param] = None
-                else:
-                    data[param] = value
+            rs485 = self.state['rs485']
+            bus_start = time.perf_counter()
+            values, fallback, block_read = read_probe(self.rs485_instrument, rs485['block_read'], self.clock.sleep)
+            bus_time = time.perf_counter() - bus_start
+            STAGE_SECONDS['modbus_read'].observe(bus_time)
+            rs485['last_bus_time'] = bus_time
+            rs485['last_mode'] = "block" if rs485['block_read'] else "single"
+            if rs485['block_read']:
+                rs485['fallback_registers'] = fallback
+            rs485['block_read'] = block_read
+            data = probe_data(values)
 
             self.state['sensor_errors']['rs485_error_count'] = 0
-            self.state['sensor_errors']['last_successful_read'] = time.time()
+            self.state['sensor_errors']['last_successful_read'] = self.clock.time()
             return data
 
         except Exception as e:
             self.state['sensor_errors']['rs485_error_count'] += 1
-            logger.error(f"RS485 sensor read error: {e}")
+            SENSOR_ERRORS['rs485'].inc()
+            logger.error("RS485 sensor read error: %s", e)
             if self.state['sensor_errors']['rs485_error_count'] >= 5:
                 logger.warning("Multiple RS485 errors, attempting to reinitialize")
                 self.rs485_instrument = self._init_rs485()
                 self.state['sensor_errors']['rs485_error_count'] = 0
             return {}
 
-    def _read_register_with_retry(self, register, retries=2):
-        for attempt in range(retries):
-            try:
-                value = self.rs485_instrument.read_register(register, 1, functioncode=3)
-                return value
-            except Exception as e:
-                logger.debug(f"RS485 read attempt {attempt + 1} failed: {e}")
-                if attempt < retries - 1:
-                    time.sleep(0.1)
-        return None
-
-    def calculate_ph(self, raw_value, temperature):
-        if raw_value is None or raw_value <= 0.5:
-            return None
-        ph = raw_value / 3.13
-        temp_compensation = (temperature - 25) * 0.01
-        return ph - temp_compensation
-
     def combine_temperatures(self, rs485_temp, ds18b20_temp):
-        if rs485_temp is not None and ds18b20_temp is not None:
-            return 0.6 * rs485_temp + 0.4 * ds18b20_temp
-        elif rs485_temp is not None:
-            return rs485_temp
-        elif ds18b20_temp is not None:
-            return ds18b20_temp
-        return None
-
-    def update_historical_data(self, data, ds18b20_temp):
-        combined_temp = self.combine_temperatures(data.get('temperature'), ds18b20_temp)
+        return combine_temperatures(rs485_temp, ds18b20_temp)
+
+    def filter_sample(self, sample):
+        # Outlier rejection and temperature fusion, between acquisition and history
+        if not self.filters:
+            return sample
+        rs485, ds18b20_temp, temperature = self.filters.process(sample.timestamp, sample.rs485, sample.ds18b20_temp)
+        return replace(sample, rs485=MappingProxyType(rs485), ds18b20_temp=ds18b20_temp, temperature=temperature)
+
+    def sample_temperature(self, sample):
+        if sample.temperature is not None:
+            return sample.temperature
+        return self.combine_temperatures(sample.rs485.get('temperature'), sample.ds18b20_temp)
+
+    def update_historical_data(self, sample):
+        data = sample.rs485
+        combined_temp = self.sample_temperature(sample)
         if combined_temp is not None:
             self.history['temp'].append(combined_temp)
         if data.get('ph') is not None:
@@ -408,150 +4255,45 @@ class SmartFishPondMonitor:
         if data.get('phosphorus') is not None:
             self.history['phosphorus'].append(data['phosphorus'])
 
-        turbidity = self.read_turbidity()
-        if turbidity is not None:
-            self.history['turbidity'].append(1 if turbidity else 0)
+        if sample.turbidity is not None:
+            self.history['turbidity'].append(1 if sample.turbidity else 0)
 
     def get_average(self, history):
-        if not history:
-            return None
-        return sum(history) / len(history)
-
-    def get_trend(self, history):
-        if len(history) < 3:
-            return "STABLE"
-        mid = len(history) // 2
-        first_half_avg = sum(list(history)[:mid]) / mid
-        second_half_avg = sum(list(history)[mid:]) / (len(history) - mid)
-        diff = second_half_avg - first_half_avg
-        threshold = max(0.1 * abs(first_half_avg), 0.2)
-        if diff > threshold:
-            return "INCREASING"
-        elif diff < -threshold:
-            return "DECREASING"
-        return "STABLE"
+        return history.mean
 
-    def get_water_quality_status(self, data, ds18b20_temp):
-        self.update_historical_data(data, ds18b20_temp)
+    def get_turbidity_ratio(self):
+        return self.history['turbidity'].mean or 0
 
-        status = {
-            'overall': 'GOOD', 'score': 0, 'alerts': [],
-            'recommendations': set(), 'trends': {}
+    def get_trend(self, history):
+        return window_trend(history)
+
+    def get_averages(self):
+        return {
+            'temperature': self.get_average(self.history['temp']),
+            'ph': self.get_average(self.history['ph']),
+            'ec': self.get_average(self.history['ec']),
+            'nitrogen': self.get_average(self.history['nitrogen']),
+            'phosphorus': self.get_average(self.history['phosphorus']),
+            'turbidity': self.get_turbidity_ratio()
         }
 
-        avg_temp = self.get_average(self.history['temp'])
-        avg_ph = self.get_average(self.history['ph'])
-        avg_ec = self.get_average(self.history['ec'])
-        avg_nitrogen = self.get_average(self.history['nitrogen'])
-        avg_phosphorus = self.get_average(self.history['phosphorus'])
-        turbidity_ratio = sum(self.history['turbidity']) / len(self.history['turbidity']) if self.history['turbidity'] else 0
-
+    def get_water_quality_status(self):
+        start = time.perf_counter()
+        status = self.rules.evaluate(self.get_averages())
         status['trends']['temperature'] = self.get_trend(self.history['temp'])
         status['trends']['ph'] = self.get_trend(self.history['ph'])
         status['trends']['nitrogen'] = self.get_trend(self.history['nitrogen'])
         status['trends']['phosphorus'] = self.get_trend(self.history['phosphorus'])
-
-        if not any([avg_temp, avg_ph, avg_ec, avg_nitrogen, avg_phosphorus]):
-            status['alerts'].append('⚠️ No valid sensor data available')
-            status['score'] += 50
-            status['overall'] = 'WARNING'
-            return status
-
-        if avg_ph is None:
-            status['alerts'].append('⚠️ pH sensor not in water or faulty')
-            status['score'] += 30
-        elif avg_ph < 5.5:
-            status['score'] += 50
-            status['alerts'].append(f"🚨 CRITICAL: pH {avg_ph:.1f} is dangerously acidic")
-            status['recommendations'].add('URGENT: Add agricultural lime (CaCO₃) immediately')
-        elif avg_ph < 6.0:
-            status['score'] += 25
-            status['alerts'].append(f"⚠️ WARNING: pH {avg_ph:.1f} is acidic")
-            status['recommendations'].add('Consider adding agricultural lime gradually')
-        elif avg_ph < 6.5:
-            status['score'] += 10
-            status['alerts'].append(f"ℹ️ pH {avg_ph:.1f} is slightly low but acceptable")
-        elif avg_ph > 9.5:
-            status['score'] += 50
-            status['alerts'].append(f"🚨 CRITICAL: pH {avg_ph:.1f} is dangerously alkaline")
-            status['recommendations'].add('URGENT: Perform large water change')
-        elif avg_ph > 9.0:
-            status['score'] += 25
-            status['alerts'].append(f"⚠️ WARNING: pH {avg_ph:.1f} is too alkaline")
-            status['recommendations'].add('Perform partial water change')
-        elif avg_ph > 8.5:
-            status['score'] += 10
-            status['alerts'].append(f"ℹ️ pH {avg_ph:.1f} is slightly high but acceptable")
-
-        if avg_temp is not None:
-            if avg_temp < 12:
-                status['score'] += 40
-                status['alerts'].append(f"🚨 CRITICAL: Temperature {avg_temp:.1f}°C is too cold")
-                status['recommendations'].add('Add pond heater immediately')
-            elif avg_temp < 18:
-                status['score'] += 15
-                status['alerts'].append(f"⚠️ Temperature {avg_temp:.1f}°C is cool")
-            elif avg_temp > 35:
-                status['score'] += 40
-                status['alerts'].append(f"🚨 CRITICAL: Temperature {avg_temp:.1f}°C is too hot")
-                status['recommendations'].add('Add shade and emergency aeration')
-            elif avg_temp > 30:
-                status['score'] += 15
-                status['alerts'].append(f"⚠️ Temperature {avg_temp:.1f}°C is warm")
-                status['recommendations'].add('Monitor closely and increase aeration')
-
-        if avg_ec is not None and avg_ec > 2000:
-            status['score'] += 30
-            status['alerts'].append(f"⚠️ EC {avg_ec:.0f} μS/cm is high")
-            status['recommendations'].add('Consider diluting with fresh water')
-
-        if turbidity_ratio > 0.8:
-            status['score'] += 20
-            status['alerts'].append(f"⚠️ Water is consistently turbid")
-            status['recommendations'].add('Check filter and consider water change')
-
-        if avg_nitrogen is not None:
-            if avg_nitrogen > 200:
-                status['score'] += 35
-                status['alerts'].append(f"🚨 CRITICAL: Nitrogen extremely high: {avg_nitrogen:.1f} mg/kg")
-                status['recommendations'].add('URGENT: Stop feeding and perform large water change')
-            elif avg_nitrogen > 150:
-                status['score'] += 20
-                status['alerts'].append(f"⚠️ WARNING: Nitrogen high: {avg_nitrogen:.1f} mg/kg")
-                status['recommendations'].add('Reduce feeding and increase water changes')
-            elif avg_nitrogen > 100:
-                status['score'] += 5
-                status['alerts'].append(f"ℹ️ Nitrogen elevated: {avg_nitrogen:.1f} mg/kg (monitor)")
-
-        if avg_phosphorus is not None:
-            if avg_phosphorus > 200:
-                status['score'] += 35
-                status['alerts'].append(f"🚨 CRITICAL: Phosphorus extremely high: {avg_phosphorus:.1f} mg/kg")
-                status['recommendations'].add('URGENT: Stop feeding and perform large water change')
-            elif avg_phosphorus > 150:
-                status['score'] += 20
-                status['alerts'].append(f"⚠️ WARNING: Phosphorus high: {avg_phosphorus:.1f} mg/kg")
-                status['recommendations'].add('Reduce feeding and increase water changes')
-            elif avg_phosphorus > 100:
-                status['score'] += 5
-                status['alerts'].append(f"ℹ️ Phosphorus elevated: {avg_phosphorus:.1f} mg/kg (monitor)")
-
-        if status['score'] >= 80:
-            status['overall'] = 'CRITICAL'
-        elif status['score'] >= 40:
-            status['overall'] = 'WARNING'
-        else:
-            status['overall'] = 'GOOD'
-
+        STAGE_SECONDS['rules'].observe(time.perf_counter() - start)
         return status
 
     def set_leds(self, blue, yellow, red):
         try:
-            GPIO.output(config.get('GPIO', {}).get('BLUE_LED_PIN', 27), blue)
-            GPIO.output(config.get('GPIO', {}).get('YELLOW_LED_PIN', 22), yellow)
-            GPIO.output(config.get('GPIO', {}).get('RED_LED_PIN', 5), red)
+            self.gpio.output(config.GPIO.BLUE_LED_PIN, blue)
+            self.gpio.output(config.GPIO.YELLOW_LED_PIN, yellow)
+            self.gpio.output(config.GPIO.RED_LED_PIN, red)
         except Exception as e:
-            logger.debug(f"LED control error: {e}")
+            logger.debug("LED control error: %s", e)
 
     def update_indicators(self, status):
         self.set_leds(0, 0, 0)
@@ -567,42 +4309,30 @@ class SmartFishPondMonitor:
                 self.state['pump']['mode'] = "OFF"
         elif status['overall'] == 'WARNING':
             self.set_leds(0, 1, 0)
-            try:
-                threading.Timer(0.2, lambda: self.pwm_buzzer.ChangeDutyCycle(50)).start()
-                threading.Timer(0.4, lambda: self.pwm_buzzer.ChangeDutyCycle(0)).start()
-            except:
-                pass
+            self.chirp_buzzer(0.2)
             with self.state_lock:
                 self.state['pump']['should_run'] = False
         elif status['overall'] == 'CRITICAL':
             self.set_leds(0, 0, 1)
-            try:
-                threading.Timer(1.0, lambda: self.pwm_buzzer.ChangeDutyCycle(50)).start()
-                threading.Timer(1.2, lambda: self.pwm_buzzer.ChangeDutyCycle(0)).start()
-            except:
-                pass
+            self.chirp_buzzer(1.0)
 
             with self.state_lock:
-                if not self.state['pump']['is_running']:
+                start_pump = not self.state['pump']['is_running']
+                if start_pump:
                     self.state['pump']['should_run'] = True
                     self._determine_pump_mode(status)
+            if start_pump:
+                self.scheduler.call_soon(self.pump_control, name="pump-on")
+
+    def chirp_buzzer(self, delay, length=0.2):
+        self.scheduler.call_later(delay, lambda: self.pwm_buzzer.ChangeDutyCycle(50), name="buzzer-on")
+        self.scheduler.call_later(delay + length, lambda: self.pwm_buzzer.ChangeDutyCycle(0), name="buzzer-off")
 
     def _determine_pump_mode(self, status):
-        avg_temp = self.get_average(self.history['temp'])
-        avg_ph = self.get_average(self.history['ph'])
-        turbidity_ratio = sum(self.history['turbidity']) / len(self.history['turbidity']) if self.history['turbidity'] else 0
-
-        if avg_temp is not None and (avg_temp < 15 or avg_temp > 32):
-            self.state['pump']['mode'] = "LONG"
-        elif avg_ph is not None and (avg_ph < 6.0 or avg_ph > 9.0):
-            self.state['pump']['mode'] = "SHORT"
-        elif turbidity_ratio > 0.7:
-            self.state['pump']['mode'] = "NORMAL"
-        else:
-            self.state['pump']['mode'] = "NORMAL"
+        self.state['pump']['mode'] = self.rules.pump_mode(self.get_averages())
 
     def handle_critical_state(self, status):
-        current_time = time.time()
+        current_time = self.clock.time()
 
         if status['overall'] == 'CRITICAL':
             with self.state_lock:
@@ -611,13 +4341,14 @@ class SmartFishPondMonitor:
                     self.state['critical']['sustained'] = True
                     self.state['critical']['alert_sent'] = False
                     logger.info("⚠️ Critical condition detected. Starting 5-minute timer before SMS alert.")
+                    self.checkpoint_soon()
 
                 elif (not self.state['critical']['alert_sent'] and
-                      current_time - self.state['critical']['start_time'] > config.get('CRITICAL_DURATION', 300)):
+                      current_time - self.state['critical']['start_time'] > config.CRITICAL_DURATION):
                     logger.info("🚨 Sustained critical condition confirmed. Sending SMS alert.")
-                    self._send_sms_message(status)
-                    self.state['sms']['last_sent_time'] = current_time
+                    self.queue_sms_alert(status)
                     self.state['critical']['alert_sent'] = True
+                    self.checkpoint_soon()
 
         else:
             with self.state_lock:
@@ -626,279 +4357,162 @@ class SmartFishPondMonitor:
                     self.state['critical']['start_time'] = None
                     self.state['critical']['sustained'] = False
                     self.state['critical']['alert_sent'] = False
+                    self.checkpoint_soon()
+
+    def queue_sms_alert(self, status):
+        key, message = sms_alert(status, self.clock.time())
+        return self.sms.submit(config.PHONE_NUMBERS, key, message)
+
+    def pump_control(self):
+        with self.state_lock:
+            if not self.state['pump']['should_run'] or self.state['pump']['is_running']:
+                return
+            pump_mode = self.state['pump']['mode']
+            self.state['pump']['is_running'] = True
+            self.state['pump']['start_time'] = self.clock.time()
+            self.state['pump']['should_run'] = False
+
+        logger.info("▶️ Activating PUMP in %s mode.", pump_mode)
+        self.gpio.output(config.GPIO.PUMP_PIN, self.gpio.LOW)
+        run_duration = config.PUMP_RUN_DURATION.get(pump_mode, 300)
+        # The off-deadline is an event, not something a loop polls for
+        self.pump_off_task = self.scheduler.call_later(run_duration, self.pump_off, name="pump-off")
+        self.checkpoint_soon()
+
+    def pump_off(self):
+        with self.state_lock:
+            pump_mode = self.state['pump']['mode']
+            self.state['pump']['is_running'] = False
+            self.state['pump']['mode'] = "OFF"
+        logger.info("⏹️ %s pump cycle complete. Turning PUMP OFF.", pump_mode)
+        self.gpio.output(config.GPIO.PUMP_PIN, self.gpio.HIGH)
+        self.pump_off_task = None
+        self.checkpoint_soon()
+
+    def checkpoint_state(self):
+        with self.state_lock:
+            critical = dict(self.state['critical'])
+            pump = {key: self.state['pump'][key] for key in ('is_running', 'start_time', 'mode')}
+            status = self.state['indicators']['last_status']
+        return {
+            'saved_at': self.clock.time(),
+            'cycle': self.cycle_count,
+            'critical': critical,
+            'pump': pump,
+            'status': status,
+            'history': {name: list(window) for name, window in self.history.items()},
+            'filters': {channel: f.values() for channel, f in self.filters.filters.items()} if self.filters else {}
+        }
 
-    def _send_sms_message(self, status):
-        if not self.gsm:
-            logger.error("GSM module not available for SMS")
+    def save_checkpoint(self):
+        if not self.checkpoint_path:
             return
+        start = time.perf_counter()
+        write_checkpoint(self.checkpoint_path, encode_checkpoint(self.checkpoint_state()))
+        STAGE_SECONDS['checkpoint'].observe(time.perf_counter() - start)
+        self.last_checkpoint = self.clock.time()
+
+    def checkpoint_soon(self):
+        # State the next start must not lose (alert sent, pump started): save now
+        if self.checkpoint_path:
+            self.scheduler.expedite('checkpoint')
+
+    def restore_checkpoint(self):
+        # Warm start: history, filter windows, critical timer and a pump run in progress
+        if not self.checkpoint_path:
+            return False
+        saved = read_checkpoint(self.checkpoint_path)
+        if saved is None:
+            return False
+        now = self.clock.time()
+        age = now - saved['saved_at']
+        if not 0 <= age <= config.CHECKPOINT.MAX_AGE:
+            logger.info("Checkpoint is %.0fs old; starting with empty history", age)
+            return False
 
-        message = f"🚨 POND ALERT ({status['overall']})\n"
-        message += f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n"
-        message += "Critical Issues:\n" + "\n".join(status['alerts'][:3])
-        if status['recommendations']:
-            message += f"\n\nActions:\n" + "\n".join(list(status['recommendations'])[:2])
-
-        with self.gsm_lock:
-            for phone in config.get('PHONE_NUMBERS', []):
-                try:
-                    self.gsm.write(f'AT+CMGS="{phone}"\r\n'.encode())
-                    time.sleep(1)
-                    self.gsm.write(message.encode())
-                    time.sleep(0.5)
-                    self.gsm.write(b'\x1A')
-                    time.sleep(5)
-                    final_response = self.gsm.read_all().decode(errors="ignore")
-                    if "+CMGS:" in final_response:
-                        logger.info(f"✅ SMS sent to {phone}")
-                    else:
-                        logger.error(f"❌ SMS failed to {phone}: {final_response.strip()}")
-                except Exception as e:
-                    logger.error(f"Error sending SMS to {phone}: {e}")
-
-    def pump_control_loop(self):
-        while self.state['running']:
-            try:
-                with self.state_lock:
-                    should_activate = self.state['pump']['should_run'] and not self.state['pump']['is_running']
-                    is_running = self.state['pump']['is_running']
-                    pump_mode = self.state['pump']['mode']
-                    start_time = self.state['pump']['start_time']
-                
-                if should_activate:
-                    logger.info(f"▶️ Activating PUMP in {pump_mode} mode.")
-                    GPIO.output(config.get('GPIO', {}).get('PUMP_PIN', 16), GPIO.LOW)
-                    with self.state_lock:
-                        self.state['pump']['is_running'] = True
-                        self.state['pump']['start_time'] = time.time()
-                        self.state['pump']['should_run'] = False
-
-                if is_running:
-                    run_duration = config.get('PUMP_RUN_DURATION', {}).get(pump_mode, 300)
-                    if time.time() - start_time > run_duration:
-                        logger.info(f"⏹️ {pump_mode} pump cycle complete. Turning PUMP OFF.")
-                        GPIO.output(config.get('GPIO', {}).get('PUMP_PIN', 16), GPIO.HIGH)
-                        with self.state_lock:
-                            self.state['pump']['is_running'] = False
-                            self.state['pump']['mode'] = "OFF"
-
-                self.thread_watchdog['pump'] = time.time()
-                time.sleep(1)
-            except Exception as e:
-                logger.error(f"Error in pump_control_loop: {e}")
-                self.thread_watchdog['pump'] = time.time()
-                time.sleep(5)
+        for name, values in saved['history'].items():
+            window = self.history.get(name)
+            if window is not None:
+                window.clear()
+                for value in values[-window.capacity:]:
+                    window.append(value)
+        if self.filters:
+            for channel, values in saved['filters'].items():
+                if channel in self.filters.filters:
+                    self.filters.filters[channel].load(values)
+        self.cycle_count = saved['cycle']
+        pump = saved['pump']
+        remaining = pump['start_time'] + config.PUMP_RUN_DURATION.get(pump['mode'], 300) - now
+        with self.state_lock:
+            self.state['critical'].update(saved['critical'])
+            self.state['indicators']['last_status'] = saved['status']
+            if pump['is_running'] and remaining > 0:
+                self.state['pump'].update(pump)
+
+        if pump['is_running'] and remaining > 0:
+            logger.info("▶️ Resuming PUMP in %s mode for %.0fs.", pump['mode'], remaining)
+            self.gpio.output(config.GPIO.PUMP_PIN, self.gpio.LOW)
+            self.pump_off_task = self.scheduler.call_later(remaining, self.pump_off, name="pump-off")
+        logger.info("♻️ Restored checkpoint from %.0fs ago (cycle %d, %d history samples)",
+                    age, self.cycle_count, len(self.history['temp']))
+        return True
 
     def _update_lcd_content(self, status):
         if not self.state['indicators']['lcd_available'] or not self.lcd:
             return
 
         try:
-            line1 = ""
-            line2 = ""
-
-            if status['overall'] in ['WARNING', 'CRITICAL']:
-                if status['overall'] == 'WARNING':
-                    line1 = "!   WARNING   !"
-                else:
-                    line1 = "!! CRITICAL  !!"
-
-                if status['alerts']:
-                    alert = status['alerts'][0]
-                    alert_clean = ''.join(c for c in alert if ord(c) < 128)
-                    alert_clean = alert_clean.replace('CRITICAL:', '').replace('DANGER:', '').replace('WARNING:', '').replace('ℹ️', '').strip()
-
-                    if 'pH' in alert_clean:
-                        ph_match = re.search(r'pH[:\s]+([\d.]+)', alert_clean)
-                        if ph_match:
-                            ph_val = float(ph_match.group(1))
-                            if 'acidic' in alert_clean.lower() or 'dangerously acidic' in alert_clean.lower():
-                                line2 = f"pH:{ph_val:4.1f} ACIDIC "
-                            elif 'alkaline' in alert_clean.lower() or 'dangerously alkaline' in alert_clean.lower():
-                                line2 = f"pH:{ph_val:4.1f} ALKALIN"
-                            elif 'slightly low' in alert_clean.lower():
-                                line2 = f"pH:{ph_val:4.1f} LOW    "
-                            elif 'slightly high' in alert_clean.lower():
-                                line2 = f"pH:{ph_val:4.1f} HIGH   "
-                            else:
-                                line2 = f"pH:{ph_val:4.1f} Problem"
-                        else:
-                            line2 = "pH sensor issue "
-                    elif 'Temperature' in alert_clean:
-                        temp_match = re.search(r'([\d.]+).?C', alert_clean)
-                        if temp_match:
-                            temp_val = float(temp_match.group(1))
-                            if 'cold' in alert_clean.lower():
-                                line2 = f"T:{temp_val:4.1f}C  COLD  "
-                            elif 'cool' in alert_clean.lower():
-                                line2 = f"T:{temp_val:4.1f}C  COOL  "
-                            elif 'hot' in alert_clean.lower():
-                                line2 = f"T:{temp_val:4.1f}C   HOT  "
-                            elif 'warm' in alert_clean.lower():
-                                line2 = f"T:{temp_val:4.1f}C  WARM  "
-                            else:
-                                line2 = f"T:{temp_val:4.1f}C   BAD "
-                        else:
-                            line2 = "Temp issue      "
-                    elif 'Nitrogen' in alert_clean:
-                        n_match = re.search(r'([\d.]+)\s*mg/kg', alert_clean)
-                        if n_match:
-                            n_val = float(n_match.group(1))
-                            if 'extremely high' in alert_clean.lower() or 'critical' in alert_clean.lower():
-                                line2 = f"N:{n_val:6.1f} CRIT  "
-                            elif 'high' in alert_clean.lower() or 'warning' in alert_clean.lower():
-                                line2 = f"N:{n_val:6.1f} HIGH  "
-                            elif 'elevated' in alert_clean.lower():
-                                line2 = f"N:{n_val:6.1f} ELEV  "
-                            else:
-                                line2 = f"N:{n_val:6.1f} HIGH  "
-                        else:
-                            line2 = "Nitrogen too HI "
-                    elif 'Phosphorus' in alert_clean:
-                        p_match = re.search(r'([\d.]+)\s*mg/kg', alert_clean)
-                        if p_match:
-                            p_val = float(p_match.group(1))
-                            if 'extremely high' in alert_clean.lower() or 'critical' in alert_clean.lower():
-                                line2 = f"P:{p_val:6.1f} CRIT  "
-                            elif 'high' in alert_clean.lower() or 'warning' in alert_clean.lower():
-                                line2 = f"P:{p_val:6.1f} HIGH  "
-                            elif 'elevated' in alert_clean.lower():
-                                line2 = f"P:{p_val:6.1f} ELEV  "
-                            else:
-                                line2 = f"P:{p_val:6.1f} HIGH  "
-                        else:
-                            line2 = "Phosphorus HIGH "
-                    elif 'EC' in alert_clean:
-                        ec_match = re.search(r'EC\s+([\d.]+)', alert_clean)
-                        if ec_match:
-                            ec_val = float(ec_match.group(1))
-                            line2 = f"EC:{ec_val:5.0f} HIGH   "
-                        else:
-                            line2 = "EC too high     "
-                    elif 'turbid' in alert_clean.lower():
-                        line2 = "WATER TURBID    "
-                    elif 'sensor' in alert_clean.lower() and 'pH' in alert_clean:
-                        line2 = "pH sensor fault "
-                    elif 'sensor' in alert_clean.lower():
-                        line2 = "Sensor fault    "
-                    elif 'No valid' in alert_clean:
-                        line2 = "No sensor data  "
-                    else:
-                        line2 = alert_clean[:16].ljust(16)
-                else:
-                    line2 = "Check system    "
-
+            if status['overall'] in LCD_STATUS_HEADERS:
+                lines = lcd_alert_lines(status)
             else:
-                screen = self.state['indicators']['lcd_screen'] % 4
-
-                if screen == 0:
-                    temp = self.get_average(self.history['temp'])
-                    ph = self.get_average(self.history['ph'])
-                    if temp is not None and ph is not None:
-                        line1 = f"T:{temp:4.1f}C  pH:{ph:4.1f} "
-                        temp_trend = status['trends'].get('temperature', 'STABLE')
-                        ph_trend = status['trends'].get('ph', 'STABLE')
-                        if temp_trend == "STABLE" and ph_trend == "STABLE":
-                            line2 = "TREND: STABLE   "
-                        elif temp_trend == "INCREASING" and ph_trend == "INCREASING":
-                            line2 = "TREND: UP   UP  "
-                        elif temp_trend == "DECREASING" and ph_trend == "DECREASING":
-                            line2 = "TREND: DOWN DOWN"
-                        elif temp_trend == "INCREASING" and ph_trend == "DECREASING":
-                            line2 = "TREND: UP   DOWN"
-                        elif temp_trend == "DECREASING" and ph_trend == "INCREASING":
-                            line2 = "TREND: DOWN UP  "
-                        elif temp_trend == "INCREASING":
-                            line2 = "TREND: UP   --  "
-                        elif temp_trend == "DECREASING":
-                            line2 = "TREND: DOWN --  "
-                        elif ph_trend == "INCREASING":
-                            line2 = "TREND: --   UP  "
-                        elif ph_trend == "DECREASING":
-                            line2 = "TREND: --   DOWN"
-                        else:
-                            line2 = "TREND: STABLE   "
-                    else:
-                        line1 = "Temperature & pH"
-                        line2 = "No data         "
-
-                elif screen == 1:
-                    ec = self.get_average(self.history['ec'])
-                    turbidity_ratio = sum(self.history['turbidity']) / len(self.history['turbidity']) if self.history['turbidity'] else 0
-                    if ec is not None:
-                        turbidity_status = "TURBID" if turbidity_ratio > 0.5 else "CLEAR "
-                        line1 = f"EC:{ec:5.0f} uS/cm  "
-                        line2 = f"WATER: {turbidity_status:6} "
-                    else:
-                        line1 = "EC & Turbidity  "
-                        line2 = "No data         "
-
-                elif screen == 2:
-                    n = self.get_average(self.history['nitrogen'])
-                    p = self.get_average(self.history['phosphorus'])
-                    if n is not None and p is not None:
-                        line1 = f"N:{n:6.1f} mg/kg  "
-                        line2 = f"P:{p:6.1f} mg/kg  "
-                    else:
-                        line1 = "Nitrogen & Phos."
-                        line2 = "No data         "
-
-                else:
-                    status_text = status['overall']
-                    score = status['score']
-                    line1 = f"Status: {status_text:7} "
-                    line2 = f"Score: {score:3}/100   "
-
-            line1 = line1[:16].ljust(16)
-            line2 = line2[:16].ljust(16)
-            content = line1 + line2
-
-            if content != self.state['indicators']['last_lcd_content']:
-                try:
-                    self.lcd.clear()
-                    time.sleep(0.01)
-                    self.lcd.cursor_pos = (0, 0)
-                    self.lcd.write_string(line1)
-                    time.sleep(0.01)
-                    self.lcd.cursor_pos = (1, 0)
-                    self.lcd.write_string(line2)
-                    self.state['indicators']['last_lcd_content'] = content
-                except Exception as lcd_err:
-                    logger.error(f"LCD write error: {lcd_err}")
-                    raise
-
+                lines = self._lcd_screen(status, self.state['indicators']['lcd_screen'] % 4)
+            start = time.perf_counter()
+            self.lcd_writer.show(lines)
+            STAGE_SECONDS['lcd_write'].observe(time.perf_counter() - start)
             self.state['indicators']['lcd_error_count'] = 0
 
         except Exception as e:
             self.state['indicators']['lcd_error_count'] += 1
-            logger.error(f"LCD error: {e}")
+            logger.error("LCD error: %s", e)
             if self.state['indicators']['lcd_error_count'] >= 5:
                 logger.warning("Multiple LCD errors, marking as unavailable")
                 self.state['indicators']['lcd_available'] = False
 
-    def display_loop(self):
-        while self.state['running']:
-            try:
-                last_status = self.state.get('last_status_full')
-                if last_status:
-                    self._update_lcd_content(last_status)
-                
-                self.state['indicators']['lcd_screen'] += 1
-                self.thread_watchdog['display'] = time.time()
-                time.sleep(config.get('LCD_REFRESH_INTERVAL', 5))
-            except Exception as e:
-                logger.error(f"Error in display_loop: {e}")
-                self.thread_watchdog['display'] = time.time()
-                time.sleep(5)
+    def _lcd_screen(self, status, screen):
+        if screen == 0:
+            temp = self.get_average(self.history['temp'])
+            ph = self.get_average(self.history['ph'])
+            if temp is None or ph is None:
+                return "Temperature & pH", "No data"
+            trends = status['trends']
+            trend_line = LCD_TREND_LINES.get((trends.get('temperature', 'STABLE'), trends.get('ph', 'STABLE')),
+                                             LCD_TREND_LINES['STABLE', 'STABLE'])
+            return f"T:{temp:4.1f}C  pH:{ph:4.1f}", trend_line
+
+        if screen == 1:
+            ec = self.get_average(self.history['ec'])
+            if ec is None:
+                return "EC & Turbidity", "No data"
+            turbidity_status = "TURBID" if self.get_turbidity_ratio() > 0.5 else "CLEAR"
+            return f"EC:{ec:5.0f} uS/cm", f"WATER: {turbidity_status}"
+
+        if screen == 2:
+            n = self.get_average(self.history['nitrogen'])
+            p = self.get_average(self.history['phosphorus'])
+            if n is None or p is None:
+                return "Nitrogen & Phos.", "No data"
+            return f"N:{n:6.1f} mg/kg", f"P:{p:6.1f} mg/kg"
+
+        return f"Status: {status['overall']}", f"Score: {status['score']:3}/100"
+
+    def display_tick(self):
+        last_status = self.state.get('last_status_full')
+        if last_status:
+            self._update_lcd_content(last_status)
+        self.state['indicators']['lcd_screen'] += 1
 
     def validate_sensor_data(self, data):
-        valid_ranges = {
-            'temperature': (-40, 80),
-            'ph': (0, 14),
-            'ec': (0, 5000),
-            'nitrogen': (0, 200),
-            'phosphorus': (0, 200),
-            'quality_score': (0, 150)
-        }
+        valid_ranges = dict(self.rules.valid_ranges, quality_score=(0, 150))
 
         out_of_range = False
         for param, (min_val, max_val) in valid_ranges.items():
@@ -907,393 +4521,376 @@ class SmartFishPondMonitor:
                 try:
                     val_float = float(value)
                     if not (min_val <= val_float <= max_val):
-                        logger.warning(f"{param} out of range: {val_float}")
+                        logger.warning("%s out of range: %s", param, val_float)
                         out_of_range = True
                 except (ValueError, TypeError) as e:
-                    logger.warning(f"{param} validation error: {value} - {e}")
+                    logger.warning("%s validation error: %s - %s", param, value, e)
                     out_of_range = True
 
         quality_status = data.get('quality_status')
         if quality_status and quality_status not in ['GOOD', 'WARNING', 'CRITICAL']:
-            logger.debug(f"Invalid quality_status: {quality_status}")
+            logger.debug("Invalid quality_status: %s", quality_status)
             data['quality_status'] = 'GOOD'
 
         return not out_of_range
 
     def has_any_valid_data(self, data):
-        return any(v is not None for k, v in data.items()
-                   if k not in ['quality_score', 'quality_status'])
-
-    def send_to_thingspeak(self, data, timestamp):
-        if not config.get('THINGSPEAK', {}).get('API_KEY'):
-            logger.warning("ThingSpeak API key not configured")
-            return False
-
-        if not self.validate_sensor_data(data):
-            logger.debug("Data validation failed")
-            return False
-
-        payload = {"api_key": config.get('THINGSPEAK', {}).get('API_KEY')}
-        if data.get('temperature') is not None:
-            payload['field1'] = data['temperature']
-        if data.get('ph') is not None:
-            payload['field2'] = data['ph']
-        if data.get('ec') is not None:
-            payload['field3'] = data['ec']
-        if data.get('nitrogen') is not None:
-            payload['field4'] = data['nitrogen']
-        if data.get('phosphorus') is not None:
-            payload['field5'] = data['phosphorus']
-        if data.get('turbidity') is not None:
-            payload['field6'] = 1 if data.get('turbidity') else 0
-        if data.get('quality_score') is not None:
-            payload['field7'] = data['quality_score']
-        
-        if data.get('quality_status') is not None:
-            status_text = str(data['quality_status']).upper()
-            status_code = QUALITY_STATUS_CODES.get(status_text, -1)
-            payload['field8'] = status_code
-
-        max_retries = config.get('THINGSPEAK', {}).get('MAX_RETRIES', 3)
-        initial_delay = config.get('THINGSPEAK', {}).get('RETRY_DELAY', 5)
-        max_delay = config.get('THINGSPEAK', {}).get('MAX_RETRY_DELAY', 60)
-
-        for attempt in range(max_retries):
-            if time.time() - self.state['thingspeak']['last_network_check'] > 30:
-                self.state['thingspeak']['last_network_check'] = time.time()
-                
-                if not check_network_connectivity():
-                    logger.warning("⚠️ Network is down. Saving to backup.")
-                    self.save_thingspeak_backup(timestamp, data)
-                    self.state['thingspeak']['network_error_count'] += 1
-                    if self.state['thingspeak']['network_error_count'] % 3 == 0:
-                        restart_network_interface()
-                        time.sleep(5)
-                    if not check_network_connectivity():
-                        logger.error("❌ Failed to restore network connectivity.")
-                        break
-
-            try:
-                response = requests.get(
-                    config.get('THINGSPEAK', {}).get('URL'), 
-                    params=payload, 
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    result = response.text.strip()
-                    if result.isdigit() and int(result) > 0:
-                        logger.info(f"✅ ThingSpeak upload (Entry: {result})")
-                        self.state['thingspeak']['connection_errors'] = 0
-                        self.state['thingspeak']['network_error_count'] = 0
-                        return True
-                    else:
-                        logger.warning(f"⚠️ ThingSpeak returned '{result}'")
-                        self.save_thingspeak_backup(timestamp, data)
-                        return False
-                else:
-                    logger.error(f"❌ HTTP Error: {response.status_code}")
-                    self.save_thingspeak_backup(timestamp, data)
-
-            except requests.exceptions.Timeout:
-                logger.warning(f"⏱️ Timeout (Attempt {attempt+1}/{max_retries})")
-                self.save_thingspeak_backup(timestamp, data)
-
-            except requests.exceptions.ConnectionError as e:
-                logger.error(f"🌐 Network error (Attempt {attempt+1}/{max_retries}): {str(e)[:80]}")
-                self.save_thingspeak_backup(timestamp, data)
-
-            except requests.exceptions.RequestException as e:
-                logger.error(f"❌ Request failed (Attempt {attempt+1}/{max_retries}): {str(e)[:80]}")
-                self.save_thingspeak_backup(timestamp, data)
-                
-            except Exception as e:
-                logger.error(f"❌ Unexpected error: {e}")
-                self.save_thingspeak_backup(timestamp, data)
-
-            if attempt < max_retries - 1:
-                delay = min(max_delay, initial_delay * (2 ** attempt)) + random.uniform(0, 2)
-                logger.info(f"⏳ Retrying in {delay:.1f} seconds...")
-                time.sleep(delay)
-
-        self.state['thingspeak']['connection_errors'] += 1
-        logger.error(f"❌ Failed to send to ThingSpeak after {max_retries} attempts.")
-        return False
-
-    def save_thingspeak_backup(self, timestamp, data):
-        backup_file = config.get('THINGSPEAK', {}).get('BACKUP_FILE')
-        if not backup_file:
-            logger.error("Backup file path not configured.")
-            return
-
-        ensure_directory_exists(backup_file)
-        header_needed = not os.path.exists(backup_file)
-        
-        try:
-            with open(backup_file, "a", newline="") as f:
-                writer = csv.writer(f)
-                if header_needed:
-                    writer.writerow(["timestamp", "temperature", "ph", "ec", "nitrogen",
-                                   "phosphorus", "turbidity", "quality_score", "quality_status"])
-                writer.writerow([
-                    timestamp,
-                    data.get('temperature'),
-                    data.get('ph'),
-                    data.get('ec'),
-                    data.get('nitrogen'),
-                    data.get('phosphorus'),
-                    data.get('turbidity'),
-                    data.get('quality_score'),
-                    data.get('quality_status')
-                ])
-            logger.debug(f"💾 Backup saved")
-        except Exception as e:
-            logger.error(f"Error saving backup: {e}")
-
-    def flush_thingspeak_backup(self):
-        backup_file = config.get('THINGSPEAK', {}).get('BACKUP_FILE')
-        if not backup_file or not os.path.exists(backup_file):
-            return
-
-        rows_to_keep = []
-        try:
-            with open(backup_file, "r", newline="") as f:
-                reader = csv.reader(f)
-                headers = next(reader, None)
-                for row in reader:
-                    if len(row) >= 9:
-                        try:
-                            def safe_convert(value, is_numeric=True):
-                                if not value or value.strip() == '':
-                                    return None
-                                if is_numeric:
-                                    try:
-                                        return float(value)
-                                    except ValueError:
-                                        return None
-                                return value
-
-                            row_dict = {
-                                'timestamp': row[0],
-                                'temperature': safe_convert(row[1]),
-                                'ph': safe_convert(row[2]),
-                                'ec': safe_convert(row[3]),
-                                'nitrogen': safe_convert(row[4]),
-                                'phosphorus': safe_convert(row[5]),
-                                'turbidity': safe_convert(row[6]),
-                                'quality_score': safe_convert(row[7]),
-                                'quality_status': safe_convert(row[8], is_numeric=False)
-                            }
-                            rows_to_keep.append(row_dict)
-                        except (ValueError, IndexError) as e:
-                            logger.warning(f"Skipping invalid backup row: {e}")
-                            continue
-        except Exception as e:
-            logger.error(f"Error reading backup file: {e}")
-            return
-
-        if not rows_to_keep:
-            try:
-                os.remove(backup_file)
-                logger.info("🗑️ Empty backup file removed")
-            except OSError:
-                pass
-            return
-
-        logger.info(f"📤 Flushing {len(rows_to_keep)} backup entries...")
-        still_failed = []
-
-        for row in rows_to_keep:
-            data = {k: v for k, v in row.items()
-                    if k != 'timestamp' and v is not None}
-
-            if self.has_any_valid_data(data):
-                success = self.send_to_thingspeak(data, row['timestamp'])
-                if not success:
-                    still_failed.append(row)
-                else:
-                    logger.info(f"✅ Flushed backup: {row['timestamp']}")
-                time.sleep(16)
-            else:
-                logger.warning(f"Skipping backup entry with no valid data: {row['timestamp']}")
-
-        if still_failed:
-            try:
-                with open(backup_file, "w", newline="") as f:
-                    writer = csv.writer(f)
-                    writer.writerow(["timestamp", "temperature", "ph", "ec", "nitrogen",
-                                  "phosphorus", "turbidity", "quality_score", "quality_status"])
-                    for row in still_failed:
-                        writer.writerow([
-                            row['timestamp'],
-                            row.get('temperature', ''),
-                            row.get('ph', ''),
-                            row.get('ec', ''),
-                            row.get('nitrogen', ''),
-                            row.get('phosphorus', ''),
-                            row.get('turbidity', ''),
-                            row.get('quality_score', ''),
-                            row.get('quality_status', '')
-                        ])
-                logger.info(f"💾 {len(still_failed)} entries remain in backup")
-            except Exception as e:
-                logger.error(f"Error writing backup file: {e}")
-        else:
-            try:
-                os.remove(backup_file)
-                logger.info("✅ All backup data sent to ThingSpeak")
-            except OSError:
-                pass
-
-    def thingspeak_loop(self):
-        while self.state['running']:
-            try:
-                current_time = time.time()
-                send_interval = config.get('THINGSPEAK', {}).get('SEND_INTERVAL', 60)
-                
-                if current_time - self.state['thingspeak']['last_sent_time'] >= send_interval:
-                    data = {
-                        'temperature': self.get_average(self.history['temp']),
-                        'ph': self.get_average(self.history['ph']),
-                        'ec': self.get_average(self.history['ec']),
-                        'nitrogen': self.get_average(self.history['nitrogen']),
-                        'phosphorus': self.get_average(self.history['phosphorus']),
-                        'turbidity': sum(self.history['turbidity']) / len(self.history['turbidity']) if self.history['turbidity'] else 0,
-                        'quality_score': self.state.get('last_status_full', {}).get('score', 0),
-                        'quality_status': self.state.get('last_status_full', {}).get('overall', 'GOOD')
-                    }
-
-                    if self.has_any_valid_data(data):
-                        try:
-                            self.flush_thingspeak_backup()
-                        except Exception as e:
-                            logger.error(f"Error flushing backup: {e}")
-
-                        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        if self.send_to_thingspeak(data, timestamp):
-                            self.state['thingspeak']['last_sent_time'] = current_time
-                    else:
-                        logger.debug("Waiting for valid sensor data...")
+        return any(v is not None for k, v in data.items()
+                   if k not in ['quality_score', 'quality_status'])
 
-                self.thread_watchdog['thingspeak'] = time.time()
-                time.sleep(5)
-                
-            except Exception as e:
-                logger.error(f"Error in thingspeak_loop: {e}")
-                self.thread_watchdog['thingspeak'] = time.time()
-                time.sleep(10)
+    def send_to_thingspeak(self, data, timestamp, row_id=None):
+        if not config.THINGSPEAK.API_KEY:
+            logger.warning("ThingSpeak API key not configured")
+            return False
 
-    def watchdog_loop(self):
-        while self.state['running']:
-            try:
-                current_time = time.time()
-                timeout = 120
+        if not self.validate_sensor_data(data):
+            logger.debug("Data validation failed")
+            return False
 
-                for thread_name, last_update in self.thread_watchdog.items():
-                    if current_time - last_update > timeout:
-                        logger.error(f"⚠️ Thread '{thread_name}' appears to be stuck!")
+        return self.uplink.submit(timestamp, data, row_id)
 
-                time.sleep(30)
-            except Exception as e:
-                logger.error(f"Error in watchdog_loop: {e}")
-                time.sleep(30)
+    def save_thingspeak_backup(self, timestamp, data):
+        self.store.add(timestamp, data)
+        logger.debug("💾 Backup queued")
 
-    def monitor_loop(self):
-        first_cycle = True
+    def flush_thingspeak_backup(self):
+        if self.bulk_uploader:
+            page_size = self.bulk_uploader.chunk_size
+        else:
+            page_size = min(config.THINGSPEAK.FLUSH_PAGE_SIZE, self.uplink.free_slots())
+            if page_size <= 0:
+                return
+        flushed = 0
 
         while self.state['running']:
+            page = self.store.pending(page_size)
+            if not page:
+                break
+            if flushed == 0:
+                logger.info("📤 Flushing %s backup entries...", self.store.pending_count())
+
+            rows = []
+            rejected_ids = []
+            for row_id, timestamp, row in page:
+                data = {k: v for k, v in row.items() if v is not None}
+                if not self.has_any_valid_data(data) or not self.validate_sensor_data(data):
+                    logger.warning("Skipping invalid backup entry: %s", timestamp)
+                    rejected_ids.append(row_id)
+                else:
+                    rows.append((row_id, timestamp, data))
+            self.store.mark_rejected(rejected_ids)
+
+            if not self.bulk_uploader:
+                # Replay through the uplink worker; it marks each row sent on success
+                for row_id, timestamp, data in rows[:self.uplink.free_slots()]:
+                    self.uplink.submit(timestamp, data, row_id)
+                return
+
+            sent_ids = self.bulk_uploader.upload(rows)
+            self.store.mark_sent(sent_ids)
+            flushed += len(sent_ids)
+            if len(sent_ids) < len(rows):
+                logger.info("💾 %s entries remain in backup", self.store.pending_count())
+                return
+
+        if flushed:
+            logger.info("✅ All backup data sent to ThingSpeak")
+
+    def upload_row(self):
+        return {
+            'temperature': self.get_average(self.history['temp']),
+            'ph': self.get_average(self.history['ph']),
+            'ec': self.get_average(self.history['ec']),
+            'nitrogen': self.get_average(self.history['nitrogen']),
+            'phosphorus': self.get_average(self.history['phosphorus']),
+            'turbidity': self.get_turbidity_ratio(),
+            'quality_score': self.state.get('last_status_full', {}).get('score', 0),
+            'quality_status': self.state.get('last_status_full', {}).get('overall', 'GOOD')
+        }
+
+    def thingspeak_tick(self):
+        current_time = self.clock.time()
+        data = self.upload_row()
+
+        retry_in = None
+        if self.has_any_valid_data(data):
+            due = True
+            if self.reporter:
+                points = self.reporter.take_points()
+                if points and self.bulk_uploader:
+                    # Timestamped turning points go out with the backlog flush below
+                    for stamp, values in points:
+                        self.store.add(datetime.fromtimestamp(stamp).strftime("%Y-%m-%d %H:%M:%S"), values)
+                    self.store.commit()
+                    self.reporter.mark_points_sent(points)
+                due = self.reporter.due(current_time, data)
+
+            timestamp = datetime.fromtimestamp(current_time).strftime("%Y-%m-%d %H:%M:%S")
+            # A bulk POST and an /update in the same tick would trip the channel's
+            # rate limit: with rows to flush, the current one joins the bulk payload
+            in_bulk = due and self.bulk_uploader is not None and self.store.pending_count() > 0
+            if in_bulk:
+                self.store.add(timestamp, data)
+                self.store.commit()
+            start = time.perf_counter()
             try:
-                rs485_data = self.read_rs485_sensor()
-                ds18b20_temp = self.read_ds18b20_temp()
-
-                if not rs485_data:
-                    if first_cycle:
-                        print("\n" + "="*60)
-                        print(f"  POND MONITORING REPORT - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                        print("="*60)
-                        print("\n❌ ERROR: Failed to read from RS485 sensor. Check wiring and power.")
-                        print("Waiting for sensor data...")
-                        first_cycle = False
-                    time.sleep(config.get('TEMP_READ_INTERVAL', 15))
-                    continue
+                self.flush_thingspeak_backup()
+            except Exception as e:
+                logger.error("Error flushing backup: %s", e)
+            STAGE_SECONDS['backup_flush'].observe(time.perf_counter() - start)
+
+            if not due:
+                logger.debug("No change beyond the deadbands; upload skipped")
+                if self.sampling:
+                    retry_in = self.sampling.next_uplink_delay(sent=False)
+            elif in_bulk or self.send_to_thingspeak(data, timestamp):
+                self.state['thingspeak']['last_sent_time'] = current_time
+                if self.reporter:
+                    self.reporter.mark_sent(current_time, data)
+                if self.sampling:
+                    retry_in = self.sampling.next_uplink_delay()
+            else:
+                retry_in = 5
+        else:
+            logger.debug("Waiting for valid sensor data...")
+            retry_in = 5
+
+        self.store.commit()
+        if current_time - self.state['thingspeak']['last_prune'] > 86400:
+            self.state['thingspeak']['last_prune'] = current_time
+            self.store.prune(config.THINGSPEAK.RETENTION_DAYS, config.HISTORY)
+            self.sms.outbox.prune(config.SMS.RETENTION_DAYS, current_time)
+        return retry_in
+
+    def sample_sensors(self):
+        rs485_data = self.read_rs485_sensor()
+        return SensorSample(
+            timestamp=self.clock.time(),
+            rs485=MappingProxyType(rs485_data),
+            ds18b20_temp=self.read_ds18b20_temp(),
+            turbidity=self.read_turbidity()
+        )
+
+    def ingest(self, sample):
+        self.update_historical_data(sample)
+
+    def evaluate(self, sample):
+        self.cycle_count += 1
+        return CycleSnapshot(
+            cycle=self.cycle_count,
+            sample=sample,
+            status=freeze_status(self.get_water_quality_status())
+        )
+
+    def publish(self, snapshot):
+        status = snapshot.status
+        self.last_snapshot = snapshot
+        self.state['last_status_full'] = status
+        self.state['indicators']['last_status'] = status['overall']
+        suspect = bool(self.filters and self.filters.last_outliers)
+        if self.sampling and self.sampling.observe(status, suspect):
+            # Leaving the steady state: report now, not at the slow uplink rate
+            self.scheduler.expedite('thingspeak')
+        if self.reporter:
+            self.reporter.observe(snapshot.sample.timestamp, self.upload_row())
+
+        self.dashboard.publish(self.dashboard_payload(snapshot))
+        self.store.record(snapshot.sample.timestamp, self.history_values(snapshot))
+        self.report_cycle(snapshot)
+        self.handle_critical_state(status)
+        self.update_indicators(status)
+
+    def run_cycle(self):
+        start = time.perf_counter()
+        sample = self.sample_sensors()
+        if not sample.valid:
+            return None
+        sample = self.filter_sample(sample)
+        self.ingest(sample)
+        snapshot = self.evaluate(sample)
+        self.publish(snapshot)
+        STAGE_SECONDS['cycle'].observe(time.perf_counter() - start)
+        return snapshot
+
+    def history_values(self, snapshot):
+        sample = snapshot.sample
+        rs485 = sample.rs485
+        return {
+            'temperature': self.sample_temperature(sample),
+            'ph': rs485.get('ph'),
+            'ec': rs485.get('ec'),
+            'nitrogen': rs485.get('nitrogen'),
+            'phosphorus': rs485.get('phosphorus'),
+            'turbidity': None if sample.turbidity is None else float(sample.turbidity),
+            'quality_score': float(snapshot.status['score'])
+        }
 
-                first_cycle = False
-                self.update_historical_data(rs485_data, ds18b20_temp)
-                status = self.get_water_quality_status(rs485_data, ds18b20_temp)
+    def dashboard_payload(self, snapshot):
+        status = snapshot.status
+        averages = self.get_averages()
+        if averages['turbidity'] is not None:
+            averages['turbidity'] *= 100
+        return {
+            'last_update': datetime.fromtimestamp(snapshot.sample.timestamp).strftime('%H:%M:%S'),
+            'cycle': snapshot.cycle,
+            'sensor_readings': {k: round(v, 2) if v is not None else None for k, v in averages.items()},
+            'status': {
+                'overall': status['overall'],
+                'score': status['score'],
+                'alerts': list(status['alerts']),
+                'recommendations': list(status['recommendations']),
+                'trends': dict(status['trends'])
+            },
+            'historical_data': {'temp_history': [round(v, 2) for v in self.history['temp']]},
+            'pump': {'mode': self.state['pump']['mode'], 'running': self.state['pump']['is_running']},
+            'sensor_health': {k: round(v) for k, v in self.filters.health.scores.items()} if self.filters else None,
+            'system_status': 'Running'
+        }
 
-                self.state['last_status_full'] = status
-                self.state['indicators']['last_status'] = status['overall']
+    def cycle_report(self, snapshot):
+        # Everything the per-cycle report shows, computed once
+        sample = snapshot.sample
+        status = snapshot.status
+        rs485 = sample.rs485
+        rs485_state = self.state['rs485']
+        averages = self.get_averages()
+        if not self.history['turbidity']:
+            averages['turbidity'] = None
+        uplink = self.uplink.stats()
+        sms = self.sms.stats()
+        return {
+            'cycle': snapshot.cycle,
+            'readings': {
+                'ds18b20_temp': sample.ds18b20_temp,
+                'rs485_temp': rs485.get('temperature'),
+                'turbidity': sample.turbidity,
+                'ph': rs485.get('ph'),
+                'ec': rs485.get('ec'),
+                'nitrogen': rs485.get('nitrogen'),
+                'phosphorus': rs485.get('phosphorus'),
+                'potassium': rs485.get('potassium')
+            },
+            'bus': {
+                'time_ms': None if rs485_state['last_bus_time'] is None else round(rs485_state['last_bus_time'] * 1000, 1),
+                'mode': rs485_state['last_mode'],
+                'fallback': rs485_state['fallback_registers']
+            },
+            'averages': averages,
+            'trends': dict(status['trends']),
+            'status': status['overall'],
+            'score': status['score'],
+            'alerts': list(status['alerts']),
+            'recommendations': list(status['recommendations']),
+            'uplink': {key: uplink[key] for key in ('queue_depth', 'sent', 'retries', 'failed', 'avg_latency')},
+            'network': {'online': self.network.online, 'probe': f"{self.network.host}:{self.network.port}"},
+            'sms': {key: sms[key] for key in ('modem_ready', 'pending', 'sent', 'failed', 'deduplicated')},
+            'filters': self.filters.stats() if self.filters else None,
+            'ds18b20_probes': self.ds18b20.snapshot() if self.ds18b20 else None,
+            'sampling': self.sampling.stats() if self.sampling else None,
+            'reporting': self.reporter.stats() if self.reporter else None
+        }
 
+    def report_cycle(self, snapshot):
+        report = self.cycle_report(snapshot)
+        if config.LOGGING.MODE == "structured":
+            logger.info("Cycle %d: %s (score %d)", snapshot.cycle, report['status'], report['score'],
+                        extra={'event': 'cycle', 'fields': report})
+        else:
+            self.print_report(report)
+
+    def print_report(self, report):
+        def show(label, value, spec, unit=""):
+            print(f"{label:<19}{value:{spec}}{unit}" if value is not None else f"{label:<19}N/A")
+
+        readings = report['readings']
+        averages = report['averages']
+        lines = ["\n" + "="*60,
+                 f"  POND MONITORING REPORT - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                 "="*60, "\n--- SENSOR READINGS ---"]
+        print("\n".join(lines))
+        show("DS18B20 Temp:", readings['ds18b20_temp'], ".1f", "°C")
+        show("RS485 Temp:", readings['rs485_temp'], ".1f", "°C")
+        show("Combined Temp:", averages['temperature'], ".1f", "°C")
+        turbidity = readings['turbidity']
+        show("Turbidity:", None if turbidity is None else ('TURBID' if turbidity else 'CLEAR'), "s")
+        bus = report['bus']
+        print(f"RS485 Bus Time:    {bus['time_ms']:.0f} ms ({bus['mode']}, {bus['fallback']} fallback)"
+              if bus['time_ms'] is not None else "RS485 Bus Time:    N/A")
+
+        print("\n--- RS485 PROBE DATA (UNITS: mg/kg, μS/cm) ---")
+        show("pH:", readings['ph'], ".1f")
+        show("EC:", readings['ec'], ".0f", " μS/cm")
+        show("Nitrogen (N):", readings['nitrogen'], ".1f", " mg/kg")
+        show("Phosphorus (P):", readings['phosphorus'], ".1f", " mg/kg")
+        show("Potassium (K):", readings['potassium'], ".0f", " mg/kg")
+
+        print("\n--- HISTORICAL AVERAGES ---")
+        show("Avg Temp:", averages['temperature'], ".1f", "°C")
+        show("Avg pH:", averages['ph'], ".1f")
+        show("Avg EC:", averages['ec'], ".0f", " μS/cm")
+        show("Avg Nitrogen:", averages['nitrogen'], ".1f", " mg/kg")
+        show("Avg Phosphorus:", averages['phosphorus'], ".1f", " mg/kg")
+        show("Turbidity Ratio:", averages['turbidity'], ".0%")
+
+        trends = report['trends']
+        print("\n--- TRENDS ---")
+        print(f"Temperature Trend:  {trends.get('temperature', 'STABLE')}")
+        print(f"pH Trend:          {trends.get('ph', 'STABLE')}")
+        print(f"Nitrogen Trend:    {trends.get('nitrogen', 'STABLE')}")
+        print(f"Phosphorus Trend:  {trends.get('phosphorus', 'STABLE')}")
+
+        print("\n--- SYSTEM ASSESSMENT ---")
+        print(f"Overall Status:    {report['status']} (Score: {report['score']}/100)")
+        if report['alerts']:
+            print("Alerts Triggered:\n" + "\n".join(f"  - {alert}" for alert in report['alerts']))
+        if report['recommendations']:
+            print("Recommendations:\n" + "\n".join(f"  - {rec}" for rec in report['recommendations']))
+
+        uplink = report['uplink']
+        latency = f"{uplink['avg_latency'] * 1000:.0f} ms" if uplink['avg_latency'] is not None else "N/A"
+        print(f"Uplink:            queue {uplink['queue_depth']}, sent {uplink['sent']}, "
+              f"retries {uplink['retries']}, failed {uplink['failed']}, latency {latency}")
+        network = report['network']
+        print(f"Network:           {'ONLINE' if network['online'] else 'OFFLINE'} (probe {network['probe']})")
+        sms = report['sms']
+        print(f"SMS:               {'READY' if sms['modem_ready'] else 'NOT READY'}, pending {sms['pending']}, "
+              f"sent {sms['sent']}, failed {sms['failed']}, suppressed {sms['deduplicated']}")
+        sampling = report['sampling']
+        if sampling:
+            print(f"Sampling:          {sampling['mode'].upper()}, read every {sampling['sample']['interval']}s, "
+                  f"upload every {sampling['uplink']['interval']}s")
+        reporting = report['reporting']
+        if reporting:
+            print(f"Reporting:         {reporting['reports']} uploads, {reporting['suppressed']} skipped, "
+                  f"{reporting['coalesced']} turning points")
+
+    def monitor_tick(self):
+        snapshot = self.run_cycle()
+        if snapshot is None and self.awaiting_first_sample:
+            if config.LOGGING.MODE == "structured":
+                logger.error("❌ Failed to read from RS485 sensor. Check wiring and power.")
+            else:
                 print("\n" + "="*60)
                 print(f"  POND MONITORING REPORT - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
                 print("="*60)
-
-                print("\n--- SENSOR READINGS ---")
-                print(f"DS18B20 Temp:      {ds18b20_temp:.1f}°C" if ds18b20_temp is not None else "DS18B20 Temp:      N/A")
-                print(f"RS485 Temp:        {rs485_data.get('temperature'):.1f}°C" if rs485_data.get('temperature') is not None else "RS485 Temp:        N/A")
-                print(f"Combined Temp:     {self.get_average(self.history['temp']):.1f}°C" if self.get_average(self.history['temp']) is not None else "Combined Temp:     N/A")
-
-                turbidity = self.read_turbidity()
-                print(f"Turbidity:         {'TURBID' if turbidity else 'CLEAR'}" if turbidity is not None else "Turbidity:         N/A")
-
-                print("\n--- RS485 PROBE DATA (UNITS: mg/kg, μS/cm) ---")
-                print(f"pH:                {rs485_data.get('ph'):.1f}" if rs485_data.get('ph') is not None else "pH:                N/A")
-                print(f"EC:                {rs485_data.get('ec'):.0f} μS/cm" if rs485_data.get('ec') is not None else "EC:                N/A")
-                print(f"Nitrogen (N):      {rs485_data.get('nitrogen'):.1f} mg/kg" if rs485_data.get('nitrogen') is not None else "Nitrogen (N):      N/A")
-                print(f"Phosphorus (P):    {rs485_data.get('phosphorus'):.1f} mg/kg" if rs485_data.get('phosphorus') is not None else "Phosphorus (P):    N/A")
-                print(f"Potassium (K):     {rs485_data.get('potassium'):.0f} mg/kg" if rs485_data.get('potassium') is not None else "Potassium (K):     N/A")
-
-                print("\n--- HISTORICAL AVERAGES ---")
-                print(f"Avg Temp:          {self.get_average(self.history['temp']):.1f}°C" if self.get_average(self.history['temp']) is not None else "Avg Temp:          N/A")
-                print(f"Avg pH:            {self.get_average(self.history['ph']):.1f}" if self.get_average(self.history['ph']) is not None else "Avg pH:            N/A")
-                print(f"Avg EC:            {self.get_average(self.history['ec']):.0f} μS/cm" if self.get_average(self.history['ec']) is not None else "Avg EC:            N/A")
-                print(f"Avg Nitrogen:      {self.get_average(self.history['nitrogen']):.1f} mg/kg" if self.get_average(self.history['nitrogen']) is not None else "Avg Nitrogen:      N/A")
-                print(f"Avg Phosphorus:    {self.get_average(self.history['phosphorus']):.1f} mg/kg" if self.get_average(self.history['phosphorus']) is not None else "Avg Phosphorus:    N/A")
-                turbidity_ratio = sum(self.history['turbidity']) / len(self.history['turbidity']) if self.history['turbidity'] else 0
-                print(f"Turbidity Ratio:   {turbidity_ratio:.0%}" if self.history['turbidity'] else "Turbidity Ratio:   N/A")
-
-                print("\n--- TRENDS ---")
-                print(f"Temperature Trend:  {status['trends'].get('temperature', 'STABLE')}")
-                print(f"pH Trend:          {status['trends'].get('ph', 'STABLE')}")
-                print(f"Nitrogen Trend:    {status['trends'].get('nitrogen', 'STABLE')}")
-                print(f"Phosphorus Trend:  {status['trends'].get('phosphorus', 'STABLE')}")
-
-                print("\n--- SYSTEM ASSESSMENT ---")
-                print(f"Overall Status:    {status['overall']} (Score: {status['score']}/100)")
-                if status['alerts']:
-                    print("Alerts Triggered:")
-                    for alert in status['alerts']:
-                        print(f"  - {alert}")
-                if status['recommendations']:
-                    print("Recommendations:")
-                    for rec in status['recommendations']:
-                        print(f"  - {rec}")
-
-                self.handle_critical_state(status)
-                self.update_indicators(status)
-
-                self.thread_watchdog['monitor'] = time.time()
-                time.sleep(config.get('TEMP_READ_INTERVAL', 15))
-                
-            except KeyboardInterrupt:
-                self.state['running'] = False
-                break
-            except Exception as e:
-                logger.error(f"Error in monitor_loop: {e}")
-                self.thread_watchdog['monitor'] = time.time()
-                time.sleep(5)
+                print("\n❌ ERROR: Failed to read from RS485 sensor. Check wiring and power.")
+                print("Waiting for sensor data...")
+        self.awaiting_first_sample = False
+        # One write per cycle for everything logged since the last one
+        if EVENT_LOG:
+            EVENT_LOG.flush()
+        if self.sampling and snapshot is not None:
+            return self.sampling.next_sample_delay()
 
     def cleanup(self):
         logger.info("Starting cleanup...")
         self.state['running'] = False
-
-        for t in [self.monitor_thread, self.display_thread, self.pump_thread,
-                 self.thingspeak_thread, self.watchdog_thread]:
-            if t.is_alive():
-                try:
-                    t.join(timeout=3)
-                except:
-                    pass
+        self.watchdog.stop()
+        self.scheduler.stop()
+        try:
+            self.save_checkpoint()
+        except OSError as e:
+            logger.error("Error saving checkpoint: %s", e)
 
         self.set_leds(0, 0, 0)
         if self.pwm_buzzer:
@@ -1309,9 +4906,11 @@ class SmartFishPondMonitor:
             except:
                 pass
 
-        GPIO.output(config.get('GPIO', {}).get('PUMP_PIN', 16), GPIO.HIGH)
+        self.gpio.output(config.GPIO.PUMP_PIN, self.gpio.HIGH)
         logger.info("Pump turned OFF.")
 
+        self.sms.stop()
+        self.sms.outbox.close()
         if self.gsm:
             try:
                 self.gsm.close()
@@ -1319,8 +4918,393 @@ class SmartFishPondMonitor:
             except:
                 pass
 
-        GPIO.cleanup()
+        self.dashboard.close()
+        self.uplink.stop()
+        self.network.stop()
+        if self.ds18b20:
+            self.ds18b20.stop()
+        self.store.close()
+
+        self.gpio.cleanup()
         logger.info("✅ System cleanup complete")
+        if EVENT_LOG:
+            EVENT_LOG.flush()
+
+# ============================================================================
+# FLEET MODE
+# ============================================================================
+
+def pond_store_path(base, name):
+    path = Path(base)
+    return str(path.with_name(f"{path.stem}.{name}{path.suffix}"))
+
+def modbus_frame_gap(baudrate):
+    # RTU frames need 3.5 character times (11 bits each) of bus silence
+    # between them; the spec fixes it at 1.75 ms above 19200 baud
+    return 0.00175 if baudrate > 19200 else 3.5 * 11 / baudrate
+
+# Per-pond read error counters, filled in by FleetMonitor
+FLEET_READ_ERRORS = {}
+
+class ModbusBus:
+    """One RS485 port shared by several probes, read back to back.
+
+    Frames are spaced by the Modbus silent interval and no more. A probe
+    that stops answering is skipped for 1, 3, 7 ... rounds (up to
+    max_backoff), so a dead slave costs an occasional timeout instead of
+    one every round; it is not retried register by register either.
+    poll() may run on a port worker thread, so it only notes read times
+    and failures; record_metrics() publishes them from the polling thread.
+    """
+
+    def __init__(self, port, probes, baudrate=9600, max_backoff=8, clock=time):
+        self.port = port
+        self.probes = list(probes)
+        self.gap = modbus_frame_gap(baudrate)
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.block_read = {name: True for name, _ in self.probes}
+        self.failures = {name: 0 for name, _ in self.probes}
+        self.skip = {name: 0 for name, _ in self.probes}
+        self.last_frame = None
+        self.rounds = 0
+        self.transactions = 0
+        self.last_round_time = None
+        self.read_times = []
+        self.failed = []
+
+    def poll(self):
+        # {pond name: readings} for every probe that answered this round
+        results = {}
+        round_start = time.perf_counter()
+        # Rounds are seconds apart; only frames within a round need spacing
+        self.last_frame = None
+        for name, instrument in self.probes:
+            if self.skip[name]:
+                self.skip[name] -= 1
+                continue
+            if self.last_frame is not None:
+                wait = self.last_frame + self.gap - time.perf_counter()
+                if wait > 0:
+                    self.clock.sleep(wait)
+            start = time.perf_counter()
+            try:
+                values, _, self.block_read[name] = read_probe(instrument, self.block_read[name],
+                                                              self.clock.sleep, retries=1, fallback=False)
+            except Exception as e:
+                logger.debug("RS485 %s slave '%s' read failed: %s", self.port, name, e)
+                values = {}
+            self.last_frame = time.perf_counter()
+            self.transactions += 1
+            self.read_times.append(self.last_frame - start)
+
+            if any(value is not None for value in values.values()):
+                self.failures[name] = 0
+                results[name] = probe_data(values)
+            else:
+                failures = self.failures[name] = self.failures[name] + 1
+                self.skip[name] = min(self.max_backoff, 2 ** (failures - 1) - 1)
+                self.failed.append(name)
+                if failures == 1 or self.skip[name] == self.max_backoff:
+                    logger.warning("⚠️ Pond '%s' not answering on %s; skipping it for %s round(s)",
+                                   name, self.port, self.skip[name])
+        self.rounds += 1
+        self.last_round_time = time.perf_counter() - round_start
+        return results
+
+    def record_metrics(self):
+        for seconds in self.read_times:
+            STAGE_SECONDS['modbus_read'].observe(seconds)
+        for name in self.failed:
+            FLEET_READ_ERRORS.get(name, SENSOR_ERRORS['rs485']).inc()
+        self.read_times, self.failed = [], []
+
+class BusScheduler:
+    """Reads every probe in the fleet once per round, with the ports in parallel.
+
+    Probes that share a port are serialised on that port's ModbusBus. Each
+    port gets its own worker thread, so a round takes roughly as long as
+    the busiest port. Read metrics are recorded here after the round.
+    """
+
+    def __init__(self, buses):
+        self.buses = list(buses)
+        self.executor = None
+        if len(self.buses) > 1:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.buses), thread_name_prefix="RS485")
+
+    def poll(self):
+        results = {}
+        if self.executor is None:
+            for bus in self.buses:
+                results.update(bus.poll())
+        else:
+            for bus_results in self.executor.map(ModbusBus.poll, self.buses):
+                results.update(bus_results)
+        # Metrics have one writer: this thread, once every port is done
+        for bus in self.buses:
+            bus.record_metrics()
+        return results
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=True)
+
+class Pond:
+    """History windows, status and alert state of one pond in the fleet."""
+
+    WINDOWS = (('temperature', 'temp'), ('ph', 'ph'), ('ec', 'ec'),
+               ('nitrogen', 'nitrogen'), ('phosphorus', 'phosphorus'))
+
+    def __init__(self, spec, history_size, store):
+        self.spec = spec
+        self.name = spec.name
+        self.store = store
+        self.history = {key: RollingWindow(history_size) for _, key in self.WINDOWS}
+        self.filters = FilterStage.from_config(config.FILTERS, QUALITY_RULES.sensor_ranges)
+        self.reporter = ExceptionReporter.from_config(config.REPORTING)
+        self.cycle_count = 0
+        self.last_update = None
+        self.reading = {}
+        self.status = None
+        self.critical_since = None
+        self.alert_sent = False
+
+    def ingest(self, timestamp, data):
+        self.cycle_count += 1
+        self.last_update = timestamp
+        if self.filters:
+            data, _, temperature = self.filters.process(timestamp, data)
+            data['temperature'] = temperature
+        self.reading = data
+        for param, key in self.WINDOWS:
+            value = data.get(param)
+            if value is not None:
+                self.history[key].append(value)
+
+    def averages(self):
+        averages = {param: self.history[key].mean for param, key in self.WINDOWS}
+        averages['turbidity'] = None
+        return averages
+
+    def evaluate(self, rules):
+        status = rules.evaluate(self.averages())
+        for param, key in self.WINDOWS:
+            if param != 'ec':
+                status['trends'][param] = window_trend(self.history[key])
+        self.status = freeze_status(status)
+        return self.status
+
+    def upload_row(self):
+        return dict(self.averages(), quality_score=self.status['score'], quality_status=self.status['overall'])
+
+    def summary(self):
+        status = self.status
+        return {
+            'name': self.name,
+            'port': self.spec.port,
+            'slave_id': self.spec.slave_id,
+            'cycle': self.cycle_count,
+            'last_update': self.last_update,
+            'sensor_readings': {k: round(v, 2) if v is not None else None for k, v in self.averages().items()},
+            'status': {
+                'overall': status['overall'],
+                'score': status['score'],
+                'alerts': list(status['alerts']),
+                'trends': dict(status['trends'])
+            } if status else None,
+            'critical_since': self.critical_since,
+            'sensor_health': {k: round(v) for k, v in self.filters.health.scores.items()
+                              if k != 'ds18b20'} if self.filters else None
+        }
+
+class FleetMonitor:
+    """One process supervising the RS485 probes of several ponds.
+
+    Each round the BusScheduler reads every probe, then every pond folds its
+    reading into its own history, is scored by the shared rules and feeds
+    its own TelemetryStore. Uplinks are batched: every SEND_INTERVAL each
+    pond queues one averaged row, and each pond's pending rows go out as one
+    bulk update to its channel, back to back over one keep-alive session.
+    Ponds that stay critical raise SMS alerts through one shared outbox.
+    The Pi's own pump, LEDs and LCD are not driven in fleet mode.
+    """
+
+    def __init__(self, start_threads=True, hardware=None, session=None):
+        self.hw = hardware or PiHardware()
+        self.clock = self.hw.clock
+        configure_logging(config.LOGGING)
+        fleet = config.FLEET
+        specs = pond_specs(fleet.PONDS, config.SENSORS.RS485_PORT)
+        if not specs:
+            raise ConfigError(["FLEET.PONDS: no ponds configured"])
+
+        self.rules = QUALITY_RULES
+        self.ponds = {}
+        buses = {}
+        for spec in specs:
+            store = TelemetryStore(pond_store_path(config.THINGSPEAK.BACKUP_DB, spec.name))
+            self.ponds[spec.name] = Pond(spec, config.HISTORY_SIZE, store)
+            FLEET_READ_ERRORS[spec.name] = METRICS.counter(
+                "pond_fleet_read_errors_total", "Fleet probe reads that got no answer", pond=spec.name)
+            try:
+                instrument = self.hw.open_modbus(spec.port, spec.slave_id, fleet.BAUDRATE)
+            except Exception as e:
+                logger.error("❌ Pond '%s': cannot open %s: %s", spec.name, spec.port, e)
+                continue
+            buses.setdefault(spec.port, []).append((spec.name, instrument))
+        self.buses = [ModbusBus(port, probes, fleet.BAUDRATE, fleet.MAX_BACKOFF_ROUNDS, self.clock)
+                      for port, probes in buses.items()]
+        self.bus = BusScheduler(self.buses)
+        logger.info("✅ Fleet mode: %s pond(s) on %s RS485 port(s)", len(specs), len(self.buses))
+
+        self.session = session or requests.Session()
+        ts = config.THINGSPEAK.to_dict()
+        self.uploaders = {}
+        for spec in specs:
+            uploader = ThingSpeakBulkUploader.from_config(dict(ts, API_KEY=spec.api_key, CHANNEL_ID=spec.channel_id),
+                                                          session=self.session)
+            if uploader:
+                self.uploaders[spec.name] = uploader
+            else:
+                logger.warning("⚠️ Pond '%s' has no ThingSpeak channel; keeping its data locally", spec.name)
+
+        try:
+            self.gsm = self.hw.open_gsm(config.SENSORS.GSM_PORT, config.SENSORS.GSM_BAUDRATE)
+        except Exception as e:
+            logger.error("❌ GSM initialization failed: %s", e)
+            self.gsm = None
+        self.sms = SmsDispatcher.from_config(config, self.gsm, SmsOutbox(config.THINGSPEAK.BACKUP_DB), self.clock)
+        self.network = NetworkMonitor.from_config(config.NETWORK)
+        self.rounds = 0
+        self.last_prune = 0
+
+        self.scheduler = Scheduler(self.clock)
+        self.scheduler.every(config.TEMP_READ_INTERVAL, self.poll_tick, name="fleet-poll", error_delay=5)
+        self.scheduler.every(config.THINGSPEAK.SEND_INTERVAL, self.uplink_tick, name="fleet-uplink",
+                             delay=5, error_delay=10, blocking=True)
+        self.register_metrics()
+
+        if start_threads:
+            self.network.start()
+            self.sms.start()
+            self.scheduler.start()
+
+    def register_metrics(self, registry=METRICS):
+        registry.counter("pond_fleet_rounds_total", "Completed fleet polling rounds", func=lambda: self.rounds)
+        for bus in self.buses:
+            registry.gauge("pond_fleet_bus_round_seconds", "Time the last round spent on each RS485 port",
+                           func=lambda bus=bus: bus.last_round_time, port=bus.port)
+        for name, pond in self.ponds.items():
+            registry.gauge("pond_fleet_quality_score", "Water quality score per pond",
+                           func=lambda pond=pond: pond.status['score'] if pond.status else None, pond=name)
+            registry.gauge("pond_fleet_quality_status", "Overall status per pond (0 GOOD, 1 WARNING, 2 CRITICAL)",
+                           func=lambda pond=pond: QUALITY_STATUS_CODES[pond.status['overall']] if pond.status else None,
+                           pond=name)
+            registry.gauge("pond_fleet_backlog_rows", "Rows per pond awaiting upload",
+                           func=pond.store.pending_count, pond=name)
+
+    def poll_tick(self):
+        start = time.perf_counter()
+        readings = self.bus.poll()
+        now = self.clock.time()
+        for name, data in readings.items():
+            pond = self.ponds[name]
+            pond.ingest(now, data)
+            status = pond.evaluate(self.rules)
+            values = {param: pond.reading.get(param) for param, _ in Pond.WINDOWS}
+            values['quality_score'] = float(status['score'])
+            pond.store.record(now, values)
+            if pond.reporter:
+                pond.reporter.observe(now, pond.upload_row())
+            self.check_critical(pond, now)
+        self.rounds += 1
+        STAGE_SECONDS['cycle'].observe(time.perf_counter() - start)
+        if EVENT_LOG:
+            EVENT_LOG.flush()
+
+    def check_critical(self, pond, now):
+        if pond.status['overall'] != 'CRITICAL':
+            if pond.critical_since is not None:
+                logger.info("✅ Pond '%s' recovered. Resetting critical state.", pond.name)
+            pond.critical_since = None
+            pond.alert_sent = False
+            return
+        if pond.critical_since is None:
+            pond.critical_since = now
+            logger.info("⚠️ Pond '%s' critical. Starting timer before SMS alert.", pond.name)
+        elif not pond.alert_sent and now - pond.critical_since > config.CRITICAL_DURATION:
+            logger.info("🚨 Pond '%s' critical condition sustained. Sending SMS alert.", pond.name)
+            key, message = sms_alert(pond.status, now, pond.name)
+            self.sms.submit(config.PHONE_NUMBERS, key, message)
+            pond.alert_sent = True
+
+    def uplink_tick(self):
+        now = self.clock.time()
+        timestamp = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+        for pond in self.ponds.values():
+            if pond.status is not None:
+                row = pond.upload_row()
+                due = True
+                if pond.reporter:
+                    points = pond.reporter.take_points()
+                    for stamp, values in points:
+                        pond.store.add(datetime.fromtimestamp(stamp).strftime("%Y-%m-%d %H:%M:%S"), values)
+                    pond.reporter.mark_points_sent(points)
+                    due = pond.reporter.due(now, row)
+                if due:
+                    pond.store.add(timestamp, row)
+                    if pond.reporter:
+                        pond.reporter.mark_sent(now, row)
+            pond.store.commit()
+
+        if self.network.online:
+            # One bulk update per pond channel; rows from offline spells ride along
+            for name, uploader in self.uploaders.items():
+                store = self.ponds[name].store
+                page = store.pending(uploader.chunk_size)
+                if not page:
+                    continue
+                start = time.perf_counter()
+                sent = uploader.upload(page)
+                STAGE_SECONDS['thingspeak_upload'].observe(time.perf_counter() - start)
+                store.mark_sent(sent)
+
+        if now - self.last_prune > 86400:
+            self.last_prune = now
+            for pond in self.ponds.values():
+                pond.store.prune(config.THINGSPEAK.RETENTION_DAYS, config.HISTORY)
+            self.sms.outbox.prune(config.SMS.RETENTION_DAYS, now)
+
+    def summary(self):
+        return {
+            'rounds': self.rounds,
+            'ponds': [pond.summary() for pond in self.ponds.values()],
+            'buses': [{'port': bus.port, 'ponds': [name for name, _ in bus.probes],
+                       'last_round_ms': round(bus.last_round_time * 1000, 1) if bus.last_round_time else None,
+                       'skipped': [name for name, skip in bus.skip.items() if skip]}
+                      for bus in self.buses]
+        }
+
+    def cleanup(self):
+        logger.info("Stopping fleet monitor...")
+        self.scheduler.stop()
+        self.bus.close()
+        self.sms.stop()
+        self.sms.outbox.close()
+        if self.gsm:
+            try:
+                self.gsm.close()
+            except Exception:
+                pass
+        self.network.stop()
+        for pond in self.ponds.values():
+            pond.store.commit()
+            pond.store.close()
+        self.session.close()
+        logger.info("✅ Fleet monitor stopped")
+        if EVENT_LOG:
+            EVENT_LOG.flush()
 
 # ============================================================================
 # FLASK WEB INTERFACE
@@ -1328,24 +5312,17 @@ class SmartFishPondMonitor:
 
 app = Flask(__name__)
 
-# Global variables for web interface
-monitoring_data = {
-    'last_update': None,
-    'sensor_readings': {},
-    'status': {},
-    'historical_data': {},
-    'trends': {},
-    'alerts': [],
-    'recommendations': [],
-    'system_status': 'Initializing...'
-}
+# Served until a monitor is attached and has published its first cycle
+idle_dashboard = SnapshotPublisher()
 
 monitor = None
+fleet = None
 monitoring_running = False
 
-@app.route('/')
-def index():
-    return render_template_string('''
+# Dashboard sources. DashboardAssets builds them once at startup into
+# content-hashed, pre-compressed responses; {dashboard.css} / {dashboard.js}
+# in the page are replaced with the hashed asset URLs.
+DASHBOARD_HTML = '''
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -1353,246 +5330,7 @@ def index():
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Smart Fish Pond Monitor</title>
     <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css">
-    <style>
-        :root {
-            --primary: #2563eb;
-            --success: #10b981;
-            --warning: #f59e0b;
-            --danger: #ef4444;
-            --dark: #1f2937;
-            --light: #f3f4f6;
-            --white: #ffffff;
-        }
-
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-        }
-
-        body {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            padding: 20px;
-            color: var(--dark);
-        }
-
-        .container {
-            max-width: 1400px;
-            margin: 0 auto;
-            background: var(--white);
-            border-radius: 20px;
-            box-shadow: 0 20px 60px rgba(0, 0, 0, 0.3);
-            overflow: hidden;
-        }
-
-        header {
-            background: linear-gradient(135deg, var(--primary) 0%, #1d4ed8 100%);
-            color: var(--white);
-            padding: 30px;
-            text-align: center;
-            position: relative;
-        }
-
-        h1 {
-            font-size: 2.5rem;
-            margin-bottom: 10px;
-        }
-
-        .subtitle {
-            font-size: 1.1rem;
-            opacity: 0.9;
-        }
-
-        .status-badge {
-            display: inline-block;
-            padding: 8px 16px;
-            border-radius: 20px;
-            font-weight: bold;
-            margin-top: 15px;
-        }
-
-        .status-good { background: var(--success); color: var(--white); }
-        .status-warning { background: var(--warning); color: var(--white); }
-        .status-critical { background: var(--danger); color: var(--white); }
-        .status-unknown { background: var(--dark); color: var(--white); }
-
-        .dashboard {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-            gap: 20px;
-            padding: 30px;
-        }
-
-        .card {
-            background: var(--white);
-            border-radius: 15px;
-            padding: 25px;
-            box-shadow: 0 10px 30px rgba(0, 0, 0, 0.1);
-            transition: transform 0.3s ease, box-shadow 0.3s ease;
-        }
-
-        .card:hover {
-            transform: translateY(-5px);
-            box-shadow: 0 15px 40px rgba(0, 0, 0, 0.15);
-        }
-
-        .card-header {
-            display: flex;
-            align-items: center;
-            margin-bottom: 20px;
-            padding-bottom: 15px;
-            border-bottom: 2px solid var(--light);
-        }
-
-        .card-header i {
-            font-size: 1.5rem;
-            margin-right: 12px;
-            color: var(--primary);
-        }
-
-        .card-title {
-            font-size: 1.3rem;
-            font-weight: 600;
-            color: var(--dark);
-        }
-
-        .sensor-value {
-            font-size: 2.5rem;
-            font-weight: bold;
-            margin: 15px 0;
-            color: var(--primary);
-        }
-
-        .sensor-unit {
-            font-size: 1rem;
-            color: #6b7280;
-            margin-left: 5px;
-        }
-
-        .sensor-status {
-            display: inline-block;
-            padding: 5px 12px;
-            border-radius: 20px;
-            font-size: 0.9rem;
-            font-weight: 500;
-        }
-
-        .status-normal { background: #dcfce7; color: #166534; }
-        .status-warning { background: #fef3c7; color: #92400e; }
-        .status-critical { background: #fee2e2; color: #b91c1c; }
-
-        .trend-indicator {
-            display: inline-flex;
-            align-items: center;
-            margin-left: 10px;
-            font-size: 0.9rem;
-        }
-
-        .trend-up { color: var(--danger); }
-        .trend-down { color: var(--success); }
-        .trend-stable { color: var(--warning); }
-
-        .alerts-section {
-            margin-top: 30px;
-        }
-
-        .alert-item {
-            background: var(--light);
-            border-left: 4px solid var(--danger);
-            padding: 15px;
-            margin-bottom: 10px;
-            border-radius: 8px;
-            display: flex;
-            align-items: center;
-        }
-
-        .alert-item i {
-            color: var(--danger);
-            margin-right: 10px;
-            font-size: 1.2rem;
-        }
-
-        .recommendations-section {
-            margin-top: 20px;
-        }
-
-        .recommendation-item {
-            background: #f0f9ff;
-            border-left: 4px solid var(--primary);
-            padding: 15px;
-            margin-bottom: 10px;
-            border-radius: 8px;
-            display: flex;
-            align-items: center;
-        }
-
-        .recommendation-item i {
-            color: var(--primary);
-            margin-right: 10px;
-            font-size: 1.2rem;
-        }
-
-        .system-info {
-            background: var(--light);
-            padding: 15px;
-            border-radius: 10px;
-            margin-top: 20px;
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }
-
-        .system-info-item {
-            display: flex;
-            align-items: center;
-        }
-
-        .system-info-item i {
-            margin-right: 8px;
-            color: var(--primary);
-        }
-
-        .last-update {
-            font-size: 0.9rem;
-            color: #6b7280;
-            margin-top: 10px;
-            text-align: center;
-        }
-
-        @media (max-width: 768px) {
-            .dashboard {
-                grid-template-columns: 1fr;
-            }
-            
-            h1 {
-                font-size: 2rem;
-            }
-            
-            .sensor-value {
-                font-size: 2rem;
-            }
-        }
-
-        .loading {
-            text-align: center;
-            padding: 50px;
-            color: #6b7280;
-        }
-
-        .loading i {
-            font-size: 3rem;
-            margin-bottom: 20px;
-            color: var(--primary);
-            animation: spin 2s linear infinite;
-        }
-
-        @keyframes spin {
-            0% { transform: rotate(0deg); }
-            100% { transform: rotate(360deg); }
-        }
-    </style>
+    <link rel="stylesheet" href="{dashboard.css}">
 </head>
 <body>
     <div class="container">
@@ -1634,211 +5372,732 @@ def index():
 
         <div class="last-update">
             <i class="fas fa-info-circle"></i>
-            Data refreshes every 5 seconds. Press Ctrl+C in terminal to stop monitoring.
+            Data updates live as each reading arrives. Press Ctrl+C in terminal to stop monitoring.
         </div>
     </div>
 
-    <script>
-        // Global variables
-        let monitoringData = null;
-        let intervalId = null;
-
-        // Function to update the dashboard
-        function updateDashboard() {
-            fetch('/api/data')
-                .then(response => response.json())
-                .then(data => {
-                    monitoringData = data;
-                    renderDashboard(data);
-                })
-                .catch(error => {
-                    console.error('Error fetching data:', error);
-                    document.getElementById('dashboard').innerHTML = `
-                        <div class="card">
-                            <div class="card-header">
-                                <i class="fas fa-exclamation-triangle"></i>
-                                <h2 class="card-title">Connection Error</h2>
-                            </div>
-                            <p>Failed to connect to monitoring system. Please check the terminal.</p>
-                        </div>
-                    `;
-                });
-        }
+    <script src="{dashboard.js}"></script>
+</body>
+</html>
+'''
+
+DASHBOARD_CSS = '''
+:root {
+    --primary: #2563eb;
+    --success: #10b981;
+    --warning: #f59e0b;
+    --danger: #ef4444;
+    --dark: #1f2937;
+    --light: #f3f4f6;
+    --white: #ffffff;
+}
 
-        // Function to render the dashboard
-        function renderDashboard(data) {
-            if (!data || !data.status) {
-                return;
-            }
+* {
+    margin: 0;
+    padding: 0;
+    box-sizing: border-box;
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+}
 
-            const status = data.status;
-            const readings = data.sensor_readings;
-            const trends = status.trends || {};
-            const alerts = status.alerts || [];
-            const recommendations = status.recommendations || [];
-
-            // Update status badge
-            const statusBadge = document.getElementById('status-badge');
-            statusBadge.className = `status-badge status-${status.overall.toLowerCase()}`;
-            statusBadge.textContent = status.overall.toUpperCase();
-
-            // Create dashboard cards
-            let dashboardHTML = '';
-
-            // Temperature card
-            dashboardHTML += createSensorCard(
-                'Temperature',
-                'fas fa-thermometer-half',
-                readings.temperature,
-                '°C',
-                status.overall,
-                trends.temperature
-            );
-
-            // pH card
-            dashboardHTML += createSensorCard(
-                'pH Level',
-                'fas fa-flask',
-                readings.ph,
-                '',
-                status.overall,
-                trends.ph
-            );
-
-            // EC card
-            dashboardHTML += createSensorCard(
-                'Electrical Conductivity',
-                'fas fa-bolt',
-                readings.ec,
-                ' μS/cm',
-                status.overall,
-                null
-            );
-
-            // Nitrogen card
-            dashboardHTML += createSensorCard(
-                'Nitrogen',
-                'fas fa-atom',
-                readings.nitrogen,
-                ' mg/kg',
-                status.overall,
-                trends.nitrogen
-            );
-
-            // Phosphorus card
-            dashboardHTML += createSensorCard(
-                'Phosphorus',
-                'fas fa-microscope',
-                readings.phosphorus,
-                ' mg/kg',
-                status.overall,
-                trends.phosphorus
-            );
-
-            // Turbidity card
-            dashboardHTML += createSensorCard(
-                'Turbidity',
-                'fas fa-water',
-                readings.turbidity,
-                ' %',
-                status.overall,
-                null
-            );
-
-            document.getElementById('dashboard').innerHTML = dashboardHTML;
-
-            // Update alerts
-            const alertsSection = document.getElementById('alerts-section');
-            if (alerts.length > 0) {
-                let alertsHTML = '<h3><i class="fas fa-exclamation-circle"></i> Active Alerts</h3>';
-                alerts.forEach(alert => {
-                    alertsHTML += `
-                        <div class="alert-item">
-                            <i class="fas fa-exclamation-triangle"></i>
-                            <span>${alert}</span>
-                        </div>
-                    `;
-                });
-                alertsSection.innerHTML = alertsHTML;
-            } else {
-                alertsSection.innerHTML = '<h3><i class="fas fa-check-circle"></i> No Active Alerts</h3>';
-            }
+body {
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    min-height: 100vh;
+    padding: 20px;
+    color: var(--dark);
+}
 
-            // Update recommendations
-            const recommendationsSection = document.getElementById('recommendations-section');
-            if (recommendations.length > 0) {
-                let recommendationsHTML = '<h3><i class="fas fa-lightbulb"></i> Recommendations</h3>';
-                recommendations.forEach(rec => {
-                    recommendationsHTML += `
-                        <div class="recommendation-item">
-                            <i class="fas fa-hand-point-right"></i>
-                            <span>${rec}</span>
-                        </div>
-                    `;
-                });
-                recommendationsSection.innerHTML = recommendationsHTML;
-            } else {
-                recommendationsSection.innerHTML = '<h3><i class="fas fa-thumbs-up"></i> No Recommendations</h3>';
-            }
+.container {
+    max-width: 1400px;
+    margin: 0 auto;
+    background: var(--white);
+    border-radius: 20px;
+    box-shadow: 0 20px 60px rgba(0, 0, 0, 0.3);
+    overflow: hidden;
+}
+
+header {
+    background: linear-gradient(135deg, var(--primary) 0%, #1d4ed8 100%);
+    color: var(--white);
+    padding: 30px;
+    text-align: center;
+    position: relative;
+}
+
+h1 {
+    font-size: 2.5rem;
+    margin-bottom: 10px;
+}
+
+.subtitle {
+    font-size: 1.1rem;
+    opacity: 0.9;
+}
+
+.status-badge {
+    display: inline-block;
+    padding: 8px 16px;
+    border-radius: 20px;
+    font-weight: bold;
+    margin-top: 15px;
+}
+
+.status-good { background: var(--success); color: var(--white); }
+.status-warning { background: var(--warning); color: var(--white); }
+.status-critical { background: var(--danger); color: var(--white); }
+.status-unknown { background: var(--dark); color: var(--white); }
+
+.dashboard {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
+    gap: 20px;
+    padding: 30px;
+}
+
+.card {
+    background: var(--white);
+    border-radius: 15px;
+    padding: 25px;
+    box-shadow: 0 10px 30px rgba(0, 0, 0, 0.1);
+    transition: transform 0.3s ease, box-shadow 0.3s ease;
+}
+
+.card:hover {
+    transform: translateY(-5px);
+    box-shadow: 0 15px 40px rgba(0, 0, 0, 0.15);
+}
+
+.card-header {
+    display: flex;
+    align-items: center;
+    margin-bottom: 20px;
+    padding-bottom: 15px;
+    border-bottom: 2px solid var(--light);
+}
+
+.card-header i {
+    font-size: 1.5rem;
+    margin-right: 12px;
+    color: var(--primary);
+}
+
+.card-title {
+    font-size: 1.3rem;
+    font-weight: 600;
+    color: var(--dark);
+}
+
+.sensor-value {
+    font-size: 2.5rem;
+    font-weight: bold;
+    margin: 15px 0;
+    color: var(--primary);
+}
+
+.sensor-unit {
+    font-size: 1rem;
+    color: #6b7280;
+    margin-left: 5px;
+}
+
+.sensor-status {
+    display: inline-block;
+    padding: 5px 12px;
+    border-radius: 20px;
+    font-size: 0.9rem;
+    font-weight: 500;
+}
+
+.status-normal { background: #dcfce7; color: #166534; }
+.status-warning { background: #fef3c7; color: #92400e; }
+.status-critical { background: #fee2e2; color: #b91c1c; }
+
+.trend-indicator {
+    display: inline-flex;
+    align-items: center;
+    margin-left: 10px;
+    font-size: 0.9rem;
+}
+
+.trend-up { color: var(--danger); }
+.trend-down { color: var(--success); }
+.trend-stable { color: var(--warning); }
+
+.alerts-section {
+    margin-top: 30px;
+}
+
+.alert-item {
+    background: var(--light);
+    border-left: 4px solid var(--danger);
+    padding: 15px;
+    margin-bottom: 10px;
+    border-radius: 8px;
+    display: flex;
+    align-items: center;
+}
+
+.alert-item i {
+    color: var(--danger);
+    margin-right: 10px;
+    font-size: 1.2rem;
+}
+
+.recommendations-section {
+    margin-top: 20px;
+}
+
+.recommendation-item {
+    background: #f0f9ff;
+    border-left: 4px solid var(--primary);
+    padding: 15px;
+    margin-bottom: 10px;
+    border-radius: 8px;
+    display: flex;
+    align-items: center;
+}
+
+.recommendation-item i {
+    color: var(--primary);
+    margin-right: 10px;
+    font-size: 1.2rem;
+}
+
+.system-info {
+    background: var(--light);
+    padding: 15px;
+    border-radius: 10px;
+    margin-top: 20px;
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+}
+
+.system-info-item {
+    display: flex;
+    align-items: center;
+}
+
+.system-info-item i {
+    margin-right: 8px;
+    color: var(--primary);
+}
+
+.last-update {
+    font-size: 0.9rem;
+    color: #6b7280;
+    margin-top: 10px;
+    text-align: center;
+}
+
+@media (max-width: 768px) {
+    .dashboard {
+        grid-template-columns: 1fr;
+    }
+
+    h1 {
+        font-size: 2rem;
+    }
+
+    .sensor-value {
+        font-size: 2rem;
+    }
+}
+
+.loading {
+    text-align: center;
+    padding: 50px;
+    color: #6b7280;
+}
+
+.loading i {
+    font-size: 3rem;
+    margin-bottom: 20px;
+    color: var(--primary);
+    animation: spin 2s linear infinite;
+}
+
+@keyframes spin {
+    0% { transform: rotate(0deg); }
+    100% { transform: rotate(360deg); }
+}
+'''
+
+DASHBOARD_JS = '''
+// Global variables
+let monitoringData = null;
+let intervalId = null;
+let eventSource = null;
+
+const SENSOR_CARDS = [
+    { field: 'temperature', title: 'Temperature', icon: 'fas fa-thermometer-half', unit: '°C', trend: true },
+    { field: 'ph', title: 'pH Level', icon: 'fas fa-flask', unit: '', trend: true },
+    { field: 'ec', title: 'Electrical Conductivity', icon: 'fas fa-bolt', unit: ' μS/cm', trend: false },
+    { field: 'nitrogen', title: 'Nitrogen', icon: 'fas fa-atom', unit: ' mg/kg', trend: true },
+    { field: 'phosphorus', title: 'Phosphorus', icon: 'fas fa-microscope', unit: ' mg/kg', trend: true },
+    { field: 'turbidity', title: 'Turbidity', icon: 'fas fa-water', unit: ' %', trend: false }
+];
+
+function showConnectionError() {
+    document.getElementById('dashboard').innerHTML = `
+        <div class="card">
+            <div class="card-header">
+                <i class="fas fa-exclamation-triangle"></i>
+                <h2 class="card-title">Connection Error</h2>
+            </div>
+            <p>Failed to connect to monitoring system. Please check the terminal.</p>
+        </div>
+    `;
+}
+
+// Polling fallback for browsers without EventSource
+function updateDashboard() {
+    fetch('/api/data')
+        .then(response => response.json())
+        .then(data => renderDashboard(data))
+        .catch(error => {
+            console.error('Error fetching data:', error);
+            showConnectionError();
+        });
+}
 
-            // Update system info
-            document.getElementById('last-update').textContent = data.last_update || '--:--:--';
-            document.getElementById('system-status').textContent = data.system_status || 'Unknown';
-            document.getElementById('data-points').textContent = 
-                (data.historical_data?.temp_history?.length || 0) + ' points';
+// Live stream: one full snapshot on connect, then patches of changed fields
+function connectStream() {
+    eventSource = new EventSource('/api/stream');
+    eventSource.addEventListener('snapshot', event => renderDashboard(JSON.parse(event.data)));
+    eventSource.addEventListener('patch', event => applyPatch(JSON.parse(event.data)));
+    eventSource.onerror = () => {
+        // EventSource reconnects on its own; only give up if the browser closed it
+        if (eventSource.readyState === EventSource.CLOSED) {
+            showConnectionError();
         }
+    };
+}
 
-        // Function to create sensor card HTML
-        function createSensorCard(title, icon, value, unit, overallStatus, trend) {
-            if (value === null || value === undefined) {
-                value = '--';
-            }
+// Full render: builds the card grid once, then fills every field
+function renderDashboard(data) {
+    monitoringData = data;
+    if (!data || !data.status || !data.status.overall) {
+        return;
+    }
+
+    if (!document.getElementById('card-temperature')) {
+        document.getElementById('dashboard').innerHTML = SENSOR_CARDS.map(createSensorCard).join('');
+    }
+
+    const readings = data.sensor_readings || {};
+    SENSOR_CARDS.forEach(card => updateReading(card.field, readings[card.field]));
+    updateStatus(data.status.overall);
+    updateTrends(data.status.trends || {});
+    updateAlerts(data.status.alerts || []);
+    updateRecommendations(data.status.recommendations || []);
+    updateSystemInfo(data);
+}
 
-            let trendHTML = '';
-            if (trend) {
-                const trendIcon = trend === 'INCREASING' ? 'fa-arrow-up' : 
-                                trend === 'DECREASING' ? 'fa-arrow-down' : 'fa-minus';
-                const trendColor = trend === 'INCREASING' ? 'trend-up' : 
-                                 trend === 'DECREASING' ? 'trend-down' : 'trend-stable';
-                trendHTML = `<span class="trend-indicator ${trendColor}">
-                    <i class="fas ${trendIcon}"></i> ${trend}
-                </span>`;
-            }
+// Patch render: touches only the elements whose fields changed
+function applyPatch(patch) {
+    monitoringData = monitoringData || {};
+    Object.keys(patch).forEach(key => {
+        const value = patch[key];
+        const current = monitoringData[key];
+        if (value && typeof value === 'object' && !Array.isArray(value) &&
+                current && typeof current === 'object' && !Array.isArray(current)) {
+            monitoringData[key] = Object.assign({}, current, value);
+        } else {
+            monitoringData[key] = value;
+        }
+    });
+
+    if (!document.getElementById('card-temperature')) {
+        renderDashboard(monitoringData);
+        return;
+    }
+
+    const readings = patch.sensor_readings || {};
+    Object.keys(readings).forEach(field => updateReading(field, readings[field]));
+
+    const status = patch.status || {};
+    if ('overall' in status) {
+        updateStatus(status.overall);
+    }
+    if ('trends' in status) {
+        updateTrends(status.trends || {});
+    }
+    if ('alerts' in status) {
+        updateAlerts(status.alerts || []);
+    }
+    if ('recommendations' in status) {
+        updateRecommendations(status.recommendations || []);
+    }
+    if ('last_update' in patch || 'system_status' in patch || 'historical_data' in patch) {
+        updateSystemInfo(monitoringData);
+    }
+}
 
-            const statusClass = overallStatus === 'GOOD' ? 'status-normal' : 
-                             overallStatus === 'WARNING' ? 'status-warning' : 
-                             overallStatus === 'CRITICAL' ? 'status-critical' : 'status-normal';
-
-            return `
-                <div class="card">
-                    <div class="card-header">
-                        <i class="fas ${icon}"></i>
-                        <h2 class="card-title">${title}</h2>
-                    </div>
-                    <div class="sensor-value">
-                        ${value}
-                        <span class="sensor-unit">${unit}</span>
-                    </div>
-                    <div class="sensor-status ${statusClass}">
-                        ${overallStatus}
-                    </div>
-                    ${trendHTML}
-                </div>
-            `;
+function updateReading(field, value) {
+    const element = document.getElementById(`value-${field}`);
+    if (element) {
+        element.textContent = (value === null || value === undefined) ? '--' : value;
+    }
+}
+
+function updateStatus(overall) {
+    const statusBadge = document.getElementById('status-badge');
+    statusBadge.className = `status-badge status-${overall.toLowerCase()}`;
+    statusBadge.textContent = overall.toUpperCase();
+
+    const statusClass = overall === 'GOOD' ? 'status-normal' : 
+                     overall === 'WARNING' ? 'status-warning' : 
+                     overall === 'CRITICAL' ? 'status-critical' : 'status-normal';
+    document.querySelectorAll('.sensor-status').forEach(element => {
+        element.className = `sensor-status ${statusClass}`;
+        element.textContent = overall;
+    });
+}
+
+function updateTrends(trends) {
+    SENSOR_CARDS.filter(card => card.trend).forEach(card => {
+        const element = document.getElementById(`trend-${card.field}`);
+        const trend = trends[card.field];
+        if (!element) {
+            return;
+        }
+        if (!trend) {
+            element.style.display = 'none';
+            return;
         }
+        const trendIcon = trend === 'INCREASING' ? 'fa-arrow-up' : 
+                        trend === 'DECREASING' ? 'fa-arrow-down' : 'fa-minus';
+        const trendColor = trend === 'INCREASING' ? 'trend-up' : 
+                         trend === 'DECREASING' ? 'trend-down' : 'trend-stable';
+        element.className = `trend-indicator ${trendColor}`;
+        element.innerHTML = `<i class="fas ${trendIcon}"></i> ${trend}`;
+        element.style.display = '';
+    });
+}
 
-        // Initialize the dashboard
-        document.addEventListener('DOMContentLoaded', function() {
-            updateDashboard();
-            intervalId = setInterval(updateDashboard, 5000);
+function updateAlerts(alerts) {
+    const alertsSection = document.getElementById('alerts-section');
+    if (alerts.length > 0) {
+        let alertsHTML = '<h3><i class="fas fa-exclamation-circle"></i> Active Alerts</h3>';
+        alerts.forEach(alert => {
+            alertsHTML += `
+                <div class="alert-item">
+                    <i class="fas fa-exclamation-triangle"></i>
+                    <span>${alert}</span>
+                </div>
+            `;
         });
+        alertsSection.innerHTML = alertsHTML;
+    } else {
+        alertsSection.innerHTML = '<h3><i class="fas fa-check-circle"></i> No Active Alerts</h3>';
+    }
+}
 
-        // Cleanup on page unload
-        window.addEventListener('beforeunload', function() {
-            if (intervalId) {
-                clearInterval(intervalId);
-            }
+function updateRecommendations(recommendations) {
+    const recommendationsSection = document.getElementById('recommendations-section');
+    if (recommendations.length > 0) {
+        let recommendationsHTML = '<h3><i class="fas fa-lightbulb"></i> Recommendations</h3>';
+        recommendations.forEach(rec => {
+            recommendationsHTML += `
+                <div class="recommendation-item">
+                    <i class="fas fa-hand-point-right"></i>
+                    <span>${rec}</span>
+                </div>
+            `;
         });
-    </script>
-</body>
-</html>
\ No newline at end of file
+        recommendationsSection.innerHTML = recommendationsHTML;
+    } else {
+        recommendationsSection.innerHTML = '<h3><i class="fas fa-thumbs-up"></i> No Recommendations</h3>';
+    }
+}
+
+function updateSystemInfo(data) {
+    document.getElementById('last-update').textContent = data.last_update || '--:--:--';
+    document.getElementById('system-status').textContent = data.system_status || 'Unknown';
+    document.getElementById('data-points').textContent = 
+        ((data.historical_data && data.historical_data.temp_history) || []).length + ' points';
+}
+
+// Function to create sensor card HTML (values are filled in by the update functions)
+function createSensorCard(card) {
+    const trendHTML = card.trend
+        ? `<span id="trend-${card.field}" class="trend-indicator trend-stable" style="display: none"></span>`
+        : '';
+
+    return `
+        <div class="card" id="card-${card.field}">
+            <div class="card-header">
+                <i class="fas ${card.icon}"></i>
+                <h2 class="card-title">${card.title}</h2>
+            </div>
+            <div class="sensor-value">
+                <span id="value-${card.field}">--</span>
+                <span class="sensor-unit">${card.unit}</span>
+            </div>
+            <div class="sensor-status status-normal"></div>
+            ${trendHTML}
+        </div>
+    `;
+}
+
+// Initialize the dashboard
+document.addEventListener('DOMContentLoaded', function() {
+    if (window.EventSource) {
+        connectStream();
+    } else {
+        updateDashboard();
+        intervalId = setInterval(updateDashboard, 5000);
+    }
+});
+
+// Cleanup on page unload
+window.addEventListener('beforeunload', function() {
+    if (intervalId) {
+        clearInterval(intervalId);
+    }
+    if (eventSource) {
+        eventSource.close();
+    }
+});
+'''
+
+@dataclass(frozen=True)
+class StaticAsset:
+    mimetype: str
+    body: bytes
+    gzip: bytes
+    brotli: Optional[bytes]
+    etag: str
+    cache_control: str
+
+    @classmethod
+    def build(cls, body, mimetype, cache_control):
+        body = body.encode() if isinstance(body, str) else body
+        return cls(
+            mimetype=mimetype,
+            body=body,
+            gzip=gzip.compress(body, compresslevel=9),
+            brotli=brotli.compress(body, quality=11) if brotli else None,
+            etag=hashlib.blake2b(body, digest_size=8).hexdigest(),
+            cache_control=cache_control
+        )
+
+class DashboardAssets:
+    """The dashboard page and its CSS/JS, built once and served from memory.
+
+    CSS and JS get content-hash URLs (/assets/dashboard.<hash>.css) and are
+    cached as immutable for a year; the page itself is revalidated by ETag so
+    a new build is picked up on the next load. Each asset keeps gzip (and
+    brotli, if installed) variants so a request costs a dict lookup.
+    """
+
+    IMMUTABLE = "public, max-age=31536000, immutable"
+
+    def __init__(self, html, css, js):
+        self.assets = {}
+        urls = {}
+        for name, source, mimetype in (("dashboard.css", css, "text/css"),
+                                       ("dashboard.js", js, "application/javascript")):
+            asset = StaticAsset.build(source, mimetype, self.IMMUTABLE)
+            stem, ext = name.rsplit(".", 1)
+            hashed = f"{stem}.{asset.etag[:10]}.{ext}"
+            self.assets[hashed] = asset
+            urls["{" + name + "}"] = f"/assets/{hashed}"
+        for placeholder, url in urls.items():
+            html = html.replace(placeholder, url)
+        self.index = StaticAsset.build(html, "text/html", "no-cache")
+
+    def get(self, name):
+        return self.assets.get(name)
+
+def asset_response(asset):
+    encodings = request.accept_encodings
+    if asset.brotli is not None and 'br' in encodings:
+        body, encoding = asset.brotli, 'br'
+    elif 'gzip' in encodings:
+        body, encoding = asset.gzip, 'gzip'
+    else:
+        body, encoding = asset.body, None
+    etag = asset.etag + ('-' + encoding if encoding else '')
+
+    response = Response(mimetype=asset.mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = asset.cache_control
+    response.headers['Vary'] = 'Accept-Encoding'
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+        return response
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.set_data(body)
+    return response
+
+dashboard_assets = DashboardAssets(DASHBOARD_HTML, DASHBOARD_CSS, DASHBOARD_JS)
+
+@app.route('/')
+def index():
+    return asset_response(dashboard_assets.index)
+
+@app.route('/assets/<name>')
+def static_asset(name):
+    asset = dashboard_assets.get(name)
+    if asset is None:
+        return jsonify({'error': 'Not found'}), 404
+    return asset_response(asset)
+
+@app.route('/api/data')
+def api_data():
+    snapshot = (monitor.dashboard if monitor else idle_dashboard).current
+    if request.if_none_match.contains(snapshot.etag):
+        response = Response(status=304)
+    else:
+        response = Response(snapshot.body, mimetype='application/json')
+    response.set_etag(snapshot.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/stream')
+def api_stream():
+    publisher = monitor.dashboard if monitor else idle_dashboard
+    subscriber = publisher.subscribe()
+
+    def stream():
+        try:
+            # Full state first; every later message is a patch of changed fields
+            yield publisher.current.event
+            while True:
+                try:
+                    message = subscriber.get(timeout=15)
+                except queue.Empty:
+                    yield b": keepalive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            publisher.unsubscribe(subscriber)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+HISTORY_BUCKETS = [60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400, 7 * 86400]
+BUCKET_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_history_time(value, default):
+    if not value:
+        return default
+    try:
+        timestamp = float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+    if not math.isfinite(timestamp):
+        raise ValueError(f"time must be finite, got {value!r}")
+    return timestamp
+
+def parse_bucket(value):
+    value = value.strip().lower()
+    if value[-1:] in BUCKET_UNITS:
+        return int(float(value[:-1]) * BUCKET_UNITS[value[-1]])
+    return int(value)
+
+@app.route('/api/events')
+def api_events():
+    # Recent log events, oldest first; poll with ?since=<last id seen>
+    try:
+        since = int(request.args.get('since', 0))
+        limit = max(1, min(int(request.args.get('limit', 100)), EVENTS.events.maxlen))
+    except ValueError as e:
+        return jsonify({'error': f"Bad query: {e}"}), 400
+    level = request.args.get('level', 'INFO').upper()
+    if level not in CONFIG_CHOICES["LOGGING.LEVEL"]:
+        return jsonify({'error': f"Unknown level '{level}'"}), 400
+    response = jsonify({'events': EVENTS.snapshot(since, logging.getLevelName(level), limit),
+                        'last_id': EVENTS.last_id})
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/fleet')
+def api_fleet():
+    if not fleet:
+        return jsonify({'error': 'Fleet mode not running'}), 503
+    response = jsonify(fleet.summary())
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/history')
+def api_history():
+    pond = request.args.get('pond')
+    if pond:
+        if not fleet or pond not in fleet.ponds:
+            return jsonify({'error': f"Unknown pond '{pond}'"}), 404
+        store, clock = fleet.ponds[pond].store, fleet.clock
+    elif monitor:
+        store, clock = monitor.store, monitor.clock
+    else:
+        return jsonify({'error': 'Monitor not running'}), 503
+    history_config = config.HISTORY
+    param = request.args.get('param', 'temperature')
+    if param not in HISTORY_PARAMS:
+        return jsonify({'error': f"Unknown param '{param}'", 'params': HISTORY_PARAMS}), 400
+    try:
+        end = parse_history_time(request.args.get('to'), clock.time())
+        start = parse_history_time(request.args.get('from'), end - 86400)
+        points = min(int(request.args.get('points', history_config.get('DEFAULT_POINTS', 300))),
+                     history_config.get('MAX_POINTS', 2000))
+        bucket = request.args.get('bucket')
+        method = request.args.get('method', 'minmax')
+        if bucket:
+            bucket = parse_bucket(bucket)
+        else:
+            # Smallest standard bucket that keeps the series within `points`
+            span = max(end - start, 60)
+            bucket = next((b for b in HISTORY_BUCKETS if span / b <= points), HISTORY_BUCKETS[-1])
+    except (TypeError, ValueError, OverflowError) as e:
+        return jsonify({'error': f"Bad query: {e}"}), 400
+    if end <= start or bucket <= 0 or method not in ('minmax', 'lttb'):
+        return jsonify({'error': 'Bad query: need from < to, bucket > 0, method minmax|lttb'}), 400
+    if points < (2 if method == 'lttb' else 1):
+        return jsonify({'error': 'Bad query: need points >= 1 (>= 2 for lttb)'}), 400
+    if (end - start) / bucket > history_config.get('MAX_POINTS', 2000):
+        return jsonify({'error': 'Bad query: too many buckets for this range'}), 400
+
+    if method == 'lttb':
+        # Bucket finely, then keep the `points` means that best preserve shape
+        fine = next((b for b in HISTORY_BUCKETS if (end - start) / b <= points * 4), HISTORY_BUCKETS[-1])
+        bucket, rows = store.history(param, start, end, min(bucket, fine))
+        series = lttb([(row[0], row[1]) for row in rows], points)
+        fields = ['time', 'mean']
+        data = [[t, round(v, 3)] for t, v in series]
+    else:
+        bucket, rows = store.history(param, start, end, bucket)
+        fields = ['time', 'mean', 'min', 'max', 'count']
+        data = [[row[0], round(row[1], 3), round(row[2], 3), round(row[3], 3), row[4]] for row in rows]
+
+    body = json.dumps({'pond': pond, 'param': param, 'from': start, 'to': end, 'bucket': bucket,
+                       'method': method, 'fields': fields, 'points': data},
+                      separators=(',', ':')).encode()
+    etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+    compress = 'gzip' in request.accept_encodings
+    response = Response(mimetype='application/json')
+    response.set_etag(etag + ('-gz' if compress else ''))
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Ranges that ended before the current bucket can no longer change
+    if end < clock.time() - bucket:
+        response.headers['Cache-Control'] = 'public, max-age=86400'
+    else:
+        response.headers['Cache-Control'] = f"public, max-age={min(bucket, 60)}"
+    if request.if_none_match.contains(response.get_etag()[0]):
+        response.status_code = 304
+        return response
+    if compress:
+        body = gzip.compress(body, compresslevel=6)
+        response.headers['Content-Encoding'] = 'gzip'
+    response.set_data(body)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    response = Response(METRICS.render(), mimetype='text/plain')
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,330 @@
+# Simulated hardware backends for running the monitor off the Pi.
+# SimulatedHardware has the same interface as flask2.PiHardware (gpio, clock
+# and the open_* factories) and replays a SensorTrace on a SimulatedClock, so
+# the check scripts and the benchmark in Testing/ exercise the real monitor
+# code without any hardware attached.
+import array
+import csv
+import math
+import random
+import time
+
+import flask2
+from flask2 import RS485_REGISTERS, W1_DEVICES, ModbusIllegalRequest
+
+
+class SimulatedClock:
+    """Manually advanced clock; sleep() just moves time forward."""
+
+    def __init__(self, start=None):
+        self.now = time.time() if start is None else start
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.now += seconds
+
+    advance = sleep
+
+
+class SensorTrace:
+    """Pond readings at a fixed interval, stored column-wise.
+
+    at(offset) returns the sample covering `offset` seconds into the trace,
+    wrapping around at the end so short recordings can drive long runs.
+    """
+
+    FIELDS = ("temperature", "water_temp", "ph", "ec", "nitrogen", "phosphorus",
+              "potassium", "turbidity")
+
+    def __init__(self, columns, interval=15):
+        self.columns = {field: array.array('d', columns[field]) for field in self.FIELDS}
+        self.interval = interval
+        self.length = len(self.columns['temperature'])
+        self._index = -1
+        self._sample = None
+
+    def __len__(self):
+        return self.length
+
+    def at(self, offset):
+        index = int(offset // self.interval) % self.length
+        if index != self._index:
+            self._index = index
+            self._sample = {field: column[index] for field, column in self.columns.items()}
+        return self._sample
+
+    @classmethod
+    def synthetic(cls, days=1, interval=15, seed=1):
+        # Diurnal temperature/pH swings with sensor noise, plus a few storm
+        # events (acidic, turbid) and heat waves so every rule band is exercised
+        rng = random.Random(seed)
+        count = int(days * 86400 // interval)
+        columns = {field: [] for field in cls.FIELDS}
+        storms = {rng.randrange(count) for _ in range(max(1, int(days // 4)))}
+        heat = {rng.randrange(count) for _ in range(max(1, int(days // 7)))}
+        # A storm during a heat wave is what should drive the pump and SMS path
+        crises = {rng.randrange(count) for _ in range(max(1, int(days // 7)))}
+        storm_len = int(3 * 3600 // interval)
+        heat_len = int(6 * 3600 // interval)
+        storm_left = heat_left = 0
+        for i in range(count):
+            day_phase = math.sin(2 * math.pi * ((i * interval) % 86400) / 86400)
+            if i in storms or i in crises:
+                storm_left = storm_len
+            if i in heat or i in crises:
+                heat_left = heat_len
+            temp = 26.0 + 2.5 * day_phase + rng.gauss(0, 0.2) + (10.0 if heat_left else 0.0)
+            ph = 7.2 + 0.3 * day_phase + rng.gauss(0, 0.05) - (2.2 if storm_left else 0.0)
+            columns['temperature'].append(temp)
+            columns['water_temp'].append(temp + rng.gauss(0, 0.1))
+            columns['ph'].append(ph)
+            columns['ec'].append(52.0 + rng.gauss(0, 2.0) + (30.0 if storm_left else 0.0))
+            columns['nitrogen'].append(45.0 + rng.gauss(0, 1.5))
+            columns['phosphorus'].append(38.0 + rng.gauss(0, 1.5))
+            columns['potassium'].append(90.0 + rng.gauss(0, 2.0))
+            columns['turbidity'].append(1.0 if storm_left or rng.random() < 0.02 else 0.0)
+            storm_left = max(0, storm_left - 1)
+            heat_left = max(0, heat_left - 1)
+        return cls(columns, interval)
+
+    @classmethod
+    def from_csv(cls, csv_path, interval=15):
+        # Recorded trace: one row per reading, columns named like FIELDS.
+        # Missing columns fall back to neutral values; turbidity >= 0.5 is turbid.
+        defaults = {'ph': 7.2, 'ec': 52.0, 'nitrogen': 45.0, 'phosphorus': 38.0,
+                    'potassium': 90.0, 'turbidity': 0.0, 'temperature': 26.0}
+        columns = {field: [] for field in cls.FIELDS}
+        with open(csv_path, newline='') as f:
+            for row in csv.DictReader(f):
+                values = {}
+                for field in cls.FIELDS:
+                    try:
+                        values[field] = float(row[field])
+                    except (KeyError, TypeError, ValueError):
+                        values[field] = None
+                if values['temperature'] is None:
+                    values['temperature'] = values['water_temp'] if values['water_temp'] is not None else defaults['temperature']
+                if values['water_temp'] is None:
+                    values['water_temp'] = values['temperature']
+                for field in cls.FIELDS:
+                    value = values[field] if values[field] is not None else defaults[field]
+                    columns[field].append(value)
+        if not columns['temperature']:
+            raise ValueError(f"No readings in trace {csv_path}")
+        return cls(columns, interval)
+
+
+class SimulatedPWM:
+    def __init__(self, pin, frequency):
+        self.pin = pin
+        self.frequency = frequency
+        self.duty = 0
+
+    def start(self, duty):
+        self.duty = duty
+
+    def ChangeDutyCycle(self, duty):
+        self.duty = duty
+
+    def stop(self):
+        self.duty = 0
+
+
+class SimulatedGPIO:
+    """RPi.GPIO stand-in. Inputs come from per-pin callables."""
+
+    BCM, IN, OUT, PUD_UP = "BCM", "IN", "OUT", "PUD_UP"
+    LOW, HIGH = 0, 1
+
+    def __init__(self):
+        self.levels = {}
+        self.inputs = {}
+        self.reads = 0
+        self.writes = 0
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None):
+        self.levels.setdefault(pin, self.HIGH if pull_up_down == self.PUD_UP else self.LOW)
+
+    def output(self, pin, value):
+        self.writes += 1
+        self.levels[pin] = value
+
+    def input(self, pin):
+        self.reads += 1
+        source = self.inputs.get(pin)
+        return source() if source else self.levels.get(pin, self.LOW)
+
+    def PWM(self, pin, frequency):
+        return SimulatedPWM(pin, frequency)
+
+    def cleanup(self):
+        self.levels.clear()
+
+
+class SimulatedModbus:
+    """RS485 probe that serves the current trace sample as raw registers."""
+
+    def __init__(self, sample, block_read=True):
+        self.sample = sample
+        self.block_read = block_read
+        self.responding = True
+        self.transactions = 0
+
+    def _registers(self):
+        values = self.sample()
+        # The monitor derives pH as raw / 3.13 minus a temperature correction
+        ph_raw = (values['ph'] + (values['temperature'] - 25) * 0.01) * 3.13
+        scaled = dict(values, ph=ph_raw)
+        return {reg: int(round(scaled[param] * 10)) for param, reg in RS485_REGISTERS.items()}
+
+    def read_registers(self, start, count, functioncode=3):
+        self.transactions += 1
+        if not self.responding:
+            raise OSError("No communication with the instrument (no answer)")
+        if not self.block_read:
+            raise ModbusIllegalRequest("Slave reported illegal data address")
+        registers = self._registers()
+        return [registers.get(reg, 0) for reg in range(start, start + count)]
+
+    def read_register(self, register, decimals=0, functioncode=3):
+        self.transactions += 1
+        if not self.responding:
+            raise OSError("No communication with the instrument (no answer)")
+        return self._registers().get(register, 0) / (10 ** decimals)
+
+
+class SimulatedOneWire:
+    """1-Wire bus whose DS18B20s report the trace's water temperature.
+
+    Probes can be plugged and unplugged with the `devices` list; reading
+    one that is gone raises like the sysfs file would.
+    """
+
+    def __init__(self, sample, devices=("28-00000a1b2c3d",)):
+        self.sample = sample
+        self.devices = list(devices)
+        self.reads = 0
+        self.conversions = 0
+
+    def discover(self):
+        return sorted(self.devices)
+
+    def trigger_conversion(self):
+        self.conversions += 1
+        return True
+
+    def read(self, device):
+        self.reads += 1
+        if device not in self.devices:
+            raise FileNotFoundError(f"{W1_DEVICES}/{device}/temperature")
+        return int(round(self.sample()['water_temp'] * 1000)) / 1000.0
+
+
+class SimulatedLCD:
+    """16x2 character LCD kept as two strings."""
+
+    def __init__(self, cols=16, rows=2):
+        self.cols = cols
+        self.lines = [" " * cols for _ in range(rows)]
+        self.cursor_pos = (0, 0)
+        self.writes = 0
+
+    def clear(self):
+        self.lines = [" " * self.cols for _ in self.lines]
+        self.cursor_pos = (0, 0)
+
+    def write_string(self, text):
+        self.writes += 1
+        row, col = self.cursor_pos
+        line = self.lines[row]
+        text = text[:self.cols - col]
+        self.lines[row] = line[:col] + text + line[col + len(text):]
+        self.cursor_pos = (row, col + len(text))
+
+
+class SimulatedModem:
+    """SIM800-style modem: OK to commands, '>' to AT+CMGS, +CMGS after Ctrl-Z."""
+
+    def __init__(self):
+        self.pending = b""
+        self.outbox = []
+        self.message = None
+        self.reference = 0
+
+    def write(self, data):
+        if self.message is not None:
+            if data == b"\x1b":
+                self.message = None
+            elif data.endswith(b"\x1a"):
+                self.message += data[:-1]
+                self.reference += 1
+                self.outbox.append(self.message.decode(errors="ignore"))
+                self.message = None
+                self.pending += f"\r\n+CMGS: {self.reference}\r\n\r\nOK\r\n".encode()
+            else:
+                self.message += data
+        elif data.startswith(b"AT+CMGS"):
+            self.message = b""
+            self.pending += b"\r\n> "
+        else:
+            self.pending += b"\r\nOK\r\n"
+        return len(data)
+
+    def read_all(self):
+        data, self.pending = self.pending, b""
+        return data
+
+    def close(self):
+        pass
+
+
+class SimulatedHardware:
+    """Off-device backend driven by a SensorTrace on a SimulatedClock."""
+
+    name = "simulated"
+
+    def __init__(self, trace=None, clock=None, block_read=True):
+        self.clock = clock or SimulatedClock()
+        self.trace = trace or SensorTrace.synthetic(days=1)
+        self.start = self.clock.time()
+        self.block_read = block_read
+        self.gpio = SimulatedGPIO()
+        turbidity_pin = flask2.config.GPIO.TURBIDITY_PIN
+        # The turbidity module pulls its pin low when the water is turbid
+        self.gpio.inputs[turbidity_pin] = lambda: 0 if self.sample()['turbidity'] >= 0.5 else 1
+        self.modbus = None
+        self.probes = {}
+        self.onewire = None
+        self.lcd = None
+        self.gsm = None
+
+    def sample(self):
+        return self.trace.at(self.clock.time() - self.start)
+
+    def open_modbus(self, port, slave_id, baudrate=9600):
+        # Further slaves replay the same trace 4 h apart so ponds differ
+        offset = (slave_id - 1) * 4 * 3600
+        sample = self.sample if not offset else lambda: self.trace.at(self.clock.time() - self.start + offset)
+        probe = SimulatedModbus(sample, self.block_read)
+        self.probes[(port, slave_id)] = probe
+        if self.modbus is None:
+            self.modbus = probe
+        return probe
+
+    def open_onewire(self):
+        self.onewire = SimulatedOneWire(self.sample)
+        return self.onewire
+
+    def open_lcd(self):
+        self.lcd = SimulatedLCD()
+        return self.lcd
+
+    def open_gsm(self, port, baudrate):
+        self.gsm = SimulatedModem()
+        return self.gsm